@@ -0,0 +1,249 @@
+"""Background OEE anomaly detection.
+
+Every ``interval`` seconds the monitor reads the history buckets completed
+since its last pass and hands each station's new availability, performance
+and quality points to a model process. Stations are sharded over model
+processes, so a station's model stays resident in the same process and is
+updated in place with each new point, never refit per tick. The processes
+are forked when the monitor is created, which must happen before the
+application starts other threads: a lock a thread holds at the fork stays
+held forever in the child.
+A measure is flagged when it comes in below its forecast band.
+
+Models are pmdarima ARIMAs when pmdarima is installed (fit once after a
+warm-up, then ``update``d, refit every ``refit_every`` points), or an
+exponentially weighted mean and variance otherwise.
+"""
+import logging
+import multiprocessing
+import threading
+import time
+
+import numpy as np
+
+MEASURES = ('availability', 'performance', 'quality')
+
+log = logging.getLogger(__name__)
+
+# Models of the stations sharded to this process, by station name
+_models = {}
+
+
+class EWMAModel:
+    """Exponentially weighted mean and variance of one series."""
+
+    def __init__(self, alpha=0.1, threshold=3.0, warmup=10):
+        self.alpha = alpha
+        self.threshold = threshold
+        self.warmup = warmup
+        self.n = 0
+        self.mean = 0.0
+        self.var = 0.0
+
+    def update(self, value):
+        """Add a point; returns (forecast, flagged) for it."""
+        forecast = self.mean
+        flagged = (self.n >= self.warmup
+                   and value < forecast - self.threshold * max(self.var, 1e-6) ** 0.5)
+        if self.n == 0:
+            self.mean = value
+        else:
+            resid = value - self.mean
+            self.mean += self.alpha * resid
+            self.var = (1 - self.alpha) * (self.var + self.alpha * resid * resid)
+        self.n += 1
+        return forecast, flagged
+
+
+class ArimaModel:
+    """pmdarima ARIMA, fit once ``warmup`` points have arrived."""
+
+    def __init__(self, threshold=3.0, warmup=30, refit_every=500):
+        self.alpha = 2 * (1 - _normal_cdf(threshold))
+        self.warmup = warmup
+        self.refit_every = refit_every
+        self.points = []
+        self.model = None
+        self.since_fit = 0
+
+    def _fit(self):
+        import pmdarima
+
+        self.model = pmdarima.auto_arima(self.points, seasonal=False, suppress_warnings=True,
+                                         error_action='ignore')
+        self.since_fit = 0
+
+    def update(self, value):
+        forecast, flagged = value, False
+        if self.model is not None:
+            mean, interval = self.model.predict(1, return_conf_int=True, alpha=self.alpha)
+            forecast = float(mean[0])
+            flagged = value < interval[0][0]
+            self.model.update([value])
+            self.since_fit += 1
+        self.points = (self.points + [value])[-self.refit_every:]
+        if self.model is None and len(self.points) >= self.warmup or self.since_fit >= self.refit_every:
+            self._fit()
+        return forecast, flagged
+
+
+def _normal_cdf(x):
+    from math import erf, sqrt
+
+    return 0.5 * (1 + erf(x / sqrt(2)))
+
+
+def make_model(method, threshold):
+    if method == 'arima':
+        return ArimaModel(threshold)
+    return EWMAModel(threshold=threshold)
+
+
+def update_shard(points, method, threshold):
+    """Runs in a model process: feed each station's new (A, P, Q) rows to its
+    models and return the latest flags and forecasts per station."""
+    results = {}
+    for name, rows in points.items():
+        models = _models.setdefault(name, [make_model(method, threshold) for _ in MEASURES])
+        forecast = {}
+        flags = {}
+        for row in rows:
+            for measure, model, value in zip(MEASURES, models, row):
+                if not np.isnan(value):
+                    forecast[measure], flags[measure] = model.update(float(value))
+        results[name] = {
+            'flags': [measure for measure in MEASURES if flags.get(measure)],
+            'forecast': forecast,
+        }
+    return results
+
+
+def _serve(conn):
+    """Model process loop: answer each ``update_shard`` request on ``conn``
+    until the monitor stops or goes away."""
+    while True:
+        try:
+            request = conn.recv()
+        except EOFError:
+            return
+        if request is None:
+            return
+        try:
+            conn.send(update_shard(*request))
+        except Exception as exc:
+            conn.send(exc)
+
+
+def default_method():
+    try:
+        import pmdarima  # noqa: F401
+    except ImportError:
+        return 'ewma'
+    return 'arima'
+
+
+class AnomalyMonitor:
+
+    def __init__(self, engine, history, interval=60, workers=2, method='auto',
+                 threshold=3.0, level='minute'):
+        self.engine = engine
+        self.history = history
+        self.interval = interval
+        self.method = default_method() if method == 'auto' else method
+        self.threshold = threshold
+        self.level = level
+        # Station index -> measures below forecast, and the latest forecasts
+        self.flags = {}
+        self.forecasts = {}
+        self.passes = 0
+        self._done = None
+        # Forked, not spawned: a spawned child re-imports the main module,
+        # which under ``python app.py`` is the whole dashboard. Plain
+        # processes and pipes, unlike a process pool, start no threads of
+        # their own, so every worker is forked from a single-threaded parent.
+        if threading.active_count() > 1:
+            log.warning('forking anomaly workers with %d threads running', threading.active_count())
+        context = multiprocessing.get_context('fork')
+        self._workers = []
+        for _ in range(workers):
+            conn, child = context.Pipe()
+            process = context.Process(target=_serve, args=(child,), name='oee-anomaly-model',
+                                      daemon=True)
+            process.start()
+            child.close()
+            self._workers.append((process, conn))
+
+    def _new_points(self, now):
+        """(A, P, Q) rows per station for the buckets completed since the
+        previous pass."""
+        width = self.history.levels[self.level][0]
+        end = (now - self.history.offset) // width * width + self.history.offset
+        start = end - width if self._done is None else self._done
+        if end <= start:
+            return {}
+        self._done = end
+        trend = self.history.trend(self.level, start, end - 1)
+        rows = np.stack([trend[measure] for measure in MEASURES], axis=-1)
+        points = {}
+        for idx, name in enumerate(self.history.names[:rows.shape[1]]):
+            station = rows[:, idx]
+            station = station[~np.isnan(station).all(axis=1)]
+            if len(station):
+                points[name] = station.tolist()
+        return points
+
+    def run_once(self, now=None):
+        points = self._new_points(time.time() if now is None else now)
+        if not points:
+            return
+        shards = [{} for _ in self._workers]
+        for name, rows in points.items():
+            shards[hash(name) % len(shards)][name] = rows
+        # All shards are sent before any answer is read, so they run in parallel
+        busy = []
+        for (_, conn), shard in zip(self._workers, shards):
+            if shard:
+                conn.send((shard, self.method, self.threshold))
+                busy.append(conn)
+        answers = [conn.recv() for conn in busy]
+        changed = []
+        for answer in answers:
+            if isinstance(answer, Exception):
+                raise answer
+            for name, result in answer.items():
+                if name not in self.engine:
+                    continue
+                idx = self.engine.index[name]
+                self.forecasts[idx] = result['forecast']
+                if self.flags.get(idx, []) != result['flags']:
+                    changed.append(idx)
+                if result['flags']:
+                    self.flags[idx] = result['flags']
+                else:
+                    self.flags.pop(idx, None)
+        if changed:
+            self.engine.touch_status(changed)
+        self.passes += 1
+
+    def start(self):
+        def run():
+            while True:
+                time.sleep(self.interval)
+                try:
+                    self.run_once()
+                except Exception:
+                    log.exception('anomaly pass failed')
+
+        thread = threading.Thread(target=run, name='oee-anomaly', daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self):
+        for process, conn in self._workers:
+            try:
+                conn.send(None)
+            except OSError:
+                # Already gone
+                pass
+            process.join()
+            conn.close()
@@ -1,595 +1,777 @@
+import startup
+
 import dash
-from dash import dcc, html
-from dash.dependencies import Input, Output
-import plotly.graph_objs as go
-import plotly.express as px
+from dash import ctx, dcc, html
+from dash.dependencies import ClientsideFunction, Input, Output, State
 import numpy as np 
-import dash_daq as daq
-
-# Sample data for machines and processes
-process_data = {
-    'Paste Grinding': {
-        'x': [1, 2, 3, 4, 5],
-        'y': [10, 11, 10, 11, 10],
-        'status': 'Running',
-        'lot_num': 20005,
-        'fr': 5
-    },
-    'Machine 1': {
-        'x': [1, 2, 3, 4, 5],
-        'y': [10, 15, 13, 17, 14],
-        'status': 'Running',
-        'lot_num': 20002,
-        'mat_used':32.4,
-        'mat_waste': 4.2
-    },
-    'Machine 2': {
-        'x': [1, 2, 3, 4, 5],
-        'y': [5, 9, 7, 14, 10],
-        'status': 'Running',
-        'lot_num': 20004,
-        'mat_used':42.5,
-        'mat_waste': 5.3
-    },
-    'Machine 3': {
-        'x': [1, 2, 3, 4, 5],
-        'y': [2, 3, 4, 2, 5],
-        'status': 'Stopped',
-        'lot_num' :'Nil',
-    },
-    'Furnace': {
-        'x': [1, 2, 3, 4, 5],
-        'y': [8, 9, 7, 9, 8],
-        'status': 'Running',
-        'lot_num': 19999
-    },
-    'Wirecut': {
-        'x': [1, 2, 3, 4, 5],
-        'y': [7, 7, 8, 8, 7],
-        'status': 'Running',
-        'lot_num': 20000
-    },
-    'Machining': {
-        'x': [1, 2, 3, 4, 5],
-        'y': [14, 13, 15, 14, 16],
-        'status': 'Stopped',
-        'lot_num' :'Nil',
-        'fr': 4
-    },
-    'Dimension': {
-        'x': [1, 2, 3, 4, 5],
-        'y': [3, 4, 3, 4, 3],
-        'status': 'Running',
-        'lot_num': 19998,
-        'fr': 4
-    },
-    'Tensile': {
-        'x': [1, 2, 3, 4, 5],
-        'y': [6, 6, 7, 6, 5],
-        'status': 'Running',
-        'lot_num': 19998,
-        'fr': 10
-    },
-    'Packing': {
-        'x': [1, 2, 3, 4, 5],
-        'y': [1, 2, 1, 2, 1],
-        'status': 'Running',
-        'lot_num': 19997
-    },
-    'Shipping': {
-        'x': [1, 2, 3, 4, 5],
-        'y': [4, 3, 4, 3, 4],
-        'status': 'Running',
-        'lot_num': 19996
-    },
-}
+import os
+import time
+
+from flask import Response, abort, jsonify, request, send_file
+
+from config import (ANOMALY_METHOD, ANOMALY_SECONDS, ANOMALY_THRESHOLD, ANOMALY_WORKERS,
+                    CLIENTSIDE_STEP_VIEW, COMPRESS_LEVEL, COMPRESS_MIN_BYTES, DB_REFRESH_SECONDS,
+                    DELTA_UPDATES, DETAIL_CACHE_SIZE, DETAIL_CACHE_TTL, DETAIL_PREFETCH,
+                    EXPORT_CHUNK_ROWS, EXPORT_DIR, EXPORT_KEEP, EXPORT_WORKERS, FAST_START,
+                    FLOW_TOPOLOGY_PATH, HISTORY_CAPTURE_SECONDS, HISTORY_PATH, INGEST_HOST,
+                    INGEST_PORT, INGEST_QUEUE_SIZE, LAYOUT_CACHE_PATH, LIVE_INTERVAL_MS, PAGE_SIZE,
+                    PROFILE_KEEP, PROFILE_REQUESTS, PROFILE_SAMPLE_PERCENT, RENDER_CACHE_SIZE,
+                    RENDER_CACHE_TTL, SHARED_HISTORY_PATH, SHARED_STATE_PATH)
+from anomaly import AnomalyMonitor
+from compression import init_compression
+from datasource import default_source
+from downtime import window
+from export import REPORTS, ExportJobs, available_formats, history_chunks, kpi_chunks, shift_chunks
+from figures import FIGURE_IDS, FigureFactory
+from flow import FlowModel, load_topology
+from history import HistoryStore
+from ingest import IngestGateway
+from layout_template import LayoutTemplate, placeholders, source_key, to_json
+from live import data_patch, live_components, live_state, register_live_updates
+from metrics import FIGURE_SECONDS, RENDER_SECONDS, init_metrics
+from oee_engine import OEEEngine
+from profiling import init_profiling, phase
+from render_cache import RenderCache
+from shared_state import SharedEngine
+from station_detail import DetailLoader
+from views import build_view, lines_of
+
+startup.mark('imports')
+
+gateway = None
+if SHARED_STATE_PATH:
+    # Read-only view of the table published by updater.py, shared by all
+    # workers; the updater owns the refreshes and the ingest gateway, and
+    # workers only read station detail from the data source.
+    source = default_source()
+    engine = SharedEngine(SHARED_STATE_PATH)
+else:
+    source = default_source()
+
+    # Live KPI state, loaded from the data source. Machine events go through
+    # engine.apply()/state_change()/unit_count()/... and the layout and the
+    # step view read from it.
+    engine = OEEEngine()
+    source.refresh(engine)
+
+startup.mark('data source')
+
+# Shift/day/week trends per station, fed from the engine
+history_path = SHARED_HISTORY_PATH if SHARED_STATE_PATH else HISTORY_PATH
+if history_path and os.path.exists(history_path):
+    history = HistoryStore.load(history_path)
+else:
+    history = HistoryStore()
+
+# Stations whose A/P/Q came in below forecast, refreshed from the history.
+# Its model processes are forked here, before any background thread starts.
+anomalies = None
+if ANOMALY_SECONDS and HISTORY_CAPTURE_SECONDS and not SHARED_STATE_PATH:
+    anomalies = AnomalyMonitor(engine, history, ANOMALY_SECONDS, ANOMALY_WORKERS,
+                               ANOMALY_METHOD, ANOMALY_THRESHOLD)
+
+if not SHARED_STATE_PATH:
+    if DB_REFRESH_SECONDS:
+        source.start_refresh(engine, DB_REFRESH_SECONDS)
+
+    # Machine events pushed by the PLC adapters
+    if INGEST_PORT:
+        gateway = IngestGateway(engine, INGEST_HOST, INGEST_PORT, INGEST_QUEUE_SIZE)
+        gateway.start_in_thread()
+
+if HISTORY_CAPTURE_SECONDS:
+    if SHARED_STATE_PATH:
+        # The updater captures and saves the history; workers reload its file
+        history.follow(history_path, HISTORY_CAPTURE_SECONDS)
+    else:
+        history.start_capture(engine, HISTORY_CAPTURE_SECONDS, history_path or None)
+if anomalies is not None:
+    anomalies.start()
+
+startup.mark('history')
+
+# Latest data source summary row per station, in line order
+process_data = engine.extras if SHARED_STATE_PATH else source.stations
+
+# Material totals and other detail, loaded when a station is first opened
+details = DetailLoader(lambda name: source.fetch_detail(name), lambda: engine.names,
+                       DETAIL_CACHE_SIZE, DETAIL_CACHE_TTL, DETAIL_PREFETCH,
+                       fetch_many=lambda names: source.fetch_details(names))
 
 # Process names
-processes = [
-    'Paste Grinding', 'Machine 1', 'Machine 2', 'Machine 3', 
-    'Furnace', 'Wirecut', 'Machining', 
-    'Dimension', 'Tensile', 
-    'Packing', 'Shipping'
-]
-
-# Current and expected lot run times
-current_run_time = [1.3, 20, 74, 0, 8, 3, 0, 1, 0.5, 1, 1]
-expected_run_time = [1.5, 30, 108, 0, 10, 4, 0, 3, 1, 1, 2]
-performance = np.round(np.array(current_run_time) * 100/np.array(expected_run_time),1)
-expected_run_time_percentage = [100,100,100,0,100,100,0,100,100,100,100]
-pdt = [8,12,40,3,4,15,20,30,14,70,70]
-unitsproduced = [1043,205,102,733,1037,1036,1035,1034,1034,1033,1032]
-downtime_100 = [100,100,100,100,100,100,100,100,100,100,100]
-frate = [5,0,0,0,0,0,4,4,10,0,0]
-matused = ['   No Info', '   32.4 KG', '   42.5 KG', '   No Info', '   No Info', '   No Info', '   No Info', '   No Info', '   No Info', '   No Info', '   No Info']
-matwaste = ['   No Info', '   4.2 KG', '   5.5 KG', '   No Info', '   No Info', '   No Info', '   No Info', '   No Info', '   No Info', '   No Info', '   No Info']
-availability = np.round(np.array(downtime_100) - np.array(pdt),1)
-quality = np.array(downtime_100) - np.array(frate)
-oee = np.round(performance * quality * availability / 10000,1)
-runtime = ['Running', 'Running', 'Running', 'Stopped', 'Running' , 'Running' , 'Stopped', 'Running', 'Running', 'Running', 'Running'
-]
-count = 0
-for i in processes:
-    process_data[i]['availability'] = availability[count]
-    process_data[i]['quality'] = quality[count]
-    process_data[i]['performance'] = performance[count]
-    process_data[i]['oee'] = oee[count]
-    process_data[i]['unitsproduced'] = unitsproduced[count]
-    process_data[i]['matused'] = '   ' + matused[count]
-    process_data[i]['matwaste'] = '   ' + matwaste[count]
-    process_data[i]['fpr'] = frate[count]
-    process_data[i]['cur'] = current_run_time[count]
-    process_data[i]['exp'] = expected_run_time[count]
-    count += 1 
-
-status_divs = []
-status_rows = []
-for i in range(0, len(processes), 2):  # Iterate in steps of 2
-    row_divs = []
-    for j in range(i, min(i + 2, len(processes))):  # Create a row with up to 2 items
-        process = processes[j]
-        status = runtime[j]
-        status_color = 'green' if status == 'Running' else 'red'
-        row_divs.append(
-            html.Div(
-                [
-                    html.Div(
-                        process,
-                        style={
-                            'fontSize': '15px',
-                            'fontWeight': 'bold',
-                            'textAlign': 'center',
-                            'marginBottom': '5px'  # Space between process name and status
-                        }
-                    ),
-                    html.Div(
-                        status,
-                        style={
-                            'margin': '4px',
-                            'fontSize': '13px',
-                            'fontWeight': 'bold',
-                            'color': 'white',
-                            'backgroundColor': status_color,
-                            'padding': '5px',
-                            'borderRadius': '5px',
-                            'display': 'inline-block'
-                        }
-                    )
-                ],
-                style={
-                    'width': '45%',  # Adjust the width to fit two items per row
-                    'textAlign': 'center',
-                    'margin': '5px'
-                }
+processes = engine.names
+
+# Stages, WIP and bottleneck of each line, updated from the changed stations
+flow = FlowModel(engine, load_topology(FLOW_TOPOLOGY_PATH) if FLOW_TOPOLOGY_PATH else None)
+
+
+def material_text(value, of=None):
+    if value is None:
+        return '   No Info'
+    if of:
+        return f'   {value} KG ({value * 100 / of:.1f}%)'
+    return f'   {value} KG'
+
+
+def station_data(name, detail=None):
+    data = dict(process_data.get(name, {}))
+    data.update(details.get(name) if detail is None else detail)
+    data.update(engine.station(name))
+    idx = engine.index[name]
+    if engine.materials is not None and engine.materials.has(idx):
+        # Live weigh-scale totals replace the data source's figures
+        totals = engine.materials.station(idx)
+        data['mat_used'] = round(totals['used'], 1)
+        data['mat_waste'] = round(totals['waste'], 1)
+    data['matused'] = material_text(data.get('mat_used'))
+    data['matwaste'] = material_text(data.get('mat_waste'), data.get('mat_used'))
+    return data
+
+
+def station_store(names):
+    # One batched detail fetch, not one query per station
+    fetched = details.get_many(names)
+    return {name: station_data(name, fetched.get(name, {})) for name in names}
+
+
+def status_of(view, j):
+    running = view['running'][j]
+    if view['members'] is None:
+        return ('Running', 'green') if running else ('Stopped', 'red')
+    members = view['members'][j]
+    color = 'green' if running == members else 'orange' if running else 'red'
+    return f'{running}/{members} Running', color
+
+
+def anomaly_of(view, j):
+    """Badge text for the flagged stations in row ``j``, or None."""
+    if anomalies is None:
+        return None
+    row_of = view['row_of']
+    flagged = [idx for idx in list(anomalies.flags) if idx < len(row_of) and row_of[idx] == j]
+    if not flagged:
+        return None
+    if view['members'] is None:
+        measures = anomalies.flags.get(flagged[0], ())
+        return 'Low ' + '/'.join(measure[0].upper() for measure in measures)
+    return f'{len(flagged)} Low'
+
+
+def build_status_rows(view, start=0, stop=None):
+    names = view['names']
+    stop = len(names) if stop is None else min(stop, len(names))
+    status_rows = []
+    for i in range(start, stop, 2):  # Iterate in steps of 2
+        row_divs = []
+        for j in range(i, min(i + 2, stop)):  # Create a row with up to 2 items
+            process = names[j]
+            status, status_color = status_of(view, j)
+            badges = [
+                html.Div(process, className='status-label'),
+                html.Div(status, className='status-badge',
+                         style={'backgroundColor': status_color})
+            ]
+            anomaly = anomaly_of(view, j)
+            if anomaly:
+                badges.append(html.Div(anomaly, className='anomaly-badge',
+                                       title='Below forecast (availability/performance/quality)'))
+            row_divs.append(
+                html.Div(
+                    badges,
+                    className='status-cell'  # Two cells per row, see assets/oee.css
+                )
             )
-        )
-    
-    # Center the last row if it contains only one item
-    if len(row_divs) == 1:
-        row_divs[0] = html.Div(
-            row_divs[0],
-            style={
-                'width': '100%',  # Full width for centering
-                'display': 'flex',
-                'justifyContent': 'center'
-            }
-        )
-    
-    status_rows.append(
-        html.Div(
-            row_divs,
-            style={'display': 'flex', 'justifyContent': 'space-between'}  # Display items side by side
-        )
-    )
+
+        # Center the last row if it contains only one item
+        if len(row_divs) == 1:
+            row_divs[0] = html.Div(row_divs[0], className='status-center')
+
+        status_rows.append(html.Div(row_divs, className='status-row'))
+    return status_rows
 
 
 app = dash.Dash(__name__)
 server = app.server
 
-app.layout = html.Div([
-    html.Div([
-        html.H1("Overview", style={'textAlign': 'center'}),
-        html.P("This section includes an overview of the entire process statistics, such as Lot Times, Down Times and Units Produced."),
+render_cache = RenderCache(RENDER_CACHE_SIZE, RENDER_CACHE_TTL)
+figure_factory = FigureFactory()
+# Live pushes and delta updates both need the version and view each client
+# shows, kept in the live-version store
+TRACK_VIEW = bool(LIVE_INTERVAL_MS or DELTA_UPDATES)
+init_metrics(server, engine, render_cache)
+if COMPRESS_MIN_BYTES:
+    # Registered after the metrics hook so it runs first: payload metrics
+    # record the bytes actually sent
+    init_compression(server, COMPRESS_MIN_BYTES, COMPRESS_LEVEL)
+
+startup.mark('dash app')
+
+
+def make_view(kpi, plant=None, line=None, page=0):
+    return build_view(kpi, engine, plant, line, page, PAGE_SIZE)
+
+
+def summary_text(view):
+    scope = ' / '.join(name for name in (view['plant'], view['line']) if name) or 'All plants'
+    summary = view['summary']
+    text = (f"{scope}: OEE {summary['oee']:.1f}% "
+            f"(Availability {summary['availability']:.1f}%, Performance {summary['performance']:.1f}%, "
+            f"Quality {summary['quality']:.1f}%)")
+    if view['line'] is not None:
+        line = flow.line(engine.lines.index((engine.plants.index(view['plant']), view['line'])))
+        if line['bottleneck'] is not None:
+            text += f" | Line OEE {line['oee']:.1f}% at bottleneck {line['bottleneck']}, WIP {line['wip']:.0f}"
+    return text
+
+
+def build_overview(view, figures=True):
+    overview = {}
+    if figures:
+        with FIGURE_SECONDS.time(), phase('figures'):
+            overview.update(figure_factory.figures(view))
+        with phase('status_grid'):
+            overview['status-grid'] = [
+                html.H3('Status', style={'textAlign': 'center', 'marginBottom': '20px'}),  # Title centered
+                *build_status_rows(view)
+            ]
+    with phase('summary'):
+        overview['hierarchy-summary'] = summary_text(view)
+    return overview
+
+
+def scope_stations(kpi, view):
+    return [name for name, inside in zip(kpi['names'], view['in_scope']) if inside]
+
+
+def layout_values(figure_json=False):
+    """Every KPI-dependent prop of the layout, by slot name.
+
+    With ``figure_json`` the overview figures are given as the factory's
+    cached JSON text instead of figure dicts.
+    """
+    kpi = engine.kpis()
+    view = make_view(kpi)
+    overview = build_overview(view)
+    step_stations = scope_stations(kpi, view)
+    figures = figure_factory.json(view) if figure_json else overview
+    values = {fid: figures[fid] for fid in FIGURE_IDS}
+    values.update({
+        'status-grid': overview['status-grid'],
+        'hierarchy-summary': overview['hierarchy-summary'],
+        'plants': engine.plants,
+        'plant': view['plant'],
+        'lines': lines_of(engine, view['plant']),
+        'line': view['line'],
+        'pages': view['pages'],
+        'steps': [{'label': key, 'value': key} for key in step_stations],
+        'step': step_stations[0] if step_stations else None,
+    })
+    if TRACK_VIEW:
+        values['live-state'] = live_state(view, len(kpi['names']))
+    if CLIENTSIDE_STEP_VIEW:
+        values['station-store'] = station_store(kpi['names'])
+    return values
+
+
+def layout_slots():
+    """Names of the ``layout_values`` entries."""
+    return (FIGURE_IDS + ['status-grid', 'hierarchy-summary', 'plants', 'plant', 'lines', 'line',
+                          'pages', 'steps', 'step']
+            + (['live-state'] if TRACK_VIEW else [])
+            + (['station-store'] if CLIENTSIDE_STEP_VIEW else []))
+
+
+def build_layout(values):
+    live = live_components(values['live-state'], LIVE_INTERVAL_MS) if TRACK_VIEW else []
+    stations = [dcc.Store(id='station-store', data=values['station-store'])] if CLIENTSIDE_STEP_VIEW else []
+
+    return html.Div([
         html.Div([
-        dcc.Graph(
-        id='bar-graph',
-        figure={
-            'data': [
-                go.Bar(
-                    y=processes,
-                    x=expected_run_time_percentage,
-                    name='Expected Run Time (%)',
-                    marker_color='red',
-                    opacity=0.6,
-                    orientation='h'
+            html.H1("Overview", style={'textAlign': 'center'}),
+            html.P("This section includes an overview of the entire process statistics, such as Lot Times, Down Times and Units Produced."),
+            *live,
+            html.Div([
+                dcc.Dropdown(
+                    id='plant-filter',
+                    options=values['plants'],
+                    value=values['plant'],
+                    placeholder='All plants',
+                    style={'width': '250px'}
                 ),
-                go.Bar(
-                    y=processes,
-                    x=np.round(np.array(current_run_time) * 100/np.array(expected_run_time),0),
-                    name='Current Run Time (%)',
-                    marker_color='green',
-                    orientation='h'
-                )
-            ],
-            'layout': go.Layout(
-                barmode='overlay',
-                title='Performance of steps process (%)',
-                yaxis={'title': 'Processes', 'automargin' : True},
-                xaxis={'title': 'Run Time (%)'},
-                legend={'x': 1, 'y': 1},
-                hovermode='closest'
-            )
-        }
-    ),
-    ], style={'width': '50%', 'display': 'inline-block'}),
-    html.Div([
-        dcc.Graph(
-        id='bar-graph2',
-        figure={
-            'data': [
-                go.Bar(
-                    y=processes,
-                    x=downtime_100,
-                    name='Total Downtime (%)',
-                    marker_color='red',
-                    opacity=0.6,
-                    orientation='h'
+                dcc.Dropdown(
+                    id='line-filter',
+                    options=values['lines'],
+                    value=values['line'],
+                    placeholder='All lines',
+                    style={'width': '250px'}
                 ),
-                go.Bar(
-                    y=processes,
-                    x=np.round(np.array(downtime_100) - np.array(pdt),0),
-                    name='Total Uptime (%)',
-                    marker_color='green',
-                    orientation='h'
-                )
-            ],
-            'layout': go.Layout(
-                barmode='overlay',
-                title= 'Availability of steps process (%)',
-                yaxis={'title': 'Processes', 'automargin' : True},
-                xaxis={'title': 'Run Time (%)'},
-                legend={'x': 1, 'y': 1},
-                hovermode='closest'
-            )
-        }
-    ),
-
+                html.Div(
+                    dcc.Slider(id='page', min=1, max=values['pages'], step=1, value=1),
+                    style={'flex': '1'}
+                ),
+            ], style={'display': 'flex', 'gap': '10px', 'alignItems': 'center'}),
+            html.Div(values['hierarchy-summary'], id='hierarchy-summary',
+                     style={'marginTop': '10px', 'fontWeight': 'bold'}),
+            html.Div([
+                dcc.Graph(id='bar-graph', figure=values['bar-graph']),
+            ], style={'width': '50%', 'display': 'inline-block'}),
+            html.Div([
+                dcc.Graph(id='bar-graph2', figure=values['bar-graph2']),
+            ], style={'width': '50%', 'display': 'inline-block'}),
+            html.Div([
+                dcc.Graph(id='bar-graph3', figure=values['bar-graph3']),
+            ], style={'width': '50%', 'display': 'inline-block'}),
+            html.Div([
+                dcc.Graph(id='bar-graph4', figure=values['bar-graph4']),
+            ], style={'width': '50%', 'display': 'inline-block'}),
 
-        ], style={'width': '50%', 'display': 'inline-block'}),
-        html.Div([
-        dcc.Graph(
-        id='bar-graph3',
-        figure={
-            'data': [
-                go.Bar(
-                    y=processes,
-                    x=downtime_100,
-                    name='Failure Rate (%)',
-                    marker_color='red',
-                    opacity=0.6,
-                    orientation='h'
+            html.Div([
+                html.Div(
+                    dcc.Graph(id='bar-graph5', figure=values['bar-graph5']),
+                    style={'width': '75%', 'padding': '10px'}  # Adjust width and add padding
                 ),
-                go.Bar(
-                    y=processes,
-                    x=np.array(downtime_100) - np.array(frate),
-                    name='Functional Rate (%)',
-                    marker_color='green',
-                    orientation='h',
-                    text=np.array(downtime_100) - np.array(frate),  # Adding the value labels
-                    textposition='auto' 
-                )
-            ],
-            'layout': go.Layout(
-                barmode='overlay',
-                title='Quality of steps process (%)',
-                yaxis={'title': 'Processes', 'automargin' : True},
-                xaxis={'title': 'Run Time (%)'},
-                legend={'x': 1, 'y': 1},
-                hovermode='closest'
-            )
-        }
-    ),
-    ], style={'width': '50%', 'display': 'inline-block'}),
-
-    html.Div([
-        dcc.Graph(
-        id='bar-graph4',
-        figure={
-            'data': [
-                go.Bar(
-                    y=processes,
-                    x=oee,
-                    marker_color='#004D40',
-                    opacity=0.6,
-                    orientation='h',
-                    text=oee,  # Adding the value labels
-                    textposition='auto'  # Automatically position the labels
+                html.Div(
+                    values['status-grid'],
+                    id='status-grid',
+                    style={'width': '25%', 'padding': '10px'}  # Adjust width and add padding
                 )
-            ],
-            'layout': go.Layout(
-                barmode='overlay',
-                title= 'Overall Equipment Effectiveness, OEE(%)',
-                yaxis={'title': 'Processes', 'automargin' : True},
-                xaxis={'title': 'Effectiveness (%)'},
-                legend={'x': 1, 'y': 1},
-                hovermode='closest'
-            )
-        }
-    ),
+            ], style={'display': 'flex', 'flexDirection': 'row'}),
 
+            # Add more content here for the overview section
+        ], style={'width': '75%', 'float': 'left', 'padding': '20px', 'backgroundColor': '#f1f1f1', 'borderRadius': '10px'}),
 
-        ], style={'width': '50%', 'display': 'inline-block'}),
-        
-        
         html.Div([
-    html.Div(
-        dcc.Graph(
-            id='bar-graph5',
-            figure={
-                'data': [
-                    go.Bar(
-                        y=processes,
-                        x=unitsproduced,
-                        name='Total Units Produced',
-                        marker_color='blue',
-                        opacity=0.6,
-                        orientation='h',
-                        text=unitsproduced
-                    )
-                ],
-                'layout': go.Layout(
-                    barmode='overlay',
-                    title='Total Units Produced by each Step',
-                    yaxis={'title': 'Processes', 'automargin': True},
-                    xaxis={'title': 'Total Units Produced'},
-                    legend={'x': 1, 'y': 1},
-                    hovermode='closest'
-                )
-            }
-        ),
-        style={'width': '75%', 'padding': '10px'}  # Adjust width and add padding
-    ),
-    html.Div(
-        [
-            html.H3('Status', style={'textAlign': 'center', 'marginBottom': '20px'}),  # Title centered
-            *status_rows
-        ],
-        style={'width': '25%', 'padding': '10px'}  # Adjust width and add padding
-    )
-], style={'display': 'flex', 'flexDirection': 'row'}),
-        
-        # Add more content here for the overview section
-    ], style={'width': '75%', 'float': 'left', 'padding': '20px', 'backgroundColor': '#f1f1f1', 'borderRadius': '10px'}),
-    
-    html.Div([
-        html.H1("Specific Step View", style={'textAlign': 'center'}),
-        html.P("You can view specific statistics regarding each step here"),
-        dcc.Dropdown(
-            id='dropdown-example',
-            options=[{'label': key, 'value': key} for key in process_data.keys()],
-            value='Paste Grinding',
-            style={'width': '100%', 'padding': '10px', 'borderRadius': '10px'}
-        ),
-        html.Div(id='dropdown-content-example', style={'marginTop': '20px'}),
-    ], style={'width': '25%', 'float': 'right', 'padding': '20px', 'backgroundColor': '#f9f9f9', 'borderRadius': '10px'})
-], style={'width': '100%', 'padding': '20px', 'display': 'flex', 'flexDirection': 'row'})
+            html.H1("Specific Step View", style={'textAlign': 'center'}),
+            html.P("You can view specific statistics regarding each step here"),
+            dcc.Dropdown(
+                id='dropdown-example',
+                options=values['steps'],
+                value=values['step'],
+                style={'width': '100%', 'padding': '10px', 'borderRadius': '10px'}
+            ),
+            *stations,
+            html.Div(id='dropdown-content-example', style={'marginTop': '20px'}),
+        ], style={'width': '25%', 'float': 'right', 'padding': '20px', 'backgroundColor': '#f9f9f9', 'borderRadius': '10px'})
+    ], style={'width': '100%', 'padding': '20px', 'display': 'flex', 'flexDirection': 'row'})
+
+
+def serve_layout():
+    return build_layout(layout_values())
+
+
+if FAST_START:
+    # The tree is compiled once, or loaded from the artifact of an earlier
+    # start, and each page load only serializes the values of its slots
+    slots = layout_slots()
+    here = os.path.dirname(os.path.abspath(__file__))
+    layout_key = source_key([os.path.join(here, name) for name in ('app.py', 'live.py')],
+                            dash.__version__, slots, LIVE_INTERVAL_MS)
+    layout_template = LayoutTemplate.load(LAYOUT_CACHE_PATH, layout_key) if LAYOUT_CACHE_PATH else None
+    if layout_template is None:
+        layout_template = LayoutTemplate.compile(build_layout(placeholders(slots)))
+        if LAYOUT_CACHE_PATH:
+            layout_template.save(LAYOUT_CACHE_PATH, layout_key)
+    layout_json = (None, None)
+
+    def serve_layout_json():
+        global layout_json
+        version, text = layout_json
+        if version != engine.version:
+            version = engine.version
+            with phase('layout_values'):
+                values = layout_values(figure_json=True)
+            with phase('json'):
+                values.update({slot: to_json(values[slot]) for slot in slots
+                               if slot not in FIGURE_IDS})
+                text = layout_template.render(values)
+            layout_json = (version, text)
+        return Response(text, mimetype='application/json')
+
+    # Only callback validation sees the placeholder tree; browsers get
+    # serve_layout_json
+    app.layout = lambda: build_layout(placeholders(slots))
+    server.view_functions[app.config.routes_pathname_prefix + '_dash-layout'] = serve_layout_json
+else:
+    # Rebuilt on every page load so browsers always get the current KPIs
+    app.layout = serve_layout
+
+startup.mark('layout')
+
+
 
 @app.callback(
-    Output('dropdown-content-example', 'children'),
-    Input('dropdown-example', 'value')
+    [Output(fid, 'figure', allow_duplicate=True) for fid in FIGURE_IDS]
+    + [
+        Output('status-grid', 'children', allow_duplicate=True),
+        Output('hierarchy-summary', 'children', allow_duplicate=True),
+        Output('line-filter', 'options'),
+        Output('line-filter', 'value'),
+        Output('page', 'max'),
+        Output('page', 'value'),
+        Output('dropdown-example', 'options'),
+    ]
+    + ([Output('live-version', 'data', allow_duplicate=True)] if TRACK_VIEW else []),
+    Input('plant-filter', 'value'),
+    Input('line-filter', 'value'),
+    Input('page', 'value'),
+    *([State('live-version', 'data')] if TRACK_VIEW else []),
+    prevent_initial_call=True
 )
-def render_content(selected_process):
-    if selected_process in process_data:
-        status_text = process_data[selected_process]['status']
-        status_color = 'red' if status_text == 'Stopped' else 'green'
-        lot_num = process_data[selected_process]['lot_num']
-        if 'availability' in process_data[selected_process]:
-            return html.Div([
-                html.Div(
-                        f'Running Status: {status_text}',
-                        style={
-                            'marginTop': '10px',
-                            'fontSize': '18px',
-                            'fontWeight': 'bold',
-                            'color': 'white',
-                            'backgroundColor': status_color,
-                            'padding': '10px',
-                            'borderRadius': '5px',
-                            'display': 'inline-block'
-                        }
-                    ),
-                    html.Div(
-                        f'Current Lot: {lot_num}',
-                        style={
-                            'marginTop': '20px',
-                            'fontSize': '18px',
-                            'fontWeight': 'bold'
-                        }
-                    ),
-                    html.Div(style={
-                            'marginTop': '20px',
-                            'fontSize': '18px',
-                            'fontWeight': 'bold',
-                            'marginTop': '20px'
-                        }),
+def update_view(plant, line, page, client=None):
+    # Filtering and paging happen here, so browsers only get the rows on screen
+    if ctx.triggered_id == 'plant-filter':
+        line, page = None, 1
+    elif ctx.triggered_id == 'line-filter':
+        page = 1
+    with phase('kpis'):
+        kpi = engine.kpis()
+    with phase('view'):
+        view = make_view(kpi, plant, line, (page or 1) - 1)
+    overview = build_overview(view)
+    # Every overview figure keeps its layout and traces across views, so in
+    # delta mode only the bar data that differs from what the client shows
+    # goes out, or all of it once that figure has left the cache
+    shown = None
+    if DELTA_UPDATES and client:
+        shown = figure_factory.cached(client['version'], tuple(client['view']))
+    figures = [data_patch(overview[fid], shown and shown[fid]) if DELTA_UPDATES else overview[fid]
+               for fid in FIGURE_IDS]
+    outputs = figures + [
+        overview['status-grid'],
+        overview['hierarchy-summary'],
+        lines_of(engine, view['plant']),
+        view['line'],
+        view['pages'],
+        view['page'] + 1,
+        scope_stations(kpi, view),
+    ]
+    if TRACK_VIEW:
+        outputs.append(live_state(view, len(kpi['names'])))
+    return outputs
+
+
+if LIVE_INTERVAL_MS:
+    register_live_updates(app, engine, figure_factory, make_view, build_overview,
+                          build_status_rows, station_store if CLIENTSIDE_STEP_VIEW else None)
+
+
+def run_status(status_text, margin_top):
+    status_color = 'red' if status_text == 'Stopped' else 'green'
+    return html.Div(
+        f'Running Status: {status_text}',
+        className='run-status',
+        style={'marginTop': margin_top, 'backgroundColor': status_color}
+    )
+
+
+def gauge(label, value):
+    daq = startup.lazy_import('dash_daq')
+    return html.Div([
+        daq.Gauge(
+            color={"gradient": True, "ranges": {"green": [80, 100], "yellow": [50, 80], "red": [0, 50]}},
+            value=value,
+            label=label,
+            max=100,
+            min=0,
+            size=150
+        ),
+        html.Div(f"{value}%", className='gauge-value')
+    ], className='gauge-card')
+
+
+def card_row(left, right, right_spaced=False):
+    return html.Div([
+        html.Div(html.Div(left, className='card'), className='card-cell spaced'),
+        html.Div(html.Div(right, className='card'),
+                 className='card-cell spaced' if right_spaced else 'card-cell'),
+    ], className='card-row')
+
+
+def material_pie(selected_process, data):
+    """Good (used - waste) against wasted material, from the live ledger
+    totals once the station has readings; None without material data."""
+    used = data.get('mat_used')
+    if not used:
+        return None
+    waste = data.get('mat_waste') or 0
+    px = startup.lazy_import('plotly.express')
+    with phase('plotly_figure'):
+        fig = px.pie(values=[used - waste, waste], names=['Good', 'Waste'], hole=.5)
+        fig.update_layout(title=f'{selected_process} Material Waste', width=400, height=400)
+    return dcc.Graph(
+        id=f'graph-{selected_process.lower().replace(" ", "-")}',
+        figure=fig,
+        style={'marginTop': '20px'}
+    )
+
+
+def render_station(selected_process, data):
+    # Shared looks live in assets/oee.css; only per-station values stay inline
+    status_text = data['status']
+    lot_num = data['lot_num']
+    if 'availability' in data:
+        pie = material_pie(selected_process, data)
+        return html.Div([
+            run_status(status_text, '10px'),
+            html.Div(f'Current Lot: {lot_num}', className='step-text'),
+            html.Div(className='step-text'),
+            html.Div([
                 html.Div([
-    html.Div([
-        html.Div([
-            daq.Gauge(
-                color={"gradient": True, "ranges": {"green": [80, 100], "yellow": [50, 80], "red": [0, 50]}},
-                value=process_data[selected_process]['availability'],
-                label='Availability',
-                max=100,
-                min=0,
-                size=150
-            ),
-            html.Div(f"{process_data[selected_process]['availability']}%", 
-                     style={'text-align': 'center', 'margin-top': '10px', 'font-weight': 'bold'})
-        ], style={'border': '2px solid #ccc', 'padding': '10px', 'border-radius': '1px', 'text-align': 'center'}),
-        
-        html.Div([
-            daq.Gauge(
-                color={"gradient": True, "ranges": {"green": [80, 100], "yellow": [50, 80], "red": [0, 50]}},
-                value=process_data[selected_process]['performance'],
-                label='Performance',
-                max=100,
-                min=0,
-                size=150
-            ),
-            html.Div(f"{process_data[selected_process]['performance']}%", 
-                     style={'text-align': 'center', 'margin-top': '10px', 'font-weight': 'bold'})
-        ], style={'border': '2px solid #ccc', 'padding': '10px', 'border-radius': '1px', 'text-align': 'center'})
-    ], style={'display': 'flex', 'justify-content': 'space-between'}),
-    
-    html.Div([
-        html.Div([
-            daq.Gauge(
-                color={"gradient": True, "ranges": {"green": [80, 100], "yellow": [50, 80], "red": [0, 50]}},
-                value=process_data[selected_process]['quality'],
-                label='Quality',
-                max=100,
-                min=0,
-                size=150
-            ),
-            html.Div(f"{process_data[selected_process]['quality']}%", 
-                     style={'text-align': 'center', 'margin-top': '10px', 'font-weight': 'bold'})
-        ], style={'border': '2px solid #ccc', 'padding': '10px', 'border-radius': '1px', 'text-align': 'center'}),
-        
-        html.Div([
-            daq.Gauge(
-                color={"gradient": True, "ranges": {"green": [80, 100], "yellow": [50, 80], "red": [0, 50]}},
-                value=process_data[selected_process]['oee'],  # Assuming this is intended
-                label='OEE',
-                max=100,
-                min=0,
-                size=150
-            ),
-            html.Div(f"{process_data[selected_process]['oee']}%", 
-                     style={'text-align': 'center', 'margin-top': '10px', 'font-weight': 'bold'})
-        ], style={'border': '2px solid #ccc', 'padding': '10px', 'border-radius': '1px', 'text-align': 'center'})
-    ], style={'display': 'flex', 'justify-content': 'space-between', 'margin-top': '10px'})
-]),
-        html.Div([
-        html.Div([
-            html.Div(f"Units Produced: {process_data[selected_process]['unitsproduced']}",
-                     style={'border': '2px solid #ccc', 'padding': '10px', 'border-radius': '10px', 'text-align': 'center', 'font-weight': 'bold'}),
-        ], style={'flex': '1', 'margin-right': '10px'}),
-        
-        html.Div([
-            html.Div(f"Failure Rate: {process_data[selected_process]['fpr']}%",
-                     style={'border': '2px solid #ccc', 'padding': '10px', 'border-radius': '10px', 'text-align': 'center', 'font-weight': 'bold'}),
-        ], style={'flex': '1', 'margin-right': '10px'})
-    ], style={'display': 'flex', 'justify-content': 'space-between', 'margin-top': '20px'}),
-    
-    html.Div([
-        html.Div([
-            html.Div(f"Materials Used: {process_data[selected_process]['matused']}",
-                     style={'border': '2px solid #ccc', 'padding': '10px', 'border-radius': '10px', 'text-align': 'center', 'font-weight': 'bold'}),
-        ], style={'flex': '1', 'margin-right': '10px'}),
-        
-        html.Div([
-            html.Div(f"Materials Wasted: {process_data[selected_process]['matwaste']}",
-                     style={'border': '2px solid #ccc', 'padding': '10px', 'border-radius': '10px', 'text-align': 'center', 'font-weight': 'bold'}),
-        ], style={'flex': '1'})
-    ], style={'display': 'flex', 'justify-content': 'space-between', 'margin-top': '20px'}),
+                    gauge('Availability', data['availability']),
+                    gauge('Performance', data['performance']),
+                ], className='gauge-row'),
+                html.Div([
+                    gauge('Quality', data['quality']),
+                    gauge('OEE', data['oee']),
+                ], className='gauge-row', style={'margin-top': '10px'}),
+            ]),
+            card_row(f"Units Produced: {data['unitsproduced']}", f"Failure Rate: {data['fpr']}%",
+                     right_spaced=True),
+            card_row(f"Materials Used: {data['matused']}", f"Materials Wasted: {data['matwaste']}"),
+            card_row(f"Expected Lot Run Time: {data['exp']} Hours",
+                     f"Current Lot Run Time: {data['cur']} Hours"),
+        ] + ([pie] if pie is not None else []))
+    else: 
+        return html.Div([
+            run_status(status_text, '5px'),
+            html.Div(f'Current Lot: {lot_num}', className='step-text'),
+            html.Div()
+        ])
 
-    html.Div([
-        html.Div([
-            html.Div(f"Expected Lot Run Time: {process_data[selected_process]['exp']} Hours",
-                     style={'border': '2px solid #ccc', 'padding': '10px', 'border-radius': '10px', 'text-align': 'center', 'font-weight': 'bold'}),
-        ], style={'flex': '1', 'margin-right': '10px'}),
-        
-        html.Div([
-            html.Div(f"Current Lot Run Time: {process_data[selected_process]['cur']} Hours",
-                     style={'border': '2px solid #ccc', 'padding': '10px', 'border-radius': '10px', 'text-align': 'center', 'font-weight': 'bold'}),
-        ], style={'flex': '1'})
-    ], style={'display': 'flex', 'justify-content': 'space-between', 'margin-top': '20px'})
-
-            ])
-            
-        elif 'mat_used' in process_data[selected_process]:
-            mat_used =str(process_data[selected_process]['mat_used']) + " (KG)"
-            mat_waste = str(process_data[selected_process]['mat_waste']) + " (KG)"
-            fig = px.pie(
-                values=[process_data[selected_process]['mat_used']-process_data[selected_process]['mat_waste'], 100 - process_data[selected_process]['mat_waste']],
-                names=['Waste', 'Used'],
-                hole=.5
-            )
-            fig.update_layout(title=f'{selected_process} Material Waste',
-                              width=400,  # Set the desired width
-                                height=400)
-            return html.Div([
-                html.Div(
-                        f'Running Status: {status_text}',
-                        style={
-                            'marginTop': '20px',
-                            'fontSize': '18px',
-                            'fontWeight': 'bold',
-                            'color': 'white',
-                            'backgroundColor': status_color,
-                            'padding': '10px',
-                            'borderRadius': '5px',
-                            'display': 'inline-block'
-                        }
-                    ),
-                    html.Div(
-                        f'Current Lot: {lot_num}',
-                        style={
-                            'marginTop': '20px',
-                            'fontSize': '18px',
-                            'fontWeight': 'bold'
-                        }
-                    ),
-                    
-                    html.Div(),
-                    dcc.Graph(
-                        id=f'graph-{selected_process.lower().replace(" ", "-")}',
-                        figure=fig,
-                        style={'marginTop': '20px'}
-                    ),
-                    html.Div(
-                        f'Materials Used: {mat_used}',
-                        style={
-                            'marginTop': '20px',
-                            'fontSize': '18px',
-                            'fontWeight': 'bold'
-                        }
-                    ),
-                    html.Div(
-                        f'Materials Wasted: {mat_waste}',
-                        style={
-                            'marginTop': '20px',
-                            'fontSize': '18px',
-                            'fontWeight': 'bold'
-                        }
-                    ),
-            ])
-        else: 
-            return html.Div([
-                    html.Div(
-                        f'Running Status: {status_text}',
-                        style={
-                            'marginTop': '5px',
-                            'fontSize': '18px',
-                            'fontWeight': 'bold',
-                            'color': 'white',
-                            'backgroundColor': status_color,
-                            'padding': '10px',
-                            'borderRadius': '5px',
-                            'display': 'inline-block'
-                        }
-                    ),
-                    html.Div(
-                        f'Current Lot: {lot_num}',
-                        style={
-                            'marginTop': '20px',
-                            'fontSize': '18px',
-                            'fontWeight': 'bold'
-                        }
-                    ),
-                    html.Div()
-                    
-])
+
+def build_station(selected_process):
+    with phase('station_data'):
+        data = station_data(selected_process)
+    with phase('render_tree'):
+        return render_station(selected_process, data)
+
+
+@RENDER_SECONDS.time()
+def render_content(selected_process):
+    if selected_process in engine:
+        return render_cache.get(
+            selected_process,
+            engine.version_of(selected_process),
+            lambda: build_station(selected_process)
+        )
+
+
+if CLIENTSIDE_STEP_VIEW:
+    app.clientside_callback(
+        ClientsideFunction(namespace='oee', function_name='render_station'),
+        Output('dropdown-content-example', 'children'),
+        Input('dropdown-example', 'value'),
+        Input('station-store', 'data')
+    )
+else:
+    app.callback(
+        Output('dropdown-content-example', 'children'),
+        Input('dropdown-example', 'value')
+    )(render_content)
+
+
+@server.before_request
+def register_daq():
+    # The index page only loads the gauge bundle of component libraries
+    # imported by the time it is rendered
+    startup.lazy_import('dash_daq')
+
+
+startup.mark('callbacks')
+
+
+@server.route('/startup')
+def startup_report():
+    return jsonify(startup.report())
+
+
+@server.route('/render-cache')
+def render_cache_stats():
+    return jsonify(render_cache.stats())
+
+
+@server.route('/detail-cache')
+def detail_cache_stats():
+    return jsonify(details.stats())
+
+
+@server.route('/ingest')
+def ingest_stats():
+    if gateway is None:
+        abort(404)
+    return jsonify(gateway.stats())
+
+
+@server.route('/history/<level>')
+def history_trend(level):
+    station = request.args.get('station')
+    if level not in ('minute', 'hour', 'shift', 'day', 'week') or station not in engine:
+        abort(404)
+    try:
+        days = float(request.args.get('days', 7))
+    except ValueError:
+        abort(400)
+    if not np.isfinite(days) or days < 0:
+        abort(400)
+    end = time.time()
+    start = end - days * 86400
+    trend = history.trend('day' if level == 'week' else level, start, end,
+                          stations=[engine.index[station]], group=7 if level == 'week' else 1)
+    return jsonify({
+        key: [None if np.isnan(v) else float(v) for v in values[:, 0]] if values.ndim == 2
+        else values.tolist()
+        for key, values in trend.items()
+    })
+
+
+def request_scope(args, default_window):
+    """``(start, end, stations)`` of a report request: the last ``hours`` or
+    a named ``window`` (``default_window`` when neither is given), and the
+    indices of one ``station`` or of the stations of ``plant``/``line``."""
+    end = time.time()
+    try:
+        if 'hours' in args:
+            hours = float(args['hours'])
+            if not np.isfinite(hours) or hours < 0:
+                abort(400)
+            start = end - hours * 3600
+        else:
+            start, end = window(args.get('window', default_window), end)
+    except ValueError:
+        abort(400)
+    station = args.get('station')
+    if station is not None:
+        if station not in engine:
+            abort(404)
+        return start, end, [engine.index[station]]
+    view = make_view(engine.kpis(), args.get('plant'), args.get('line'))
+    return start, end, np.flatnonzero(view['in_scope']).tolist()
+
+
+@server.route('/materials')
+def materials_report():
+    """Material used/waste totals: per material type and per shift for a
+    station, line or plant over ``window`` or the last ``hours``, plus the
+    station's current or given ``lot``."""
+    if engine.materials is None:
+        abort(404)
+    start, end, stations = request_scope(request.args, 'day')
+    station = request.args.get('station')
+    report = {
+        'materials': engine.materials.by_type(stations),
+        'shifts': engine.materials.shifts(start, end, stations),
+    }
+    if station is not None:
+        idx = engine.index[station]
+        lot = request.args.get('lot', type=int, default=int(engine.lot_num[idx]))
+        report.update(engine.materials.station(idx), lot=lot,
+                      lot_totals=engine.materials.lot(idx, lot))
+    return jsonify(report)
+
+
+@server.route('/downtime')
+def downtime_report():
+    """Availability and downtime Pareto for a station, line or plant over
+    ``window`` (shift, last_shift, day, last_day) or the last ``hours``."""
+    if engine.downtime is None:
+        abort(404)
+    start, end, stations = request_scope(request.args, 'shift')
+    spans = [engine.downtime.availability(idx, start, end) for idx in stations]
+    up = sum(span['up_time'] for span in spans)
+    observed = sum(span['observed'] for span in spans)
+    return jsonify({
+        'start': start,
+        'end': end,
+        'stations': len(stations),
+        'up_time': up,
+        'down_time': observed - up,
+        'availability': up * 100 / observed if observed > 0 else None,
+        'pareto': engine.downtime.pareto(stations, start, end),
+    })
+
+
+@server.route('/anomalies')
+def anomaly_report():
+    """Stations below forecast, with the latest forecast of each measure."""
+    if anomalies is None:
+        abort(404)
+    return jsonify({
+        'method': anomalies.method,
+        'passes': anomalies.passes,
+        'stations': {engine.names[idx]: {'below': measures, 'forecast': anomalies.forecasts.get(idx, {})}
+                     for idx, measures in list(anomalies.flags.items())},
+    })
+
+
+@server.route('/flow')
+def line_flow():
+    """Stages, WIP between them, throughput and bottleneck of the lines of
+    ``plant`` (all plants when omitted), or of one ``line``."""
+    plant = request.args.get('plant')
+    line = request.args.get('line')
+    if plant is not None and plant not in engine.plants:
+        abort(404)
+    codes = [code for code, (p, name) in enumerate(engine.lines)
+             if (plant is None or engine.plants[p] == plant) and (line is None or name == line)]
+    if line is not None and not codes:
+        abort(404)
+    return jsonify({
+        'lines': [dict(flow.line(code), plant=engine.plants[engine.lines[code][0]], line=engine.lines[code][1])
+                  for code in codes],
+    })
+
+
+exports = ExportJobs(EXPORT_DIR, EXPORT_WORKERS, EXPORT_KEEP)
+
+
+@server.route('/exports', methods=['POST'])
+def start_export():
+    """Queue a ``report`` (kpis, shift or history) of a station, line or
+    plant as csv or parquet; poll /exports/<id> and fetch
+    /exports/<id>/download once it is done."""
+    args = request.values
+    report = args.get('report', 'shift')
+    fmt = args.get('format', 'csv')
+    level = args.get('level', 'hour')
+    if report not in REPORTS or fmt not in available_formats() or level not in history.levels:
+        abort(400)
+    start, end, stations = request_scope(args, 'last_shift')
+    if report == 'kpis':
+        chunks = lambda: kpi_chunks(engine, stations, station_store)
+    elif report == 'shift':
+        chunks = lambda: shift_chunks(engine, history, stations, start, end, station_store)
+    else:
+        chunks = lambda: history_chunks(engine, history, stations, level, start, end, EXPORT_CHUNK_ROWS)
+    job = exports.submit(report, fmt, chunks, start=start, end=end, level=level, stations=len(stations))
+    response = jsonify(job)
+    response.status_code = 202
+    response.headers['Location'] = f"/exports/{job['id']}"
+    return response
+
+
+@server.route('/exports/<job_id>')
+def export_status(job_id):
+    job = exports.status(job_id)
+    if job is None:
+        abort(404)
+    return jsonify(job)
+
+
+@server.route('/exports/<job_id>/download')
+def export_download(job_id):
+    job = exports.status(job_id)
+    if job is None:
+        abort(404)
+    path = exports.file(job_id)
+    if path is None:
+        abort(409)
+    stamp = time.strftime('%Y%m%d-%H%M', time.localtime(job['params']['start']))
+    return send_file(path, as_attachment=True, download_name=f"oee-{job['report']}-{stamp}.{job['format']}")
+
+
+# Per-request phase timings, last so every route's view gets wrapped
+if PROFILE_REQUESTS:
+    init_profiling(server, PROFILE_SAMPLE_PERCENT, PROFILE_KEEP)
 
 
 if __name__ == '__main__':
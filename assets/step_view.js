@@ -0,0 +1,104 @@
+// Clientside renderer for the Specific Step View (OEE_CLIENTSIDE_STEP_VIEW).
+// Mirrors render_station() in app.py using the per-station metrics shipped
+// once in the 'station-store' dcc.Store.
+(function () {
+    // Shared looks come from the classes in oee.css, as in app.py
+    function div(children, className, style) {
+        var props = {children: children};
+        if (className) {
+            props.className = className;
+        }
+        if (style) {
+            props.style = style;
+        }
+        return {type: 'Div', namespace: 'dash_html_components', props: props};
+    }
+
+    function gauge(label, value) {
+        return div([
+            {
+                type: 'Gauge',
+                namespace: 'dash_daq',
+                props: {
+                    color: {gradient: true, ranges: {green: [80, 100], yellow: [50, 80], red: [0, 50]}},
+                    value: value,
+                    label: label,
+                    max: 100,
+                    min: 0,
+                    size: 150
+                }
+            },
+            div(value + '%', 'gauge-value')
+        ], 'gauge-card');
+    }
+
+    function cardRow(left, right, rightSpaced) {
+        return div([
+            div(div(left, 'card'), 'card-cell spaced'),
+            div(div(right, 'card'), rightSpaced ? 'card-cell spaced' : 'card-cell')
+        ], 'card-row');
+    }
+
+    function header(data, marginTop) {
+        var statusColor = data.status === 'Stopped' ? 'red' : 'green';
+        return [
+            div('Running Status: ' + data.status, 'run-status',
+                {marginTop: marginTop, backgroundColor: statusColor}),
+            div('Current Lot: ' + data.lot_num, 'step-text')
+        ];
+    }
+
+    // Good (used - waste) against wasted material, as material_pie() in app.py
+    function materialPie(name, data) {
+        if (!data.mat_used) {
+            return [];
+        }
+        var waste = data.mat_waste || 0;
+        return [{
+            type: 'Graph',
+            namespace: 'dash_core_components',
+            props: {
+                id: 'graph-' + name.toLowerCase().replace(/ /g, '-'),
+                figure: {
+                    data: [{
+                        type: 'pie',
+                        values: [data.mat_used - waste, waste],
+                        labels: ['Good', 'Waste'],
+                        hole: 0.5
+                    }],
+                    layout: {title: {text: name + ' Material Waste'}, width: 400, height: 400}
+                },
+                style: {marginTop: '20px'}
+            }
+        }];
+    }
+
+    function renderStation(name, data) {
+        if ('availability' in data) {
+            return div(header(data, '10px').concat([
+                div(null, 'step-text'),
+                div([
+                    div([gauge('Availability', data.availability), gauge('Performance', data.performance)],
+                        'gauge-row'),
+                    div([gauge('Quality', data.quality), gauge('OEE', data.oee)],
+                        'gauge-row', {'margin-top': '10px'})
+                ]),
+                cardRow('Units Produced: ' + data.unitsproduced, 'Failure Rate: ' + data.fpr + '%', true),
+                cardRow('Materials Used: ' + data.matused, 'Materials Wasted: ' + data.matwaste, false),
+                cardRow('Expected Lot Run Time: ' + data.exp + ' Hours', 'Current Lot Run Time: ' + data.cur + ' Hours', false)
+            ].concat(materialPie(name, data))));
+        }
+        return div(header(data, '5px').concat([div(null)]));
+    }
+
+    window.dash_clientside = Object.assign({}, window.dash_clientside, {
+        oee: {
+            render_station: function (selected, stations) {
+                if (!stations || !(selected in stations)) {
+                    return null;
+                }
+                return renderStation(selected, stations[selected]);
+            }
+        }
+    });
+})();
@@ -0,0 +1,160 @@
+"""Offline benchmarks for layout, callbacks and OEE computation.
+
+Generates synthetic plants in the data source row shape, loads each into the
+app and times the hot paths without a browser or network:
+
+    python benchmarks.py --sizes 10 100 1000 10000 --output bench.json
+
+Results are JSON so runs can be diffed between commits.
+"""
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+import numpy as np
+from plotly.io.json import to_json_plotly
+
+import app
+from datasource import DataSource, MemoryBackend
+from figures import build_figures
+from oee_engine import OEEEngine
+
+STATIONS_PER_LINE = 15
+LINES_PER_PLANT = 40
+
+
+def synthetic_rows(n, seed=0):
+    rng = np.random.default_rng(seed)
+    rows = []
+    for i in range(n):
+        line = i // STATIONS_PER_LINE
+        exp = float(rng.integers(1, 100))
+        units = int(rng.integers(0, 2000))
+        row = {
+            'name': f'Station {i}',
+            'plant': f'Plant {line // LINES_PER_PLANT + 1}',
+            'line': f'Line {line % LINES_PER_PLANT + 1}',
+            'status': 'Running' if rng.random() < 0.8 else 'Stopped',
+            'lot_num': int(rng.integers(10000, 30000)),
+            'cur': round(exp * rng.random(), 1),
+            'exp': exp,
+            'pdt': float(rng.integers(0, 60)),
+            'units': units,
+            'rejects': int(units * rng.random() * 0.1),
+            'x': [1, 2, 3, 4, 5],
+            'y': rng.integers(0, 20, 5).tolist(),
+        }
+        if i % 5 == 1:
+            row['mat_used'] = round(float(rng.uniform(10, 50)), 1)
+            row['mat_waste'] = round(float(rng.uniform(0, 8)), 1)
+        rows.append(row)
+    return rows
+
+
+def install(rows):
+    """Point the app at a fresh engine loaded from ``rows``."""
+    source = DataSource(MemoryBackend(rows))
+    engine = OEEEngine()
+    source.refresh(engine)
+    app.source, app.engine, app.process_data = source, engine, source.stations
+    # Caches keyed on the engine version must not serve the previous engine
+    app.figure_factory = app.FigureFactory()
+    app.flow = app.FlowModel(engine)
+    app.render_cache.invalidate()
+    app.details.invalidate()
+    return engine
+
+
+def timed(fn, repeat):
+    times = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return {'min_s': min(times), 'median_s': statistics.median(times)}, result
+
+
+def size(obj):
+    return len(to_json_plotly(obj).encode())
+
+
+def bench_size(n, repeat):
+    rows = synthetic_rows(n)
+    engine = install(rows)
+    result = {'stations': n}
+
+    def events():
+        for i in range(10000):
+            engine.unit_count(engine.names[i % n], 1)
+
+    stats, _ = timed(events, repeat)
+    result['engine_events'] = dict(stats, events_per_s=10000 / stats['median_s'])
+
+    def kpis():
+        engine.version += 1  # defeat the per-version cache
+        return engine.kpis()
+
+    result['engine_kpis'], kpi = timed(kpis, repeat)
+    result['view'], view = timed(lambda: app.make_view(kpi), repeat)
+    result['figures'], figures = timed(lambda: build_figures(view), repeat)
+    result['figures']['bytes'] = size(figures)
+
+    def layout():
+        app.figure_factory = app.FigureFactory()
+        return app.serve_layout()
+
+    result['layout'], tree = timed(layout, repeat)
+    result['layout']['bytes'] = size(tree)
+
+    # Station 1 has material totals, so its full panel carries the pie
+    full = app.station_data(engine.names[0])
+    pie = app.station_data(engine.names[1])
+    status = {key: value for key, value in app.station_data(engine.names[2]).items()
+              if key not in ('availability', 'mat_used')}
+    for branch, name, data in (('full', engine.names[0], full),
+                               ('full_material_pie', engine.names[1], pie),
+                               ('status_only', engine.names[2], status)):
+        stats, tree = timed(lambda: app.render_station(name, data), repeat)
+        result[f'render_{branch}'] = dict(stats, bytes=size(tree))
+
+    app.render_content(engine.names[0])
+    result['render_content_cached'], _ = timed(lambda: app.render_content(engine.names[0]), repeat)
+    return result
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000, 10000])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', help='write JSON here instead of stdout')
+    args = parser.parse_args(argv)
+
+    report = {
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'page_size': app.PAGE_SIZE,
+        'results': [bench_size(n, args.repeat) for n in args.sizes],
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+    else:
+        sys.stdout.write(text + '\n')
+
+
+if __name__ == '__main__':
+    main()
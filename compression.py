@@ -0,0 +1,68 @@
+"""Response compression for the Flask server behind Dash.
+
+Layouts and callback responses are repetitive JSON and shrink 5-10x. Brotli
+is used when the ``brotli`` package is installed and the browser accepts it,
+gzip otherwise; bodies under ``min_bytes`` go out as they are. Static bundles
+carry an ETag, so their compressed bytes are cached instead of recompressing
+plotly.js on every page load.
+"""
+import gzip
+import threading
+
+from cachetools import LRUCache
+from flask import request
+
+COMPRESSIBLE = ('application/json', 'text/html', 'text/css', 'application/javascript',
+                'text/javascript', 'text/plain', 'text/csv')
+
+
+def _brotli():
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli
+
+
+def _encoding(accept, brotli):
+    accepted = {part.split(';')[0].strip() for part in accept.split(',')}
+    if brotli is not None and 'br' in accepted:
+        return 'br'
+    if 'gzip' in accepted:
+        return 'gzip'
+    return None
+
+
+def init_compression(server, min_bytes=1024, level=6):
+    brotli = _brotli()
+    cache = LRUCache(64)
+    lock = threading.Lock()
+
+    @server.after_request
+    def compress(response):
+        if (response.direct_passthrough or 'Content-Encoding' in response.headers
+                or response.mimetype not in COMPRESSIBLE or response.status_code < 200
+                or response.status_code >= 300):
+            return response
+        response.vary.add('Accept-Encoding')
+        encoding = _encoding(request.headers.get('Accept-Encoding', ''), brotli)
+        if encoding is None:
+            return response
+        etag = response.get_etag()[0]
+        with lock:
+            body = cache.get((encoding, etag)) if etag else None
+        if body is None:
+            body = response.get_data()
+            if len(body) < min_bytes:
+                return response
+            if encoding == 'br':
+                # Brotli quality runs 0-11; keep it fast enough for per-request use
+                body = brotli.compress(body, quality=min(level, 11))
+            else:
+                body = gzip.compress(body, compresslevel=min(level, 9), mtime=0)
+            if etag:
+                with lock:
+                    cache[encoding, etag] = body
+        response.set_data(body)
+        response.headers['Content-Encoding'] = encoding
+        return response
@@ -0,0 +1,112 @@
+"""Runtime settings, read from environment variables."""
+import os
+import tempfile
+
+
+def _int(name, default):
+    return int(os.environ.get(name, default))
+
+
+# Milliseconds between live KPI pushes to open dashboards; 0 disables them.
+LIVE_INTERVAL_MS = _int('OEE_LIVE_INTERVAL_MS', 0)
+
+# Rendered Specific Step View trees kept in memory, and their max age in
+# seconds (0 keeps them until the station changes or is evicted).
+RENDER_CACHE_SIZE = _int('OEE_RENDER_CACHE_SIZE', 256)
+RENDER_CACHE_TTL = _int('OEE_RENDER_CACHE_TTL', 0)
+
+# Render the Specific Step View in the browser from a dcc.Store instead of
+# a server round trip per dropdown change.
+CLIENTSIDE_STEP_VIEW = _int('OEE_CLIENTSIDE_STEP_VIEW', 0) == 1
+
+# Production data source: 'memory' (bundled sample plant), 'sqlite' or 'mysql'
+DB_BACKEND = os.environ.get('OEE_DB_BACKEND', 'memory')
+DB_HOST = os.environ.get('OEE_DB_HOST', 'localhost')
+DB_PORT = _int('OEE_DB_PORT', 3306)
+DB_USER = os.environ.get('OEE_DB_USER', 'oee')
+DB_PASSWORD = os.environ.get('OEE_DB_PASSWORD', '')
+DB_NAME = os.environ.get('OEE_DB_NAME', 'oee')
+DB_PATH = os.environ.get('OEE_DB_PATH', ':memory:')
+DB_POOL_SIZE = _int('OEE_DB_POOL_SIZE', 4)
+# Seconds between full reloads from the data source; 0 loads once at startup.
+DB_REFRESH_SECONDS = _int('OEE_DB_REFRESH_SECONDS', 0)
+
+# Seconds between OEE history captures (0 disables history), and the HDF5
+# file the history is persisted to and restored from ('' keeps it in memory).
+HISTORY_CAPTURE_SECONDS = _int('OEE_HISTORY_CAPTURE_SECONDS', 60)
+HISTORY_PATH = os.environ.get('OEE_HISTORY_PATH', '')
+
+# Rows per page in the overview bar charts and status grid
+PAGE_SIZE = _int('OEE_PAGE_SIZE', 25)
+
+# TCP port of the machine-event ingestion gateway (0 disables it), and the
+# number of frames it buffers before pushing back on senders.
+INGEST_HOST = os.environ.get('OEE_INGEST_HOST', '0.0.0.0')
+INGEST_PORT = _int('OEE_INGEST_PORT', 0)
+INGEST_QUEUE_SIZE = _int('OEE_INGEST_QUEUE_SIZE', 1024)
+
+# Memory-mapped KPI table shared by all gunicorn workers, e.g.
+# /dev/shm/oee-kpis ('' keeps the state in each process). When set, run
+# updater.py once next to the workers; it owns the engine, the data source
+# and the ingest gateway and publishes every SHARED_PUBLISH_MS milliseconds.
+# Elapsed time is accrued every SHARED_TICK_SECONDS: a tick changes every
+# station, so ticking on each publish would defeat the workers' caches.
+SHARED_STATE_PATH = os.environ.get('OEE_SHARED_STATE_PATH', '')
+SHARED_CAPACITY = _int('OEE_SHARED_CAPACITY', 16384)
+SHARED_PUBLISH_MS = _int('OEE_SHARED_PUBLISH_MS', 500)
+SHARED_TICK_SECONDS = _int('OEE_SHARED_TICK_SECONDS', 30)
+# History file the updater saves after every capture and the workers reload
+# (HISTORY_PATH, or one next to the shared table)
+SHARED_HISTORY_PATH = HISTORY_PATH or (SHARED_STATE_PATH + '.history.h5' if SHARED_STATE_PATH else '')
+
+# Per-station detail (material totals, ...) is loaded on first use: how many
+# stations' detail to keep, for how many seconds (0 until evicted), and how
+# many neighbours on each side of an opened station to prefetch.
+DETAIL_CACHE_SIZE = _int('OEE_DETAIL_CACHE_SIZE', 512)
+DETAIL_CACHE_TTL = _int('OEE_DETAIL_CACHE_TTL', 0)
+DETAIL_PREFETCH = _int('OEE_DETAIL_PREFETCH', 2)
+
+# Serve the page layout from a template compiled once instead of building
+# the component tree per page load, optionally stored as a JSON artifact that
+# later starts reuse while the code and settings are unchanged.
+FAST_START = _int('OEE_FAST_START', 0) == 1
+LAYOUT_CACHE_PATH = os.environ.get('OEE_LAYOUT_CACHE', '')
+
+# Compress responses of at least COMPRESS_MIN_BYTES (0 disables compression)
+# with brotli when installed, gzip otherwise, at COMPRESS_LEVEL.
+COMPRESS_MIN_BYTES = _int('OEE_COMPRESS_MIN_BYTES', 1024)
+COMPRESS_LEVEL = _int('OEE_COMPRESS_LEVEL', 6)
+
+# Send overview changes as patches of the figure data instead of whole
+# figures when the plant/line/page selection changes: only the arrays that
+# differ from what the client shows.
+DELTA_UPDATES = _int('OEE_DELTA_UPDATES', 0) == 1
+
+# Seconds between anomaly passes over the history (0 disables them): each
+# station's A/P/Q is forecast by a model in one of ANOMALY_WORKERS processes
+# ('arima' needs pmdarima, 'ewma' is built in, 'auto' picks arima when
+# installed) and flagged when it falls ANOMALY_THRESHOLD deviations below.
+# Runs only with a process-local engine and HISTORY_CAPTURE_SECONDS set.
+ANOMALY_SECONDS = _int('OEE_ANOMALY_SECONDS', 0)
+ANOMALY_WORKERS = _int('OEE_ANOMALY_WORKERS', 2)
+ANOMALY_METHOD = os.environ.get('OEE_ANOMALY_METHOD', 'auto')
+ANOMALY_THRESHOLD = float(os.environ.get('OEE_ANOMALY_THRESHOLD', 3))
+
+# Directory of exported reports, background threads writing them, how many
+# finished exports to keep, and rows per written chunk.
+EXPORT_DIR = os.environ.get('OEE_EXPORT_DIR', os.path.join(tempfile.gettempdir(), 'oee-exports'))
+EXPORT_WORKERS = _int('OEE_EXPORT_WORKERS', 1)
+EXPORT_KEEP = _int('OEE_EXPORT_KEEP', 50)
+EXPORT_CHUNK_ROWS = _int('OEE_EXPORT_CHUNK_ROWS', 50000)
+
+# JSON file listing each line's stages (parallel machines) and buffer sizes
+# for the flow model; '' infers stages from station names.
+FLOW_TOPOLOGY_PATH = os.environ.get('OEE_FLOW_TOPOLOGY', '')
+
+# Record per-phase timings of every request, run PROFILE_SAMPLE_PERCENT of
+# them under cProfile and tracemalloc, and serve the slowest of the last
+# PROFILE_KEEP at /debug/slow. Off by default: the debug routes expose code
+# paths and timings.
+PROFILE_REQUESTS = _int('OEE_PROFILE_REQUESTS', 0) == 1
+PROFILE_SAMPLE_PERCENT = float(os.environ.get('OEE_PROFILE_SAMPLE_PERCENT', 1))
+PROFILE_KEEP = _int('OEE_PROFILE_KEEP', 500)
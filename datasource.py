@@ -0,0 +1,336 @@
+"""Production data access.
+
+A ``DataSource`` loads the summary state of every station with one batched
+query per refresh and seeds the OEE engine from it. Per-station detail such
+as material totals is fetched on demand, one station at a time when a
+station is opened and in batches for bulk reads. The storage is a pluggable backend:
+MySQL through a bounded ``mysql.connector`` pool in production, SQLite or an
+in-memory list of rows for development and tests.
+"""
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+COLUMNS = ('name', 'plant', 'line', 'status', 'lot_num', 'cur', 'exp', 'pdt',
+           'units', 'rejects')
+DETAIL_COLUMNS = ('mat_used', 'mat_waste')
+
+# One round trip for all stations: latest state, lot and reject totals joined
+# on the station table. ``{filter}`` is empty or a parameterized IN clause.
+STATIONS_QUERY = '''
+SELECT s.name, s.plant, s.line, st.status, st.lot_num, st.cur_run_time, st.expected_run_time,
+       st.planned_downtime, COALESCE(q.units, 0), COALESCE(q.rejects, 0)
+FROM stations s
+JOIN station_state st ON st.station_id = s.id
+LEFT JOIN quality_counts q ON q.station_id = s.id
+{filter}
+ORDER BY s.position
+'''
+
+DETAIL_QUERY = '''
+SELECT m.mat_used, m.mat_waste
+FROM stations s
+JOIN material_totals m ON m.station_id = s.id
+WHERE s.name = {mark}
+'''
+
+# Detail of up to DETAIL_BATCH stations per round trip, for bulk reads
+DETAILS_QUERY = '''
+SELECT s.name, m.mat_used, m.mat_waste
+FROM stations s
+JOIN material_totals m ON m.station_id = s.id
+WHERE s.name IN ({marks})
+'''
+DETAIL_BATCH = 500
+
+# Ideal seconds per unit; a NULL station is the product's default
+CYCLE_TIMES_QUERY = 'SELECT product, station, seconds FROM ideal_cycle_times'
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS stations (
+    id INTEGER PRIMARY KEY,
+    name VARCHAR(64) NOT NULL UNIQUE,
+    plant VARCHAR(64) NOT NULL DEFAULT 'Plant 1',
+    line VARCHAR(64) NOT NULL DEFAULT 'Line 1',
+    position INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS station_state (
+    station_id INTEGER PRIMARY KEY REFERENCES stations(id),
+    status VARCHAR(16) NOT NULL,
+    lot_num INTEGER,
+    cur_run_time DOUBLE NOT NULL DEFAULT 0,
+    expected_run_time DOUBLE NOT NULL DEFAULT 0,
+    planned_downtime DOUBLE NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS quality_counts (
+    station_id INTEGER PRIMARY KEY REFERENCES stations(id),
+    units INTEGER NOT NULL DEFAULT 0,
+    rejects INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS material_totals (
+    station_id INTEGER PRIMARY KEY REFERENCES stations(id),
+    mat_used DOUBLE,
+    mat_waste DOUBLE
+);
+CREATE TABLE IF NOT EXISTS ideal_cycle_times (
+    product VARCHAR(64) NOT NULL,
+    station VARCHAR(64),
+    seconds DOUBLE NOT NULL,
+    UNIQUE (product, station)
+);
+'''
+
+
+class SQLBackend:
+    """Base for DB-API backends; subclasses provide ``connection()``."""
+
+    placeholder = '%s'
+
+    def query(self, sql, params=()):
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(sql, params)
+                return cursor.fetchall()
+            finally:
+                cursor.close()
+
+    def fetch_stations(self, names=None):
+        if names:
+            marks = ', '.join([self.placeholder] * len(names))
+            sql = STATIONS_QUERY.format(filter=f'WHERE s.name IN ({marks})')
+            rows = self.query(sql, tuple(names))
+        else:
+            rows = self.query(STATIONS_QUERY.format(filter=''))
+        return [dict(zip(COLUMNS, row)) for row in rows]
+
+    def fetch_detail(self, name):
+        rows = self.query(DETAIL_QUERY.format(mark=self.placeholder), (name,))
+        return dict(zip(DETAIL_COLUMNS, rows[0])) if rows else {}
+
+    def fetch_details(self, names):
+        details = {name: {} for name in names}
+        names = list(details)
+        for first in range(0, len(names), DETAIL_BATCH):
+            part = names[first:first + DETAIL_BATCH]
+            marks = ', '.join([self.placeholder] * len(part))
+            for row in self.query(DETAILS_QUERY.format(marks=marks), tuple(part)):
+                details[row[0]] = dict(zip(DETAIL_COLUMNS, row[1:]))
+        return details
+
+    def fetch_cycle_times(self):
+        return [dict(zip(('product', 'station', 'seconds'), row))
+                for row in self.query(CYCLE_TIMES_QUERY)]
+
+
+class MySQLBackend(SQLBackend):
+
+    def __init__(self, host, user, password, database, pool_size=4, port=3306):
+        from mysql.connector import pooling
+
+        self._pool = pooling.MySQLConnectionPool(
+            pool_name='oee',
+            pool_size=pool_size,
+            host=host,
+            port=port,
+            user=user,
+            password=password,
+            database=database,
+        )
+        # get_connection() raises PoolError when the pool is exhausted
+        # instead of waiting, so checkouts wait on this semaphore first
+        self._slots = threading.BoundedSemaphore(pool_size)
+
+    @contextmanager
+    def connection(self):
+        # Blocks once pool_size connections are checked out; close() returns
+        # the connection to the pool.
+        with self._slots:
+            conn = self._pool.get_connection()
+            try:
+                yield conn
+            finally:
+                conn.close()
+
+
+class SQLiteBackend(SQLBackend):
+
+    placeholder = '?'
+
+    def __init__(self, path=':memory:', pool_size=4):
+        self._pool = queue.Queue(maxsize=pool_size)
+        uri = path.startswith('file:')
+        if path == ':memory:':
+            # Share one in-memory database between the pooled connections
+            path, uri = f'file:oee-{id(self)}?mode=memory&cache=shared', True
+        for _ in range(pool_size):
+            self._pool.put(sqlite3.connect(path, uri=uri, check_same_thread=False))
+
+    @contextmanager
+    def connection(self):
+        conn = self._pool.get()
+        try:
+            yield conn
+        finally:
+            self._pool.put(conn)
+
+    def create_schema(self):
+        with self.connection() as conn:
+            conn.executescript(SCHEMA)
+
+    def insert_stations(self, rows):
+        with self.connection() as conn:
+            for position, row in enumerate(rows):
+                cursor = conn.execute(
+                    'INSERT INTO stations (name, plant, line, position) VALUES (?, ?, ?, ?)',
+                    (row['name'], row.get('plant', 'Plant 1'), row.get('line', 'Line 1'), position))
+                station_id = cursor.lastrowid
+                lot = row.get('lot_num')
+                conn.execute(
+                    'INSERT INTO station_state VALUES (?, ?, ?, ?, ?, ?)',
+                    (station_id, row['status'], None if lot == 'Nil' else lot,
+                     row.get('cur', 0), row.get('exp', 0), row.get('pdt', 0)))
+                conn.execute(
+                    'INSERT INTO quality_counts VALUES (?, ?, ?)',
+                    (station_id, row.get('units', 0), row.get('rejects', 0)))
+                if row.get('mat_used') is not None:
+                    conn.execute(
+                        'INSERT INTO material_totals VALUES (?, ?, ?)',
+                        (station_id, row['mat_used'], row.get('mat_waste')))
+            conn.commit()
+
+
+class MemoryBackend:
+    """In-memory stand-in; columns outside ``COLUMNS`` are station detail."""
+
+    def __init__(self, rows, cycle_times=()):
+        self.rows = [dict(row) for row in rows]
+        self.by_name = {row['name']: row for row in self.rows}
+        self.cycle_times = [dict(row) for row in cycle_times]
+
+    def fetch_stations(self, names=None):
+        rows = self.rows
+        if names:
+            wanted = set(names)
+            rows = [row for row in rows if row['name'] in wanted]
+        return [{key: row[key] for key in COLUMNS if key in row} for row in rows]
+
+    def fetch_detail(self, name):
+        row = self.by_name.get(name, {})
+        return {key: value for key, value in row.items() if key not in COLUMNS}
+
+    def fetch_details(self, names):
+        return {name: self.fetch_detail(name) for name in names}
+
+    def fetch_cycle_times(self):
+        return [dict(row) for row in self.cycle_times]
+
+
+def _figures(row):
+    """``OEEEngine.seed`` figures of a station row."""
+    lot = row.get('lot_num')
+    return {
+        'status': row['status'],
+        'lot_num': 'Nil' if lot is None else lot,
+        'cur': row.get('cur') or 0,
+        'exp': row.get('exp') or 0,
+        'pdt': row.get('pdt') or 0,
+        'units': row.get('units') or 0,
+        'rejects': row.get('rejects') or 0,
+    }
+
+
+class DataSource:
+
+    def __init__(self, backend):
+        self.backend = backend
+        # Latest row per station, in line order
+        self.stations = {}
+        # Bumped whenever a refresh changes the station rows
+        self.generation = 0
+        self._thread = None
+        self._stop = threading.Event()
+
+    @property
+    def processes(self):
+        return list(self.stations)
+
+    def fetch_detail(self, name):
+        return self.backend.fetch_detail(name)
+
+    def fetch_details(self, names):
+        """Detail dicts of ``names`` by name, in a few batched queries."""
+        return self.backend.fetch_details(names)
+
+    def refresh(self, engine, names=None):
+        rows = self.backend.fetch_stations(names)
+        changed = False
+        if not names:
+            for name in set(self.stations) - {row['name'] for row in rows}:
+                del self.stations[name]
+                changed = True
+        for row in rows:
+            name = row['name']
+            previous = self.stations.get(name)
+            if name in engine and previous == row:
+                # Live state has moved on from this row; nothing to reapply
+                continue
+            changed = True
+            self.stations[name] = row
+            engine.seed(name, plant=row.get('plant'), line=row.get('line'), **_figures(row),
+                        previous=_figures(previous) if previous is not None and name in engine else None)
+        if not names:
+            engine.set_cycle_times(self.backend.fetch_cycle_times())
+        if changed:
+            self.generation += 1
+        return rows
+
+    def start_refresh(self, engine, interval):
+        """Reload all stations every ``interval`` seconds in a daemon thread."""
+        def run():
+            while not self._stop.wait(interval):
+                self.refresh(engine)
+
+        self._thread = threading.Thread(target=run, name='oee-refresh', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+
+def make_source(backend, **options):
+    if backend == 'mysql':
+        return DataSource(MySQLBackend(
+            host=options['host'],
+            user=options['user'],
+            password=options['password'],
+            database=options['database'],
+            pool_size=options.get('pool_size', 4),
+            port=options.get('port', 3306),
+        ))
+    if backend == 'sqlite':
+        return DataSource(SQLiteBackend(options.get('path', ':memory:'),
+                                        options.get('pool_size', 4)))
+    if backend == 'memory':
+        from sample_data import SAMPLE_STATIONS
+
+        return DataSource(MemoryBackend(options.get('rows', SAMPLE_STATIONS)))
+    raise ValueError(f'Unknown data source backend: {backend}')
+
+
+def default_source():
+    """The data source configured through the ``OEE_DB_*`` settings."""
+    from config import (DB_BACKEND, DB_HOST, DB_NAME, DB_PASSWORD, DB_PATH, DB_POOL_SIZE,
+                        DB_PORT, DB_USER)
+
+    return make_source(
+        DB_BACKEND,
+        host=DB_HOST,
+        port=DB_PORT,
+        user=DB_USER,
+        password=DB_PASSWORD,
+        database=DB_NAME,
+        path=DB_PATH,
+        pool_size=DB_POOL_SIZE,
+    )
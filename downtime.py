@@ -0,0 +1,169 @@
+"""Event-accurate run/stop accounting per station.
+
+Every state change is appended to the station's ``Track``: sorted transition
+times, the state and downtime reason that start there, and the cumulative up
+time at each transition. Up time over any window is then two binary searches
+and a subtraction, so availability for a shift stays O(log n) however many
+months of transitions a station has. Reason Pareto charts sweep only the
+transitions inside the window.
+"""
+import time
+
+import numpy as np
+
+UNSPECIFIED = 'Unspecified'
+# Reason catalog; binary ingest frames address reasons by position in it
+REASONS = [UNSPECIFIED, 'Planned', 'Changeover', 'Breakdown', 'Material shortage',
+           'Quality issue', 'Idle']
+
+SHIFT_SECONDS = 8 * 3600
+DAY_SECONDS = 24 * 3600
+
+
+class Track:
+    """Transitions of one station, oldest first."""
+
+    def __init__(self, capacity=16):
+        self.n = 0
+        self.times = np.zeros(capacity)
+        self.running = np.zeros(capacity, dtype=bool)
+        self.reason = np.zeros(capacity, dtype=np.int16)
+        # Up time accrued from the first transition up to times[i]
+        self.up = np.zeros(capacity)
+
+    def _grow(self):
+        for field in ('times', 'running', 'reason', 'up'):
+            arr = getattr(self, field)
+            grown = np.zeros(len(arr) * 2, dtype=arr.dtype)
+            grown[:self.n] = arr[:self.n]
+            setattr(self, field, grown)
+
+    def record(self, ts, running, reason=0):
+        n = self.n
+        reason = 0 if running else reason
+        # Position after the transitions at or before ts; the one before it
+        # is the state in force at ts
+        if n == 0 or ts >= self.times[n - 1]:
+            i = n
+        else:
+            i = int(np.searchsorted(self.times[:n], ts, 'right'))
+        if i and self.running[i - 1] == running and self.reason[i - 1] == reason:
+            return
+        if n == len(self.times):
+            self._grow()
+        if i == n:
+            self.times[n] = ts
+            self.running[n] = running
+            self.reason[n] = reason
+            self.up[n] = self.up[n - 1] + (ts - self.times[n - 1]) * self.running[n - 1] if n else 0
+            self.n += 1
+            return
+        # Late event: insert in time order and redo the prefix sums after it
+        for field, value in (('times', ts), ('running', running), ('reason', reason)):
+            arr = getattr(self, field)
+            arr[i + 1:n + 1] = arr[i:n]
+            arr[i] = value
+        self.n += 1
+        self._prefix(max(i, 1))
+
+    def _prefix(self, start):
+        n = self.n
+        spans = np.diff(self.times[start - 1:n]) * self.running[start - 1:n - 1]
+        self.up[start:n] = self.up[start - 1] + np.cumsum(spans)
+
+    def up_at(self, ts):
+        i = int(np.searchsorted(self.times[:self.n], ts, 'right')) - 1
+        if i < 0:
+            return 0.0
+        return float(self.up[i] + (ts - self.times[i]) * self.running[i])
+
+    def observed(self, start, end):
+        """The part of ``[start, end)`` after the first transition."""
+        if not self.n:
+            return start, start
+        start = max(start, self.times[0])
+        return start, max(start, end)
+
+    def stops(self, start, end):
+        """Reason codes and clipped durations of stops overlapping the window."""
+        n = self.n
+        lo = max(int(np.searchsorted(self.times[:n], start, 'right')) - 1, 0)
+        hi = int(np.searchsorted(self.times[:n], end, 'left'))
+        times = self.times[lo:hi]
+        ends = np.append(self.times[lo + 1:hi], end)
+        durations = np.clip(np.minimum(ends, end) - np.maximum(times, start), 0, None)
+        stopped = ~self.running[lo:hi]
+        return self.reason[lo:hi][stopped], durations[stopped]
+
+
+class DowntimeLog:
+    """Transition tracks for every engine station, by station index."""
+
+    def __init__(self, reasons=REASONS):
+        self.reasons = list(reasons)
+        self._reason_codes = {name: code for code, name in enumerate(self.reasons)}
+        self.tracks = []
+
+    def __len__(self):
+        return len(self.tracks)
+
+    def reason_code(self, reason):
+        """Code of a reason name or catalog index; new names are appended."""
+        if reason is None:
+            return 0
+        if isinstance(reason, (int, np.integer)):
+            return int(reason) if 0 <= reason < len(self.reasons) else 0
+        if reason not in self._reason_codes:
+            self._reason_codes[reason] = len(self.reasons)
+            self.reasons.append(reason)
+        return self._reason_codes[reason]
+
+    def record(self, idx, ts, running, reason=None):
+        while len(self.tracks) <= idx:
+            self.tracks.append(Track())
+        self.tracks[idx].record(ts, bool(running), self.reason_code(reason))
+
+    def availability(self, idx, start, end):
+        """Up time, observed time and availability (%) of one station."""
+        track = self.tracks[idx]
+        start, end = track.observed(start, end)
+        up = track.up_at(end) - track.up_at(start)
+        observed = end - start
+        return {
+            'up_time': up,
+            'down_time': observed - up,
+            'observed': observed,
+            'availability': up * 100 / observed if observed > 0 else None,
+        }
+
+    def pareto(self, stations, start, end):
+        """Downtime per reason over the window, largest first, with the
+        cumulative share of the total."""
+        totals = np.zeros(len(self.reasons))
+        for idx in stations:
+            if idx < len(self.tracks):
+                reasons, durations = self.tracks[idx].stops(start, end)
+                totals += np.bincount(reasons, weights=durations, minlength=len(self.reasons))
+        order = [code for code in np.argsort(-totals, kind='stable') if totals[code] > 0]
+        total = totals.sum()
+        cumulative = np.cumsum(totals[order]) * 100 / total if total else []
+        return [
+            {'reason': self.reasons[code], 'seconds': float(totals[code]),
+             'percent': float(totals[code] * 100 / total), 'cumulative': float(share)}
+            for code, share in zip(order, cumulative)
+        ]
+
+
+def window(name, now=None, offset=6 * 3600):
+    """``(start, end)`` of 'shift', 'last_shift', 'day' or 'last_day'.
+
+    Shifts and days are aligned to ``offset`` like the history buckets.
+    """
+    now = time.time() if now is None else now
+    width = DAY_SECONDS if name in ('day', 'last_day') else SHIFT_SECONDS
+    start = (now - offset) // width * width + offset
+    if name in ('shift', 'day'):
+        return start, now
+    if name in ('last_shift', 'last_day'):
+        return start - width, start
+    raise ValueError(f'Unknown window: {name}')
@@ -0,0 +1,274 @@
+"""Bulk exports and shift reports.
+
+Reports are generators of column chunks (dicts of equal-length arrays) that
+the writers append to CSV, or to Parquet row groups when pyarrow is
+installed, one chunk at a time: memory depends on the chunk size, never on
+the number of stations or the length of the report window. Jobs run in a
+background executor, and each job's status is kept as JSON next to its
+output, so any worker can answer a status poll or serve the download.
+"""
+import csv
+import glob
+import importlib.util
+import json
+import logging
+import os
+import re
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+FORMATS = ('csv', 'parquet')
+REPORTS = ('kpis', 'shift', 'history')
+# Station columns of the overview charts and the Specific Step View
+KPI_KEYS = ('availability', 'performance', 'quality', 'oee', 'units', 'rejects', 'failure_rate',
+            'cur', 'exp', 'up_time', 'down_time')
+TREND_KEYS = ('availability', 'performance', 'quality', 'oee', 'units')
+DETAIL_KEYS = ('mat_used', 'mat_waste')
+_JOB_ID = re.compile(r'^[0-9a-f]{32}$')
+
+log = logging.getLogger(__name__)
+
+
+def _isotime(seconds):
+    return np.datetime_as_string((np.asarray(seconds) * 1000).astype('datetime64[ms]'), unit='s')
+
+
+def _hierarchy(engine, kpi, stations):
+    """Plant and line name arrays for ``stations``."""
+    lines = kpi['line'][stations]
+    line_names = np.array([name for _, name in engine.lines] or [''], dtype=object)
+    plant_names = np.array([engine.plants[plant] for plant, _ in engine.lines] or [''], dtype=object)
+    return plant_names[lines], line_names[lines]
+
+
+def _detail_columns(names, details):
+    found = details(list(names))
+    rows = [found.get(name, {}) for name in names]
+    return {key: np.array([np.nan if row.get(key) is None else row[key] for row in rows], dtype=float)
+            for key in DETAIL_KEYS}
+
+
+def coverage_level(history, start, now=None):
+    """Finest history level whose ring still holds ``start``."""
+    now = time.time() if now is None else now
+    for level, (width, slots) in history.levels.items():
+        if start >= now - width * (slots - 1):
+            return level
+    return list(history.levels)[-1]
+
+
+def kpi_chunks(engine, stations, details, chunk=1000):
+    """Current KPIs and detail panel fields, one row per station;
+    ``details(names)`` returns the detail dicts of a chunk by name."""
+    kpi = engine.kpis()
+    names = np.array(kpi['names'], dtype=object)
+    stations = np.asarray(stations, dtype=np.int64)
+    for first in range(0, len(stations), chunk):
+        part = stations[first:first + chunk]
+        plants, lines = _hierarchy(engine, kpi, part)
+        columns = {
+            'station': names[part],
+            'plant': plants,
+            'line': lines,
+            'status': np.where(kpi['running'][part], 'Running', 'Stopped'),
+            'lot_num': kpi['lot_num'][part],
+        }
+        columns.update({key: kpi[key][part] for key in KPI_KEYS})
+        columns.update(_detail_columns(names[part], details))
+        yield columns
+
+
+def shift_chunks(engine, history, stations, start, end, details, chunk=1000):
+    """A/P/Q/OEE and units over ``[start, end)`` per station, with the
+    current status, lot and material totals."""
+    kpi = engine.kpis()
+    names = np.array(kpi['names'], dtype=object)
+    stations = np.asarray(stations, dtype=np.int64)
+    stations = stations[stations < len(history.names)]
+    level = coverage_level(history, start)
+    for first in range(0, len(stations), chunk):
+        part = stations[first:first + chunk]
+        # One group spanning every bucket of the window
+        trend = history.trend(level, start, end, stations=part, group=2 ** 31)
+        plants, lines = _hierarchy(engine, kpi, part)
+        columns = {
+            'station': names[part],
+            'plant': plants,
+            'line': lines,
+            'start': np.full(len(part), _isotime(start), dtype=object),
+            'end': np.full(len(part), _isotime(end), dtype=object),
+        }
+        columns.update({key: (trend[key][0] if len(trend[key]) else np.full(len(part), np.nan))
+                        for key in TREND_KEYS})
+        columns['status'] = np.where(kpi['running'][part], 'Running', 'Stopped')
+        columns['lot_num'] = kpi['lot_num'][part]
+        columns.update(_detail_columns(names[part], details))
+        yield columns
+
+
+def history_chunks(engine, history, stations, level, start, end, chunk_rows=50000):
+    """A/P/Q/OEE per history bucket and station, oldest first; buckets with
+    no data are left out."""
+    stations = np.asarray(stations, dtype=np.int64)
+    stations = stations[stations < len(history.names)]
+    if not len(stations):
+        return
+    names = np.array(history.names, dtype=object)[stations]
+    plants, lines = _hierarchy(engine, engine.kpis(), stations)
+    width = history.levels[level][0]
+    step = max(1, chunk_rows // len(stations)) * width
+    first = (start - history.offset) // width * width + history.offset
+    for window in np.arange(first, end, step):
+        trend = history.trend(level, window, min(window + step, end), stations=stations)
+        values = {key: trend[key].ravel() for key in TREND_KEYS}
+        has_data = ~np.isnan(values['availability'])
+        buckets = len(trend['start'])
+        columns = {
+            'start': np.repeat(_isotime(trend['start']), len(stations))[has_data],
+            'station': np.tile(names, buckets)[has_data],
+            'plant': np.tile(plants, buckets)[has_data],
+            'line': np.tile(lines, buckets)[has_data],
+        }
+        columns.update({key: column[has_data] for key, column in values.items()})
+        if has_data.any():
+            yield columns
+
+
+def _csv_column(values):
+    values = np.asarray(values)
+    if values.dtype.kind == 'f':
+        return np.where(np.isnan(values), '', np.round(values, 3).astype(str)).tolist()
+    return values.tolist()
+
+
+def write_csv(chunks, path):
+    rows = 0
+    header = False
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        for chunk in chunks:
+            if not header:
+                writer.writerow(list(chunk))
+                header = True
+            columns = [_csv_column(values) for values in chunk.values()]
+            writer.writerows(zip(*columns))
+            rows += len(columns[0])
+    return rows
+
+
+def write_parquet(chunks, path):
+    import pyarrow
+    import pyarrow.parquet
+
+    rows = 0
+    writer = None
+    try:
+        for chunk in chunks:
+            table = pyarrow.table({key: values.tolist() if values.dtype.kind in 'OU' else values
+                                   for key, values in chunk.items()})
+            if writer is None:
+                writer = pyarrow.parquet.ParquetWriter(path, table.schema)
+            writer.write_table(table.cast(writer.schema))
+            rows += table.num_rows
+    finally:
+        if writer is not None:
+            writer.close()
+    if writer is None:
+        open(path, 'wb').close()
+    return rows
+
+
+WRITERS = {'csv': write_csv, 'parquet': write_parquet}
+
+
+def available_formats():
+    return [fmt for fmt in FORMATS
+            if fmt != 'parquet' or importlib.util.find_spec('pyarrow') is not None]
+
+
+class ExportJobs:
+
+    def __init__(self, directory, workers=1, keep=50):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.keep = keep
+        self._executor = ThreadPoolExecutor(workers, thread_name_prefix='oee-export')
+
+    def _path(self, job_id, suffix):
+        return os.path.join(self.directory, job_id + suffix)
+
+    def _save(self, job):
+        tmp = self._path(job['id'], '.json.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(job, f)
+        os.replace(tmp, self._path(job['id'], '.json'))
+
+    def submit(self, report, fmt, chunks, **params):
+        """Queue writing the chunks of ``chunks()`` as ``fmt``; returns the job."""
+        job = {
+            'id': uuid.uuid4().hex,
+            'report': report,
+            'format': fmt,
+            'params': params,
+            'state': 'queued',
+            'rows': 0,
+            'created': time.time(),
+        }
+        self._save(job)
+        self._prune()
+        self._executor.submit(self._run, job, chunks)
+        return dict(job)
+
+    def _progress(self, job, chunks):
+        for chunk in chunks:
+            yield chunk
+            job['rows'] += len(next(iter(chunk.values())))
+            self._save(job)
+
+    def _run(self, job, chunks):
+        job['state'] = 'running'
+        self._save(job)
+        path = self._path(job['id'], '.' + job['format'])
+        tmp = path + '.tmp'
+        try:
+            WRITERS[job['format']](self._progress(job, chunks()), tmp)
+            os.replace(tmp, path)
+        except Exception as exc:
+            log.exception('export %s failed', job['id'])
+            job.update(state='failed', error=str(exc), finished=time.time())
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        else:
+            job.update(state='done', bytes=os.path.getsize(path), finished=time.time())
+        self._save(job)
+
+    def status(self, job_id):
+        """The job's status, or None for an unknown id."""
+        if not _JOB_ID.match(job_id):
+            return None
+        try:
+            with open(self._path(job_id, '.json')) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def file(self, job_id):
+        """Path of a finished job's output, or None."""
+        job = self.status(job_id)
+        if job is None or job['state'] != 'done':
+            return None
+        return self._path(job_id, '.' + job['format'])
+
+    def _prune(self):
+        jobs = sorted(glob.glob(os.path.join(self.directory, '*.json')), key=os.path.getmtime)
+        for status in jobs[:max(0, len(jobs) - self.keep)]:
+            job_id = os.path.basename(status)[:-len('.json')]
+            for path in glob.glob(self._path(job_id, '.*')):
+                try:
+                    os.remove(path)
+                except OSError:
+                    # Already pruned by another worker
+                    pass
@@ -0,0 +1,169 @@
+"""Overview figure factory.
+
+All overview bar charts are described once in ``OVERVIEW``. Their columns are
+derived from the engine's KPI arrays in a single vectorized pass, the figures
+share one layout template, and both the figure dicts and their JSON are built
+at most once per engine version and view.
+"""
+import threading
+
+import numpy as np
+from cachetools import LRUCache
+from plotly.io.json import to_json_plotly as to_json
+
+# Derived columns, computed together from one KPI snapshot
+COLUMNS = {
+    'expected_pct': lambda kpi: np.where(kpi['exp'] > 0, 100, 0),
+    'run_pct': lambda kpi: np.round(kpi['performance'], 0),
+    'full': lambda kpi: np.full(len(kpi['names']), 100),
+    'uptime_pct': lambda kpi: np.round(kpi['availability'], 0),
+    'quality': lambda kpi: kpi['quality'],
+    'oee': lambda kpi: kpi['oee'],
+    'units': lambda kpi: kpi['units'],
+}
+
+OVERVIEW = [
+    {
+        'id': 'bar-graph',
+        'title': 'Performance of steps process (%)',
+        'xaxis': 'Run Time (%)',
+        'traces': [
+            {'name': 'Expected Run Time (%)', 'column': 'expected_pct', 'color': 'red', 'opacity': 0.6},
+            {'name': 'Current Run Time (%)', 'column': 'run_pct', 'color': 'green'},
+        ],
+    },
+    {
+        'id': 'bar-graph2',
+        'title': 'Availability of steps process (%)',
+        'xaxis': 'Run Time (%)',
+        'traces': [
+            {'name': 'Total Downtime (%)', 'column': 'full', 'color': 'red', 'opacity': 0.6},
+            {'name': 'Total Uptime (%)', 'column': 'uptime_pct', 'color': 'green'},
+        ],
+    },
+    {
+        'id': 'bar-graph3',
+        'title': 'Quality of steps process (%)',
+        'xaxis': 'Run Time (%)',
+        'traces': [
+            {'name': 'Failure Rate (%)', 'column': 'full', 'color': 'red', 'opacity': 0.6},
+            {'name': 'Functional Rate (%)', 'column': 'quality', 'color': 'green', 'text': 'auto'},
+        ],
+    },
+    {
+        'id': 'bar-graph4',
+        'title': 'Overall Equipment Effectiveness, OEE(%)',
+        'xaxis': 'Effectiveness (%)',
+        'traces': [
+            {'column': 'oee', 'color': '#004D40', 'opacity': 0.6, 'text': 'auto'},
+        ],
+    },
+    {
+        'id': 'bar-graph5',
+        'title': 'Total Units Produced by each Step',
+        'xaxis': 'Total Units Produced',
+        'traces': [
+            {'name': 'Total Units Produced', 'column': 'units', 'color': 'blue', 'opacity': 0.6, 'text': None},
+        ],
+    },
+]
+
+FIGURE_IDS = [spec['id'] for spec in OVERVIEW]
+
+# Shared by every overview figure; only the titles differ
+LAYOUT_TEMPLATE = {
+    'barmode': 'overlay',
+    'yaxis': {'title': {'text': 'Processes'}, 'automargin': True},
+    'legend': {'x': 1, 'y': 1},
+    'hovermode': 'closest',
+}
+
+
+def columns(kpi):
+    return {key: derive(kpi) for key, derive in COLUMNS.items()}
+
+
+def live_fields():
+    """Figure id -> [(trace index, trace attributes, column)] for patching."""
+    fields = {}
+    for spec in OVERVIEW:
+        fields[spec['id']] = [
+            (i, ('x', 'text') if 'text' in trace else ('x',), trace['column'])
+            for i, trace in enumerate(spec['traces'])
+        ]
+    return fields
+
+
+def _trace(trace, names, values):
+    data = {
+        'type': 'bar',
+        'orientation': 'h',
+        'y': names,
+        'x': values,
+        'marker': {'color': trace['color']},
+    }
+    if 'name' in trace:
+        data['name'] = trace['name']
+    if 'opacity' in trace:
+        data['opacity'] = trace['opacity']
+    if 'text' in trace:
+        data['text'] = values
+        if trace['text']:
+            data['textposition'] = trace['text']
+    return data
+
+
+def build_figures(kpi, cols=None):
+    cols = columns(kpi) if cols is None else cols
+    names = list(kpi['names'])
+    lists = {key: values.tolist() for key, values in cols.items()}
+    figures = {}
+    for spec in OVERVIEW:
+        layout = dict(LAYOUT_TEMPLATE)
+        layout['title'] = {'text': spec['title']}
+        layout['xaxis'] = {'title': {'text': spec['xaxis']}}
+        figures[spec['id']] = {
+            'data': [_trace(trace, names, lists[trace['column']]) for trace in spec['traces']],
+            'layout': layout,
+        }
+    return figures
+
+
+class FigureFactory:
+    """Caches the derived columns, figures and their JSON per KPI version
+    and view."""
+
+    def __init__(self, maxsize=64):
+        self._lock = threading.Lock()
+        self._cache = LRUCache(maxsize)
+
+    def _entry(self, kpi):
+        key = (kpi['version'], kpi.get('view'))
+        entry = self._cache.get(key)
+        if entry is None:
+            cols = columns(kpi)
+            entry = {'columns': cols, 'figures': build_figures(kpi, cols), 'json': None}
+            self._cache[key] = entry
+        return entry
+
+    def columns(self, kpi):
+        with self._lock:
+            return self._entry(kpi)['columns']
+
+    def figures(self, kpi):
+        with self._lock:
+            return self._entry(kpi)['figures']
+
+    def cached(self, version, view):
+        """Figures of an earlier version and view, or None once evicted."""
+        with self._lock:
+            entry = self._cache.get((version, view))
+            return entry['figures'] if entry is not None else None
+
+    def json(self, kpi):
+        """Figure id -> figure JSON, serialized once per version and view."""
+        with self._lock:
+            entry = self._entry(kpi)
+            if entry['json'] is None:
+                entry['json'] = {fid: to_json(figure) for fid, figure in entry['figures'].items()}
+            return entry['json']
@@ -0,0 +1,214 @@
+"""Line flow model.
+
+Each line is a sequence of stages. A stage is one station or several
+parallel machines: consecutive stations named like ``Machine 1``,
+``Machine 2`` by default, or the groups listed in a topology file. Between
+two stages sits a buffer holding the good units the upstream stage finished
+and the downstream stage has not taken yet (the WIP). The line's bottleneck
+is its stage with the lowest capacity (units per running hour), and the line
+OEE is that stage's OEE.
+
+Stage sums are kept incrementally: an update adds the deltas of the stations
+changed since the previous one, so a tick costs O(changed stations) plus a
+few vectorized passes over the stages.
+
+A topology file is JSON mapping ``"<plant>/<line>"`` to its stages in
+order, each ``{"stations": [...], "buffer": <capacity of the buffer in front
+of it>}``. Stations it does not list get a stage of their own.
+"""
+import json
+import re
+import threading
+
+import numpy as np
+
+UP, DOWN, UNITS, REJECTS, PERF, RUNNING = range(6)
+_PARALLEL = re.compile(r'^(.*?\S)\s*(\d+)$')
+
+
+def load_topology(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def _stage_name(names):
+    if len(names) == 1:
+        return names[0]
+    matches = [_PARALLEL.match(name) for name in names]
+    if all(matches) and len({match.group(1) for match in matches}) == 1:
+        return f"{matches[0].group(1)} {'/'.join(match.group(2) for match in matches)}"
+    return ' + '.join(names)
+
+
+def infer_stages(names):
+    """Group consecutive stations of a line whose names differ only in a
+    trailing number into parallel stages."""
+    stages = []
+    prefix = None
+    for name in names:
+        match = _PARALLEL.match(name)
+        key = match.group(1) if match else None
+        if stages and key is not None and key == prefix:
+            stages[-1].append(name)
+        else:
+            stages.append([name])
+        prefix = key
+    return stages
+
+
+class FlowModel:
+
+    def __init__(self, engine, topology=None):
+        self.engine = engine
+        self.topology = topology or {}
+        self._lock = threading.Lock()
+        self._shape = None
+        self._version = -1
+        self._flow = None
+        self._flow_version = -1
+
+    def _build(self, kpi):
+        engine = self.engine
+        n = len(kpi['names'])
+        station_stage = np.zeros(n, dtype=np.int64)
+        stage_line, stage_names, stage_members, buffers = [], [], [], []
+        for code, (plant, line) in enumerate(engine.lines):
+            members = [kpi['names'][i] for i in np.flatnonzero(kpi['line'] == code)]
+            listed = self.topology.get(f'{engine.plants[plant]}/{line}', [])
+            stages = [([name for name in stage['stations'] if name in engine], stage.get('buffer'))
+                      for stage in listed]
+            stages = [(names, buffer) for names, buffer in stages if names]
+            covered = {name for names, _ in stages for name in names}
+            stages += [(names, None) for names in infer_stages([m for m in members if m not in covered])]
+            for names, buffer in stages:
+                station_stage[[engine.index[name] for name in names]] = len(stage_names)
+                stage_line.append(code)
+                stage_names.append(_stage_name(names))
+                stage_members.append(names)
+                buffers.append(np.nan if buffer is None else float(buffer))
+        stage_line = np.array(stage_line, dtype=np.int64)
+        # Upstream stage of each stage within its line, -1 for the first
+        upstream = np.arange(len(stage_line)) - 1
+        upstream[np.r_[True, stage_line[1:] != stage_line[:-1]][:len(stage_line)]] = -1
+
+        self.station_stage = station_stage
+        self.stage_line = stage_line
+        self.stage_names = stage_names
+        self.stage_members = stage_members
+        self.buffers = np.array(buffers)
+        self.upstream = upstream
+        self.members = np.bincount(station_stage, minlength=len(stage_names))
+        self._last = self._station_values(kpi, slice(None))
+        self._sums = np.zeros((len(stage_names), self._last.shape[1]))
+        np.add.at(self._sums, station_stage, self._last)
+        self._shape = (n, len(engine.lines))
+
+    def _station_values(self, kpi, idx):
+        up = kpi['up_time'][idx]
+        return np.stack([
+            up, kpi['down_time'][idx], kpi['units'][idx], kpi['rejects'][idx],
+            kpi['performance'][idx] * up, kpi['running'][idx],
+        ], axis=-1).astype(float)
+
+    def update(self):
+        """Fold the stations changed since the previous update into the stage
+        sums; rebuilds when stations or lines were added."""
+        kpi = self.engine.kpis()
+        with self._lock:
+            if kpi['version'] == self._version:
+                return
+            if self._shape != (len(kpi['names']), len(self.engine.lines)):
+                self._build(kpi)
+            else:
+                changed = self.engine.changed_since(self._version)
+                changed = changed[changed < len(kpi['names'])]
+                values = self._station_values(kpi, changed)
+                np.add.at(self._sums, self.station_stage[changed], values - self._last[changed])
+                self._last[changed] = values
+            self._version = kpi['version']
+
+    def flow(self):
+        """Per-stage flow arrays and per-line bottlenecks, cached per version."""
+        self.update()
+        with self._lock:
+            if self._flow_version == self._version:
+                return self._flow
+            sums = self._sums
+            up, units = sums[:, UP], sums[:, UNITS]
+            observed = up + sums[:, DOWN]
+            good = units - sums[:, REJECTS]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                availability = np.where(observed > 0, up * 100 / observed, 100)
+                performance = np.where(up > 0, sums[:, PERF] / up, 0)
+                quality = np.where(units > 0, good * 100 / units, 100)
+                # Units per hour of the average machine times the machine count,
+                # over all observed time and over the time actually running
+                throughput = np.where(observed > 0, units * 3600 * self.members / observed, np.nan)
+                capacity = np.where(up > 0, units * 3600 * self.members / up, np.nan)
+            has_upstream = self.upstream >= 0
+            wip = np.where(has_upstream, np.maximum(good[self.upstream] - units, 0), 0)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                fill = np.where(self.buffers > 0, wip * 100 / self.buffers, np.nan)
+
+            # Every stage of a line passes about the same units, so the
+            # bottleneck is the one that needs the most running time for them:
+            # the lowest capacity (never-running stages sort last)
+            lines = len(self.engine.lines)
+            order = np.lexsort((np.nan_to_num(capacity, nan=np.inf), self.stage_line))
+            first = np.r_[True, self.stage_line[order][1:] != self.stage_line[order][:-1]] if len(order) else order
+            bottleneck = np.full(lines, -1, dtype=np.int64)
+            bottleneck[self.stage_line[order][first]] = order[first]
+            # Last stage of each line, whose good units are the line output
+            last = np.full(lines, -1, dtype=np.int64)
+            last[self.stage_line] = np.arange(len(self.stage_line))
+            oee = availability * performance * quality / 10000
+            self._flow = {
+                'version': self._version,
+                'names': self.stage_names,
+                'stations': self.stage_members,
+                'line': self.stage_line,
+                'upstream': self.upstream,
+                'availability': np.round(availability, 1),
+                'performance': np.round(performance, 1),
+                'quality': np.round(quality, 1),
+                'oee': np.round(oee, 1),
+                'units': units,
+                'good': good,
+                'running': sums[:, RUNNING].astype(int),
+                'members': self.members,
+                'throughput': np.round(throughput, 1),
+                'capacity': np.round(capacity, 1),
+                'wip': wip,
+                'buffer': self.buffers,
+                'buffer_fill': np.round(fill, 1),
+                'bottleneck': bottleneck,
+                'line_oee': np.where(bottleneck >= 0, np.round(oee, 1)[bottleneck], np.nan),
+                'line_output': np.where(last >= 0, good[last], 0),
+                'line_wip': np.bincount(self.stage_line, weights=wip, minlength=lines),
+            }
+            self._flow_version = self._version
+            return self._flow
+
+    def line(self, code):
+        """Stages, WIP and bottleneck of one line as plain values."""
+        flow = self.flow()
+        stages = np.flatnonzero(flow['line'] == code)
+
+        def plain(value):
+            value = value.item() if hasattr(value, 'item') else value
+            return None if isinstance(value, float) and np.isnan(value) else value
+
+        keys = ('availability', 'performance', 'quality', 'oee', 'units', 'good', 'running', 'members',
+                'throughput', 'capacity', 'wip', 'buffer', 'buffer_fill')
+        bottleneck = int(flow['bottleneck'][code])
+        return {
+            'oee': plain(flow['line_oee'][code]),
+            'output': plain(flow['line_output'][code]),
+            'wip': plain(flow['line_wip'][code]),
+            'bottleneck': flow['names'][bottleneck] if bottleneck >= 0 else None,
+            'stages': [
+                dict({key: plain(flow[key][s]) for key in keys}, name=flow['names'][s],
+                     stations=flow['stations'][s], bottleneck=bool(s == bottleneck))
+                for s in stages
+            ],
+        }
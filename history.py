@@ -0,0 +1,213 @@
+"""Time-bucketed OEE history.
+
+Every capture adds the engine's per-station deltas (up/down time, units,
+rejects and time-weighted performance) into minute buckets and, in the same
+vectorized step, into the hour, shift and day rollups. Each level is a ring
+buffer of ``(slot, station, measure)`` sums, so a trend over any window is a
+slice of one level and A/P/Q/OEE are derived from the sums on read.
+"""
+import os
+import threading
+import time
+
+import numpy as np
+
+UP, DOWN, UNITS, REJECTS, PERF = range(5)
+MEASURES = 5
+
+# level -> (bucket width in seconds, slots kept)
+LEVELS = {
+    'minute': (60, 2 * 24 * 60),
+    'hour': (3600, 90 * 24),
+    'shift': (8 * 3600, 400 * 3),
+    'day': (24 * 3600, 400),
+}
+
+
+class HistoryStore:
+
+    def __init__(self, capacity=16, levels=LEVELS, offset=6 * 3600):
+        # ``offset`` aligns shift and day buckets, e.g. 06:00 shift change
+        self.levels = dict(levels)
+        self.offset = offset
+        self.names = []
+        self._capacity = capacity
+        self._sums = {}
+        self._bucket = {}
+        for level, (_, slots) in self.levels.items():
+            self._sums[level] = np.zeros((slots, capacity, MEASURES), dtype=np.float32)
+            self._bucket[level] = np.full(slots, -1, dtype=np.int64)
+        self._last = None
+
+    def _ensure(self, n):
+        if n <= self._capacity:
+            return
+        capacity = max(n, self._capacity * 2)
+        for level, sums in self._sums.items():
+            grown = np.zeros((sums.shape[0], capacity, MEASURES), dtype=np.float32)
+            grown[:, :self._capacity] = sums
+            self._sums[level] = grown
+        if self._last is not None:
+            last = np.zeros((capacity, self._last.shape[1]))
+            last[:len(self._last)] = self._last
+            self._last = last
+        self._capacity = capacity
+
+    def _slot(self, level, ts):
+        width, slots = self.levels[level]
+        bucket = int((ts - self.offset) // width)
+        slot = bucket % slots
+        if self._bucket[level][slot] != bucket:
+            # Ring wrapped around: drop the oldest bucket's sums
+            self._sums[level][slot] = 0
+            self._bucket[level][slot] = bucket
+        return slot
+
+    def capture(self, engine, ts=None):
+        """Record what happened since the previous capture."""
+        ts = time.time() if ts is None else ts
+        engine.tick(ts)
+        n = len(engine)
+        self._ensure(n)
+        self.names = list(engine.names)
+        counters = np.stack([
+            engine.up_time[:n], engine.down_time[:n], engine.units[:n], engine.rejects[:n],
+            engine.ideal_time[:n], engine.rated_up[:n],
+        ], axis=1)
+        if self._last is None:
+            self._last = np.zeros((self._capacity, counters.shape[1]))
+            self._last[:n] = counters
+            return
+        delta = np.maximum(counters - self._last[:n], 0)
+        self._last[:n] = counters
+
+        row = np.zeros((n, MEASURES), dtype=np.float32)
+        row[:, :4] = delta[:, :4]
+        # Performance of this bucket alone: ideal time over rated run time
+        # since the previous capture, or the lot's run time against its
+        # expected run time while no cycle time is known
+        ideal, rated = delta[:, 4], delta[:, 5]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            performance = np.where(rated > 0, ideal * 100 / rated, engine.kpis()['performance'])
+        row[:, PERF] = performance * delta[:, UP]
+        for level in self.levels:
+            self._sums[level][self._slot(level, ts), :n] += row
+
+    def sums(self, level, start, end, stations=None):
+        """Bucket ids in ``[start, end)`` and their raw sums, oldest first."""
+        width, slots = self.levels[level]
+        first = int((start - self.offset) // width)
+        last = int(-((self.offset - end) // width)) - 1
+        buckets = np.arange(max(first, last - slots + 1), last + 1)
+        idx = buckets % slots
+        sums = self._sums[level][idx]
+        if stations is not None:
+            sums = sums[:, stations]
+        else:
+            sums = sums[:, :len(self.names)]
+        # Slots that hold another (older or newer) bucket read as empty
+        sums = np.where((self._bucket[level][idx] == buckets)[:, None, None], sums, 0)
+        return buckets, sums
+
+    def trend(self, level, start, end, stations=None, group=1):
+        """A/P/Q/OEE (%) per bucket and station.
+
+        ``group`` folds consecutive buckets together, e.g. ``('day', ...,
+        group=7)`` for weekly points.
+        """
+        buckets, sums = self.sums(level, start, end, stations)
+        if group > 1:
+            starts = np.arange(0, len(buckets), group)
+            buckets = buckets[starts]
+            sums = np.add.reduceat(sums, starts, axis=0)
+        up = sums[..., UP]
+        total = up + sums[..., DOWN]
+        units = sums[..., UNITS]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            availability = np.where(total > 0, up * 100 / total, np.nan)
+            performance = np.where(up > 0, sums[..., PERF] / up, np.nan)
+            quality = np.where(units > 0, 100 - sums[..., REJECTS] * 100 / units, np.nan)
+        width = self.levels[level][0]
+        return {
+            'start': buckets * width + self.offset,
+            'availability': availability,
+            'performance': performance,
+            'quality': quality,
+            'oee': availability * performance * quality / 10000,
+            'units': units,
+        }
+
+    def start_capture(self, engine, interval=60, path=None, save_every=60):
+        """Capture every ``interval`` seconds in a daemon thread, writing the
+        store to ``path`` every ``save_every`` captures."""
+        def run():
+            count = 0
+            while True:
+                time.sleep(interval)
+                self.capture(engine)
+                count += 1
+                if path and count % save_every == 0:
+                    self.save(path)
+
+        thread = threading.Thread(target=run, name='oee-history', daemon=True)
+        thread.start()
+        return thread
+
+    def follow(self, path, interval=60):
+        """Reload the store from ``path`` whenever another process saves it,
+        checking every ``interval`` seconds in a daemon thread."""
+        def run():
+            loaded = None
+            while True:
+                try:
+                    mtime = os.stat(path).st_mtime_ns
+                    if mtime != loaded:
+                        self._replace(self.load(path))
+                        loaded = mtime
+                except OSError:
+                    # Not saved yet
+                    pass
+                time.sleep(interval)
+
+        thread = threading.Thread(target=run, name='oee-history-follow', daemon=True)
+        thread.start()
+        return thread
+
+    def _replace(self, store):
+        self.levels = store.levels
+        self.offset = store.offset
+        self._capacity = store._capacity
+        self._sums = store._sums
+        self._bucket = store._bucket
+        self.names = store.names
+
+    def save(self, path):
+        import h5py
+
+        # Written aside and renamed so readers never open a partial file
+        tmp = path + '.tmp'
+        with h5py.File(tmp, 'w') as f:
+            f.attrs['offset'] = self.offset
+            f.create_dataset('names', data=np.array(self.names, dtype=h5py.string_dtype()))
+            for level in self.levels:
+                group = f.create_group(level)
+                group.attrs['width'], group.attrs['slots'] = self.levels[level]
+                group.create_dataset('sums', data=self._sums[level][:, :len(self.names)],
+                                     compression='gzip')
+                group.create_dataset('bucket', data=self._bucket[level])
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        import h5py
+
+        with h5py.File(path, 'r') as f:
+            levels = {level: (int(f[level].attrs['width']), int(f[level].attrs['slots']))
+                      for level in f if level != 'names'}
+            names = [name.decode() if isinstance(name, bytes) else name for name in f['names'][:]]
+            store = cls(max(len(names), 1), levels, offset=float(f.attrs['offset']))
+            store.names = names
+            for level in levels:
+                store._sums[level][:, :len(names)] = f[level]['sums'][:]
+                store._bucket[level][:] = f[level]['bucket'][:]
+        return store
@@ -0,0 +1,371 @@
+"""Machine-signal ingestion gateway.
+
+PLC adapters connect over TCP and send length-prefixed frames::
+
+    uint32 length (big endian) | uint8 format | payload
+
+Format ``J`` carries a JSON list of event dicts (see ``OEEEngine.apply``).
+Format ``B`` carries packed ``RECORD`` structs that address stations by their
+engine index, for senders that cannot afford JSON. Every frame is answered
+with one byte: ``A`` (accepted) or ``E`` (malformed frame).
+
+Frames are validated on arrival into a ``Batch`` of count arrays and ordered
+state/lot events. A single consumer drains the queue, replays the state and
+lot events in order, and applies all unit and reject counts of the drained
+batches as per-station deltas with one ``OEEEngine.add_counts`` call, and
+all weigh-scale readings with one ``OEEEngine.add_materials`` call. Counts
+and readings that arrived before a lot change are applied ahead of it, so
+they are rated and booked on the lot they belong to. The
+queue is bounded: when it is full, readers stop reading and TCP flow
+control pushes back on the senders instead of dropping data.
+"""
+import asyncio
+import json
+import logging
+import math
+import struct
+import threading
+import time
+
+import numpy as np
+
+from metrics import (INGEST_APPLY_SECONDS, INGEST_BATCHES, INGEST_EVENTS, INGEST_LAG,
+                     INGEST_QUEUE)
+from oee_engine import RUNNING, STOPPED
+
+HEADER = struct.Struct('>IB')
+# station index, kind, timestamp, value (count, kg, ...), and the expected
+# run time of lot starts, the downtime reason code (see downtime.REASONS) of
+# stops or the material code of material readings
+RECORD = struct.Struct('<IBddd')
+RECORD_DTYPE = np.dtype([('station', '<u4'), ('kind', 'u1'), ('ts', '<f8'),
+                         ('value', '<f8'), ('expected', '<f8')])
+KINDS = ('units', 'rejects', 'state', 'lot_start', 'lot_end', 'material_used', 'material_waste')
+MATERIAL = KINDS.index('material_used')
+MAX_FRAME = 16 * 1024 * 1024
+
+log = logging.getLogger(__name__)
+
+ACCEPTED = b'A'
+MALFORMED = b'E'
+
+
+class FrameError(ValueError):
+    pass
+
+
+def _number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
+
+def _lot_num(value):
+    """Lot numbers the engine can store: integers, integer strings, or
+    'Nil'/None for no lot."""
+    if value in (None, 'Nil'):
+        return True
+    if isinstance(value, bool):
+        return False
+    try:
+        int(value)
+    except (TypeError, ValueError, OverflowError):
+        return False
+    return True
+
+
+class Batch:
+    """One validated frame: ordered state/lot events, count arrays and
+    material readings as ``RECORD_DTYPE`` records. ``marks`` holds, per
+    ordered event, how many counts and readings came before it."""
+
+    __slots__ = ('events', 'indices', 'units', 'rejects', 'stamps', 'materials', 'marks')
+
+    def __init__(self, events, indices, units, rejects, stamps, materials, marks):
+        self.events = events
+        self.indices = indices
+        self.units = units
+        self.rejects = rejects
+        self.stamps = stamps
+        self.materials = materials
+        self.marks = np.asarray(marks, dtype=np.int64).reshape(-1, 2)
+
+    def __len__(self):
+        return len(self.events) + len(self.indices) + len(self.materials)
+
+
+def encode_json(events):
+    payload = json.dumps(events).encode()
+    return HEADER.pack(len(payload), ord('J')) + payload
+
+
+def encode_binary(records):
+    """``records`` are ``(station index, kind, ts, value, expected)`` tuples."""
+    payload = b''.join(RECORD.pack(idx, KINDS.index(kind), ts, value, expected)
+                       for idx, kind, ts, value, expected in records)
+    return HEADER.pack(len(payload), ord('B')) + payload
+
+
+class IngestGateway:
+
+    def __init__(self, engine, host='0.0.0.0', port=9300, queue_size=1024, max_batch=256):
+        self.engine = engine
+        self.host = host
+        self.port = port
+        self.max_batch = max_batch
+        self.queue_size = queue_size
+        self.queue = None
+        self.loop = None
+        self.server = None
+        self.received = 0
+        self.applied = 0
+        self.rejected = 0
+        self.last_lag = 0.0
+        self._ready = threading.Event()
+
+    # Validation
+
+    def parse_json(self, payload):
+        try:
+            events = json.loads(payload)
+        except ValueError as exc:
+            raise FrameError(f'invalid JSON: {exc}') from exc
+        if isinstance(events, dict):
+            events = [events]
+        if not isinstance(events, list):
+            raise FrameError('expected a list of events')
+        ordered, count_idx, units, rejects, stamps, materials, marks = [], [], [], [], [], [], []
+        index = self.engine.index
+        for event in events:
+            if not self.valid_event(event):
+                self._reject()
+                continue
+            kind = event['type']
+            if kind in ('units', 'rejects'):
+                count = event.get('count', 1)
+                count_idx.append(index[event['station']])
+                units.append(count if kind == 'units' else 0)
+                rejects.append(count if kind == 'rejects' else 0)
+                stamps.append(event.get('ts') or 0)
+            elif kind in ('material_used', 'material_waste'):
+                materials.append((index[event['station']], KINDS.index(kind), event.get('ts') or 0,
+                                  event['kg'], self.engine.materials.material_code(event.get('material'))))
+            else:
+                ordered.append(event)
+                marks.append((len(count_idx), len(materials)))
+        return Batch(ordered, np.array(count_idx, dtype=np.int64),
+                     np.array(units, dtype=float), np.array(rejects, dtype=float),
+                     np.array(stamps, dtype=float), np.array(materials, dtype=RECORD_DTYPE), marks)
+
+    def valid_event(self, event):
+        if not isinstance(event, dict) or event.get('type') not in KINDS:
+            return False
+        if event.get('station') not in self.engine:
+            return False
+        if event.get('ts') is not None and not _number(event['ts']):
+            return False
+        kind = event['type']
+        if kind in ('units', 'rejects'):
+            count = event.get('count', 1)
+            return _number(count) and count >= 0
+        if kind == 'state':
+            return (event.get('status') in (RUNNING, STOPPED)
+                    and isinstance(event.get('reason'), (str, int, type(None))))
+        if kind in ('material_used', 'material_waste'):
+            kg = event.get('kg')
+            return (_number(kg) and kg >= 0
+                    and isinstance(event.get('material'), (str, int, type(None))))
+        if kind == 'lot_start':
+            return ('lot_num' in event and _lot_num(event['lot_num'])
+                    and _number(event.get('expected_run_time'))
+                    and isinstance(event.get('product'), (str, type(None))))
+        return True
+
+    def parse_binary(self, payload):
+        if len(payload) % RECORD_DTYPE.itemsize:
+            raise FrameError('binary payload is not a whole number of records')
+        records = np.frombuffer(payload, dtype=RECORD_DTYPE)
+        valid = ((records['station'] < len(self.engine)) & (records['kind'] < len(KINDS))
+                 & (records['value'] >= 0) & np.isfinite(records['value'])
+                 & np.isfinite(records['ts']) & np.isfinite(records['expected']))
+        if not valid.all():
+            self._reject(int((~valid).sum()))
+            records = records[valid]
+        is_count = records['kind'] < 2
+        is_material = records['kind'] >= MATERIAL
+        is_ordered = ~is_count & ~is_material
+        counts = records[is_count]
+        is_units = counts['kind'] == 0
+        # Counts and readings before each ordered record
+        marks = np.stack([np.cumsum(is_count) - is_count, np.cumsum(is_material) - is_material],
+                         axis=-1)[is_ordered]
+        names = self.engine.names
+        ordered = []
+        for record in records[is_ordered]:
+            kind = KINDS[record['kind']]
+            event = {'type': kind, 'station': names[record['station']], 'ts': float(record['ts'])}
+            if kind == 'state':
+                event['status'] = RUNNING if record['value'] else STOPPED
+                event['reason'] = int(record['expected'])
+            elif kind == 'lot_start':
+                event['lot_num'] = int(record['value'])
+                event['expected_run_time'] = float(record['expected'])
+            ordered.append(event)
+        return Batch(ordered, counts['station'].astype(np.int64),
+                     np.where(is_units, counts['value'], 0), np.where(is_units, 0, counts['value']),
+                     counts['ts'].copy(), records[is_material].copy(), marks)
+
+    def parse(self, fmt, payload):
+        if fmt == ord('J'):
+            return self.parse_json(payload)
+        if fmt == ord('B'):
+            return self.parse_binary(payload)
+        raise FrameError(f'unknown frame format {fmt!r}')
+
+    def _reject(self, count=1):
+        self.rejected += count
+        INGEST_EVENTS.labels('rejected').inc(count)
+
+    # Applying
+
+    def _apply_counts(self, idx, units, rejects, materials):
+        if len(idx):
+            # add_counts sums duplicate stations, so one call covers them all
+            self.engine.add_counts(idx, units, rejects)
+        if len(materials):
+            self.engine.add_materials(materials['station'], materials['value'],
+                                      materials['kind'] != MATERIAL, materials['expected'].astype(np.int64),
+                                      np.where(materials['ts'] > 0, materials['ts'], time.time()))
+
+    def apply_batches(self, batches):
+        """Apply the ordered events, then every count of every batch at once.
+        A lot change first applies its station's earlier counts and readings."""
+        start = time.perf_counter()
+        idx = np.concatenate([batch.indices for batch in batches])
+        units = np.concatenate([batch.units for batch in batches])
+        rejects = np.concatenate([batch.rejects for batch in batches])
+        materials = np.concatenate([batch.materials for batch in batches])
+        pending_counts = np.ones(len(idx), dtype=bool)
+        pending_materials = np.ones(len(materials), dtype=bool)
+        failed = 0
+        counts_before = materials_before = 0
+        for batch in batches:
+            for event, (count_mark, material_mark) in zip(batch.events, batch.marks):
+                try:
+                    if event['type'] in ('lot_start', 'lot_end'):
+                        station = self.engine.index[event['station']]
+                        due = pending_counts.copy()
+                        due[counts_before + count_mark:] = False
+                        due &= idx == station
+                        due_materials = pending_materials.copy()
+                        due_materials[materials_before + material_mark:] = False
+                        due_materials &= materials['station'] == station
+                        if due.any() or due_materials.any():
+                            self._apply_counts(idx[due], units[due], rejects[due],
+                                               materials[due_materials])
+                            pending_counts &= ~due
+                            pending_materials &= ~due_materials
+                    self.engine.apply(event)
+                except Exception:
+                    # One bad event must not stop the rest of the stream
+                    log.exception('could not apply %r', event)
+                    failed += 1
+            counts_before += len(batch.indices)
+            materials_before += len(batch.materials)
+        if failed:
+            self._reject(failed)
+        self._apply_counts(idx[pending_counts], units[pending_counts], rejects[pending_counts],
+                           materials[pending_materials])
+        stamps = np.concatenate([batch.stamps for batch in batches] + [materials['ts']]
+                                + [[event.get('ts') or 0 for batch in batches for event in batch.events]])
+        stamps = stamps[stamps > 0]
+        if len(stamps):
+            self.last_lag = time.time() - float(stamps.min())
+            INGEST_LAG.observe(max(self.last_lag, 0))
+        applied = sum(len(batch) for batch in batches) - failed
+        self.applied += applied
+        INGEST_EVENTS.labels('applied').inc(applied)
+        INGEST_BATCHES.inc()
+        INGEST_APPLY_SECONDS.observe(time.perf_counter() - start)
+
+    async def consume(self):
+        while True:
+            batches = [await self.queue.get()]
+            # Drain whatever else is already waiting, up to max_batch frames
+            for _ in range(self.max_batch - 1):
+                try:
+                    batches.append(self.queue.get_nowait())
+                except asyncio.QueueEmpty:
+                    break
+            INGEST_QUEUE.set(self.queue.qsize())
+            try:
+                self.apply_batches(batches)
+            except Exception:
+                # Keep consuming: a dead consumer would leave senders acknowledged
+                # but never applied, then blocked on the full queue
+                log.exception('could not apply %d frames', len(batches))
+                self._reject(sum(len(batch) for batch in batches))
+
+    async def submit(self, batch):
+        """Queue a validated batch; waits while the queue is full."""
+        self.received += len(batch)
+        INGEST_EVENTS.labels('received').inc(len(batch))
+        await self.queue.put(batch)
+        INGEST_QUEUE.set(self.queue.qsize())
+
+    # Network
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                header = await reader.readexactly(HEADER.size)
+                length, fmt = HEADER.unpack(header)
+                if length > MAX_FRAME:
+                    writer.write(MALFORMED)
+                    break
+                payload = await reader.readexactly(length)
+                try:
+                    batch = self.parse(fmt, payload)
+                except FrameError:
+                    writer.write(MALFORMED)
+                    await writer.drain()
+                    continue
+                # Blocks this connection, not the others, while the queue is full
+                await self.submit(batch)
+                writer.write(ACCEPTED)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionResetError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self):
+        self.queue = asyncio.Queue(maxsize=self.queue_size)
+        self.server = await asyncio.start_server(self.handle, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        self._ready.set()
+        consumer = asyncio.ensure_future(self.consume())
+        try:
+            async with self.server:
+                await self.server.serve_forever()
+        finally:
+            consumer.cancel()
+
+    def start_in_thread(self):
+        """Run the gateway on its own event loop in a daemon thread."""
+        def run():
+            self.loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self.loop)
+            self.loop.run_until_complete(self.serve())
+
+        thread = threading.Thread(target=run, name='oee-ingest', daemon=True)
+        thread.start()
+        self._ready.wait()
+        return thread
+
+    def stats(self):
+        return {
+            'received': self.received,
+            'applied': self.applied,
+            'rejected': self.rejected,
+            'queued_frames': self.queue.qsize() if self.queue else 0,
+            'lag_seconds': self.last_lag,
+        }
@@ -0,0 +1,72 @@
+"""Precompiled page layout.
+
+The layout tree is built once with a placeholder string in every prop that
+depends on the KPIs, serialized, and split at the placeholders. Serving the
+layout is then a join of the static JSON chunks with the JSON of the current
+values, with no component tree built per request. The compiled chunks can be
+stored on disk so a restarted process skips building and serializing the
+tree altogether; the artifact is keyed on the code and settings it came from.
+"""
+import hashlib
+import json
+import os
+import re
+
+from plotly.io.json import to_json_plotly as to_json
+
+SLOT = '__oee_slot_{}__'
+_SLOT_RE = re.compile(r'"__oee_slot_(.+?)__"')
+
+
+def placeholders(names):
+    return {name: SLOT.format(name) for name in names}
+
+
+def source_key(paths, *settings):
+    """Hash of the files and settings a compiled layout depends on."""
+    digest = hashlib.sha1()
+    for path in paths:
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    digest.update(repr(settings).encode())
+    return digest.hexdigest()
+
+
+class LayoutTemplate:
+
+    def __init__(self, chunks, slots):
+        # chunks[i] precedes slots[i]; the last chunk closes the document
+        self.chunks = chunks
+        self.slots = slots
+
+    @classmethod
+    def compile(cls, tree):
+        parts = _SLOT_RE.split(to_json(tree))
+        return cls(parts[0::2], parts[1::2])
+
+    def render(self, values):
+        """Layout JSON with each slot replaced by ``values[slot]`` (JSON text)."""
+        out = []
+        for chunk, slot in zip(self.chunks, self.slots):
+            out.append(chunk)
+            out.append(values[slot])
+        out.append(self.chunks[-1])
+        return ''.join(out)
+
+    def save(self, path, key):
+        tmp = path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump({'key': key, 'chunks': self.chunks, 'slots': self.slots}, f)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path, key):
+        """The template stored at ``path``, or None if missing or stale."""
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if data.get('key') != key:
+            return None
+        return cls(data['chunks'], data['slots'])
@@ -0,0 +1,157 @@
+"""Live KPI push for the overview section.
+
+Each browser keeps the engine version and the view (plant, line, page) it
+last received in a ``dcc.Store``. On every interval tick the server answers
+with ``dash.Patch`` objects that only touch the bars and status rows on that
+page whose stations changed since that version, or with no update at all
+when nothing changed. A column with many changed rows is sent whole, which
+is smaller than one patch operation per row.
+"""
+import threading
+
+import numpy as np
+from cachetools import LRUCache
+from dash import Patch, dcc, no_update
+from dash.dependencies import Input, Output, State
+from dash.exceptions import PreventUpdate
+
+from figures import FIGURE_IDS, live_fields
+
+
+def live_state(view, n):
+    return {'version': view['version'], 'n': n, 'view': list(view['view'])}
+
+
+# Above this share of changed rows a whole column is cheaper than per-row ops
+_COLUMN_SHARE = 0.125
+
+
+def data_patch(figure, previous=None):
+    """Patch that turns ``previous``, the figure a client shows, into
+    ``figure`` by replacing only the trace arrays that differ; both share
+    one layout and trace list. Without ``previous`` every array is sent."""
+    patch = Patch()
+    changed = False
+    for i, trace in enumerate(figure['data']):
+        before = previous['data'][i] if previous is not None else {}
+        for attr in ('x', 'y', 'text'):
+            if attr in trace and trace[attr] != before.get(attr):
+                patch['data'][i][attr] = trace[attr]
+                changed = True
+    return patch if changed else no_update
+
+
+def live_components(state, interval_ms):
+    """``state`` is the ``live_state`` of the view the page starts on; with
+    no ``interval_ms`` only the store is kept, to track what the client shows."""
+    interval = [dcc.Interval(id='live-interval', interval=interval_ms)] if interval_ms else []
+    return interval + [dcc.Store(id='live-version', data=state)]
+
+
+def register_live_updates(app, engine, figure_factory, make_view, build_overview,
+                          build_status_rows, station_store=None):
+    """Wire the interval callback.
+
+    ``make_view(kpi, plant, line, page)`` returns the view dict shown by a
+    client, ``build_overview(view)`` its full figures, status grid and
+    summary keyed by component id; the latter is only used when the station
+    set itself changed. With ``station_store(names)``, which returns station
+    data by name, the clientside step view's ``station-store`` is patched as
+    well.
+    """
+    # Patches per (client version, station count, view, engine version),
+    # shared by the server threads
+    cache = LRUCache(256)
+    lock = threading.Lock()
+    fields = live_fields()
+    figure_ids = list(FIGURE_IDS)
+    overview_ids = figure_ids + ['status-grid', 'hierarchy-summary']
+
+    def full_refresh(view, kpi):
+        overview = build_overview(view)
+        outputs = [overview[oid] for oid in overview_ids]
+        if station_store:
+            outputs.append(station_store(kpi['names']))
+        return outputs
+
+    def page_rows(view, stations):
+        rows = view['row_of'][stations]
+        return np.unique(rows[rows >= 0])
+
+    def delta(view, kpi, since):
+        changed = engine.changed_since(since)
+        rows = page_rows(view, changed)
+        outputs = []
+        if len(rows):
+            cols = figure_factory.columns(view)
+            for fid in figure_ids:
+                patch = Patch()
+                for trace, attrs, key in fields[fid]:
+                    column = cols[key]
+                    if len(rows) > _COLUMN_SHARE * len(column):
+                        values = column.tolist()
+                        for attr in attrs:
+                            patch['data'][trace][attr] = values
+                        continue
+                    for row in rows:
+                        value = column[row].item()
+                        for attr in attrs:
+                            patch['data'][trace][attr][int(row)] = value
+                outputs.append(patch)
+        else:
+            outputs.extend(no_update for _ in figure_ids)
+
+        status_rows = page_rows(view, engine.status_changed_since(since))
+        if len(status_rows):
+            grid = Patch()
+            for pair in sorted({int(row) // 2 for row in status_rows}):
+                start = pair * 2
+                grid[1 + pair] = build_status_rows(view, start, start + 2)[0]
+            outputs.append(grid)
+        else:
+            outputs.append(no_update)
+
+        outputs.append(build_overview(view, figures=False)['hierarchy-summary']
+                       if len(changed) else no_update)
+
+        if station_store:
+            if len(changed):
+                stations = Patch()
+                for name, data in station_store([kpi['names'][j] for j in changed]).items():
+                    stations[name] = data
+                outputs.append(stations)
+            else:
+                outputs.append(no_update)
+        return outputs
+
+    outputs = [Output(oid, 'figure' if oid in figure_ids else 'children', allow_duplicate=True)
+               for oid in overview_ids]
+    if station_store:
+        outputs.append(Output('station-store', 'data'))
+
+    @app.callback(
+        outputs + [Output('live-version', 'data', allow_duplicate=True)],
+        Input('live-interval', 'n_intervals'),
+        State('live-version', 'data'),
+        prevent_initial_call=True,
+    )
+    def push_live_kpis(_, client):
+        kpi = engine.kpis()
+        if client['version'] == kpi['version']:
+            raise PreventUpdate
+        n = len(kpi['names'])
+        view = make_view(kpi, *client['view'])
+        # All clients on the same version and view share one set of patches
+        key = (client['version'], client['n'], view['view'], kpi['version'])
+        with lock:
+            outputs = cache.get(key)
+        if outputs is None:
+            if client['n'] != n:
+                outputs = full_refresh(view, kpi)
+            else:
+                outputs = delta(view, kpi, client['version'])
+            with lock:
+                cache[key] = outputs
+        return outputs + [live_state(view, n)]
+
+    return push_live_kpis
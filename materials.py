@@ -0,0 +1,153 @@
+"""Streaming material usage and waste.
+
+Weigh-scale readings arrive as ``(station, kg, waste?, material)`` records,
+one at a time or as arrays from the ingest gateway, and are folded straight
+into fixed-size running sums: per station, per station and material type,
+per station and shift (a ring of recent shifts, like the history store), and
+per lot for the most recently active lots. Memory depends on the number of
+stations, materials and kept shifts, never on how many readings arrived.
+"""
+import threading
+
+import numpy as np
+from cachetools import LRUCache
+
+UNSPECIFIED = 'Unspecified'
+
+
+class MaterialLedger:
+
+    def __init__(self, capacity=16, shifts=3 * 90, shift_seconds=8 * 3600,
+                 offset=6 * 3600, lots=4096):
+        self.materials = [UNSPECIFIED]
+        self._material_codes = {UNSPECIFIED: 0}
+        self.shift_seconds = shift_seconds
+        self.offset = offset
+        self._capacity = capacity
+        self.totals = np.zeros((capacity, 2))
+        self.by_material = np.zeros((capacity, 1, 2))
+        self.by_shift = np.zeros((shifts, capacity, 2), dtype=np.float32)
+        self._shift_bucket = np.full(shifts, -1, dtype=np.int64)
+        # (station, lot) -> [used, waste] for the most recent lots
+        self.lots = LRUCache(lots)
+        self.readings = 0
+        self._lock = threading.Lock()
+
+    def material_code(self, material):
+        """Code of a material name or code; new names are appended."""
+        if material is None:
+            return 0
+        if isinstance(material, (int, np.integer)):
+            return int(material) if 0 <= material < len(self.materials) else 0
+        with self._lock:
+            if material not in self._material_codes:
+                self._material_codes[material] = len(self.materials)
+                self.materials.append(material)
+                # Sized before any reader can see the new code
+                self._ensure(self._capacity)
+            return self._material_codes[material]
+
+    def reserve(self, stations):
+        """Make room for ``stations`` stations, as the engine grows."""
+        with self._lock:
+            self._ensure(stations)
+
+    def _ensure(self, stations):
+        if stations > self._capacity:
+            capacity = max(stations, self._capacity * 2)
+            self.totals = np.concatenate([self.totals, np.zeros((capacity - self._capacity, 2))])
+            grown = np.zeros((capacity,) + self.by_material.shape[1:])
+            grown[:self._capacity] = self.by_material
+            self.by_material = grown
+            grown = np.zeros((self.by_shift.shape[0], capacity, 2), dtype=np.float32)
+            grown[:, :self._capacity] = self.by_shift
+            self.by_shift = grown
+            self._capacity = capacity
+        if len(self.materials) > self.by_material.shape[1]:
+            grown = np.zeros((self._capacity, len(self.materials) * 2, 2))
+            grown[:, :self.by_material.shape[1]] = self.by_material
+            self.by_material = grown
+
+    def _shift_slots(self, ts):
+        slots = len(self._shift_bucket)
+        buckets = ((ts - self.offset) // self.shift_seconds).astype(np.int64)
+        for bucket in np.unique(buckets):
+            slot = bucket % slots
+            if self._shift_bucket[slot] != bucket:
+                # Ring wrapped around: drop the oldest shift's sums
+                self.by_shift[slot] = 0
+                self._shift_bucket[slot] = bucket
+        return buckets % slots
+
+    def add(self, stations, kg, waste, materials, lots, ts):
+        """Fold readings given as equal-length arrays into the running sums."""
+        stations = np.asarray(stations, dtype=np.int64)
+        if not len(stations):
+            return
+        kg = np.asarray(kg, dtype=float)
+        kind = np.asarray(waste, dtype=bool).astype(np.int64)
+        materials = np.asarray(materials, dtype=np.int64)
+        # Unknown material codes are booked as unspecified
+        materials = np.where((materials >= 0) & (materials < len(self.materials)), materials, 0)
+        lots = np.asarray(lots, dtype=np.int64)
+        with self._lock:
+            self._ensure(int(stations.max()) + 1)
+            np.add.at(self.totals, (stations, kind), kg)
+            np.add.at(self.by_material, (stations, materials, kind), kg)
+            np.add.at(self.by_shift, (self._shift_slots(np.asarray(ts, dtype=float)), stations, kind), kg)
+            pairs, groups = np.unique(np.stack([stations, lots], axis=1), axis=0, return_inverse=True)
+            sums = np.zeros((len(pairs), 2))
+            np.add.at(sums, (groups.ravel(), kind), kg)
+            for (station, lot), total in zip(pairs.tolist(), sums):
+                self.lots[station, lot] = self.lots.get((station, lot), np.zeros(2)) + total
+            self.readings += len(stations)
+
+    def _split(self, used, waste):
+        return {
+            'used': float(used),
+            'waste': float(waste),
+            'waste_ratio': float(waste * 100 / used) if used else None,
+        }
+
+    def has(self, station):
+        return station < self._capacity and self.totals[station].any()
+
+    def station(self, station):
+        """Running totals of one station, by material type."""
+        with self._lock:
+            if station >= self._capacity:
+                return self._split(0, 0)
+            result = self._split(*self.totals[station])
+            result['materials'] = {
+                self.materials[code]: self._split(*sums)
+                for code, sums in enumerate(self.by_material[station, :len(self.materials)])
+                if sums.any()
+            }
+        return result
+
+    def lot(self, station, lot):
+        with self._lock:
+            return self._split(*self.lots.get((station, lot), np.zeros(2)))
+
+    def shifts(self, start, end, stations=None):
+        """Per-shift totals over ``stations`` (all when None), oldest first."""
+        slots = len(self._shift_bucket)
+        first = int((start - self.offset) // self.shift_seconds)
+        last = int((end - self.offset) // self.shift_seconds)
+        buckets = np.arange(max(first, last - slots + 1), last + 1)
+        with self._lock:
+            idx = buckets % slots
+            sums = self.by_shift[idx] if stations is None else self.by_shift[idx][:, stations]
+            sums = np.where((self._shift_bucket[idx] == buckets)[:, None, None], sums, 0).sum(axis=1)
+        return [
+            dict(self._split(*total), start=float(bucket * self.shift_seconds + self.offset))
+            for bucket, total in zip(buckets.tolist(), sums)
+        ]
+
+    def by_type(self, stations=None):
+        """Totals per material type over ``stations`` (all when None)."""
+        with self._lock:
+            sums = self.by_material if stations is None else self.by_material[stations]
+            sums = sums.sum(axis=0)
+            return {self.materials[code]: self._split(*sums[code])
+                    for code in range(len(self.materials)) if sums[code].any()}
@@ -0,0 +1,97 @@
+"""Prometheus metrics for line performance and dashboard hot paths."""
+from flask import request
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+from prometheus_client import CONTENT_TYPE_LATEST
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+registry = CollectorRegistry()
+
+RENDER_SECONDS = Histogram(
+    'oee_render_content_seconds', 'Time spent in render_content',
+    registry=registry,
+)
+FIGURE_SECONDS = Histogram(
+    'oee_figure_build_seconds', 'Time spent building the overview figures',
+    registry=registry,
+)
+PAYLOAD_BYTES = Histogram(
+    'oee_response_payload_bytes', 'Size of Dash layout and callback responses',
+    ['endpoint'],
+    buckets=(1e3, 5e3, 1e4, 5e4, 1e5, 5e5, 1e6, 5e6),
+    registry=registry,
+)
+
+INGEST_EVENTS = Counter(
+    'oee_ingest_events', 'Machine events received by the ingestion gateway',
+    ['result'],
+    registry=registry,
+)
+INGEST_BATCHES = Counter(
+    'oee_ingest_batches', 'Coalesced batches applied to the engine',
+    registry=registry,
+)
+INGEST_QUEUE = Gauge(
+    'oee_ingest_queue_frames', 'Frames waiting in the ingestion queue',
+    registry=registry,
+)
+INGEST_LAG = Histogram(
+    'oee_ingest_lag_seconds', 'Delay between an event timestamp and applying it',
+    buckets=(0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10, 60),
+    registry=registry,
+)
+INGEST_APPLY_SECONDS = Histogram(
+    'oee_ingest_apply_seconds', 'Time spent applying one coalesced batch',
+    registry=registry,
+)
+
+_STATION_GAUGES = (
+    ('oee', 'oee_station_oee_percent', 'Overall equipment effectiveness'),
+    ('availability', 'oee_station_availability_percent', 'Availability'),
+    ('performance', 'oee_station_performance_percent', 'Performance'),
+    ('quality', 'oee_station_quality_percent', 'Quality'),
+    ('units', 'oee_station_units_produced', 'Units produced'),
+    ('running', 'oee_station_running', '1 while the station is running, 0 when stopped'),
+)
+
+
+class EngineCollector:
+    """Reads station KPIs from the engine at scrape time."""
+
+    def __init__(self, engine, render_cache=None):
+        self.engine = engine
+        self.render_cache = render_cache
+
+    def collect(self):
+        kpi = self.engine.kpis()
+        for key, name, doc in _STATION_GAUGES:
+            family = GaugeMetricFamily(name, doc, labels=['station'])
+            for station, value in zip(kpi['names'], kpi[key]):
+                family.add_metric([station], float(value))
+            yield family
+        if self.render_cache is not None:
+            stats = self.render_cache.stats()
+            hits = CounterMetricFamily('oee_render_cache_hits', 'Render cache hits')
+            hits.add_metric([], stats['hits'])
+            yield hits
+            misses = CounterMetricFamily('oee_render_cache_misses', 'Render cache misses')
+            misses.add_metric([], stats['misses'])
+            yield misses
+
+
+# Dash routes whose response size is tracked
+_PAYLOAD_ENDPOINTS = ('/_dash-layout', '/_dash-update-component')
+
+
+def init_metrics(server, engine, render_cache=None):
+    registry.register(EngineCollector(engine, render_cache))
+
+    @server.after_request
+    def observe_payload(response):
+        if request.path in _PAYLOAD_ENDPOINTS and not response.direct_passthrough:
+            PAYLOAD_BYTES.labels(request.path).observe(response.calculate_content_length() or 0)
+        return response
+
+    @server.route('/metrics')
+    def metrics():
+        return generate_latest(registry), 200, {'Content-Type': CONTENT_TYPE_LATEST}
+
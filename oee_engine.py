@@ -0,0 +1,386 @@
+"""Incremental OEE engine.
+
+Station state lives in NumPy arrays indexed by station position so every
+machine event is an O(1) update and the whole plant can be read back as a
+handful of vectorized expressions.
+"""
+import threading
+import time
+
+import numpy as np
+
+from downtime import DowntimeLog
+from materials import MaterialLedger
+from performance import CycleTimeTable
+
+RUNNING = 'Running'
+STOPPED = 'Stopped'
+NO_LOT = -1
+NO_PRODUCT = -1
+DEFAULT_PLANT = 'Plant 1'
+DEFAULT_LINE = 'Line 1'
+
+# Nominal observation window used when seeding availability from a
+# planned-downtime percentage.
+SHIFT_SECONDS = 8 * 3600
+
+_fields = {
+    'running': np.bool_,
+    'since': np.float64,        # timestamp up to which time has been accrued
+    'up_time': np.float64,      # seconds spent running
+    'down_time': np.float64,    # seconds spent stopped
+    'run_time': np.float64,     # hours the current lot has been running
+    'expected_run_time': np.float64,
+    'units': np.float64,
+    'rejects': np.float64,
+    'lot_num': np.int64,
+    'product': np.int32,          # CycleTimeTable code of the current lot
+    'cycle_time': np.float64,     # ideal seconds per unit of the current lot
+    'ideal_time': np.float64,     # units x ideal cycle time, summed per count
+    'rated_up': np.float64,       # seconds run while a cycle time was known
+    'line': np.int32,             # index into OEEEngine.lines
+    'station_version': np.int64,  # engine version of the last change
+    'status_version': np.int64,   # engine version of the last state change
+}
+
+
+class OEEEngine:
+
+    def __init__(self, capacity=16):
+        self.index = {}
+        self.names = []
+        # Hierarchy: plant names, and (plant index, line name) per line code
+        self.plants = []
+        self.lines = []
+        self._line_codes = {}
+        self.version = 0
+        self._capacity = capacity
+        for field, dtype in _fields.items():
+            setattr(self, field, np.zeros(capacity, dtype=dtype))
+        self.lot_num[:] = NO_LOT
+        self.product[:] = NO_PRODUCT
+        self.cycle_times = CycleTimeTable()
+        # Timestamped run/stop transitions with downtime reasons
+        self.downtime = DowntimeLog()
+        # Weigh-scale totals per station, material, shift and lot
+        self.materials = MaterialLedger(capacity)
+        self._kpis = None
+        self._kpis_version = -1
+        # Held by every write, so ingest, refresh and tick threads never
+        # interleave updates or write into arrays being reallocated
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self.index
+
+    def _grow(self):
+        with self._lock:
+            old = self._capacity
+            self._capacity *= 2
+            for field, dtype in _fields.items():
+                arr = np.zeros(self._capacity, dtype=dtype)
+                arr[:old] = getattr(self, field)
+                setattr(self, field, arr)
+            self.lot_num[old:] = NO_LOT
+            self.product[old:] = NO_PRODUCT
+            self.materials.reserve(self._capacity)
+
+    def _touch(self, idx, status=False):
+        with self._lock:
+            self.version += 1
+            self.station_version[idx] = self.version
+            if status:
+                self.status_version[idx] = self.version
+
+    def touch_status(self, indices):
+        """Mark stations' status changed so views redraw their status badges."""
+        self._touch(np.asarray(indices, dtype=np.int64), status=True)
+
+    def changed_since(self, version):
+        """Indices of stations changed after ``version``."""
+        return np.flatnonzero(self.station_version[:len(self.names)] > version)
+
+    def version_of(self, name):
+        return int(self.station_version[self.index[name]])
+
+    def status_changed_since(self, version):
+        return np.flatnonzero(self.status_version[:len(self.names)] > version)
+
+    def line_code(self, plant, line):
+        key = (plant, line)
+        if key not in self._line_codes:
+            if plant not in self.plants:
+                self.plants.append(plant)
+            self._line_codes[key] = len(self.lines)
+            self.lines.append((self.plants.index(plant), line))
+        return self._line_codes[key]
+
+    def add_station(self, name, ts=None, plant=None, line=None):
+        with self._lock:
+            if name in self.index:
+                idx = self.index[name]
+                if plant is not None or line is not None:
+                    code = self.line_code(plant or DEFAULT_PLANT, line or DEFAULT_LINE)
+                    if self.line[idx] != code:
+                        self.line[idx] = code
+                        self._touch(idx, status=True)
+                return idx
+            if len(self.names) == self._capacity:
+                self._grow()
+            idx = len(self.names)
+            self.index[name] = idx
+            self.names.append(name)
+            self.line[idx] = self.line_code(plant or DEFAULT_PLANT, line or DEFAULT_LINE)
+            self.since[idx] = time.time() if ts is None else ts
+            self.downtime.record(idx, self.since[idx], False)
+            self._touch(idx, status=True)
+            return idx
+
+    def seed(self, name, status=STOPPED, lot_num=NO_LOT, cur=0, exp=0,
+             pdt=0, units=0, fr=0, rejects=None, plant=None, line=None, ts=None, previous=None):
+        """Load a station from summary figures (percentages and totals).
+
+        ``previous`` holds the figures the station was last seeded with. With
+        it the new figures are a baseline: counters move by the difference
+        between the two seeds, keeping what events added since, and status,
+        lot and run times change only where the figures changed. Re-seeding
+        a station with unchanged figures leaves its version alone, so
+        periodic reloads only invalidate stations that actually changed.
+        """
+        with self._lock:
+            idx = self.add_station(name, ts, plant, line)
+            values = _seed_values(status, lot_num, cur, exp, pdt, units, fr, rejects)
+            fields = (self.running, self.lot_num, self.run_time, self.expected_run_time,
+                      self.up_time, self.down_time, self.units, self.rejects)
+            if previous is not None:
+                old = _seed_values(**previous)
+                values = tuple(
+                    field[idx] + value - before if counter else value if value != before else field[idx]
+                    for counter, field, value, before in zip(_SEED_COUNTERS, fields, values, old)
+                )
+            if all(field[idx] == value for field, value in zip(fields, values)):
+                return idx
+            status_changed = self.running[idx] != values[0]
+            for field, value in zip(fields, values):
+                field[idx] = value
+            if status_changed:
+                self.downtime.record(idx, time.time() if ts is None else ts, values[0])
+            self._touch(idx, status=status_changed)
+            return idx
+
+    def _accrue(self, idx, ts):
+        elapsed = max(ts - self.since[idx], 0)
+        if self.running[idx]:
+            self.up_time[idx] += elapsed
+            if self.cycle_time[idx]:
+                self.rated_up[idx] += elapsed
+            self.run_time[idx] += elapsed / 3600
+        else:
+            self.down_time[idx] += elapsed
+        self.since[idx] = ts
+
+    # Machine events
+
+    def state_change(self, name, running, ts=None, reason=None):
+        """``reason`` names why a station stopped (see ``downtime.REASONS``)."""
+        with self._lock:
+            idx = self.add_station(name, ts)
+            ts = time.time() if ts is None else ts
+            self._accrue(idx, ts)
+            self.running[idx] = running
+            self.downtime.record(idx, ts, running, reason)
+            self._touch(idx, status=True)
+
+    def unit_count(self, name, count=1, ts=None):
+        with self._lock:
+            idx = self.add_station(name, ts)
+            self.units[idx] += count
+            self.ideal_time[idx] += count * self.cycle_time[idx]
+            self._touch(idx)
+
+    def reject_count(self, name, count=1, ts=None):
+        with self._lock:
+            idx = self.add_station(name, ts)
+            self.rejects[idx] += count
+            self._touch(idx)
+
+    def lot_start(self, name, lot_num, expected_run_time, ts=None, product=None):
+        """Units counted from here on are rated at ``product``'s ideal cycle
+        time on this station; time before ``ts`` stays with the previous lot."""
+        with self._lock:
+            idx = self.add_station(name, ts)
+            self._accrue(idx, time.time() if ts is None else ts)
+            self.lot_num[idx] = _lot_code(lot_num)
+            self.run_time[idx] = 0
+            self.expected_run_time[idx] = expected_run_time
+            if product is None:
+                self.product[idx] = NO_PRODUCT
+                self.cycle_time[idx] = 0
+            else:
+                self.product[idx] = self.cycle_times.product_code(product)
+                self.cycle_time[idx] = self.cycle_times.lookup(product, name)
+            self._touch(idx)
+
+    def lot_end(self, name, ts=None):
+        with self._lock:
+            idx = self.add_station(name, ts)
+            self._accrue(idx, time.time() if ts is None else ts)
+            self.lot_num[idx] = NO_LOT
+            self.product[idx] = NO_PRODUCT
+            self.cycle_time[idx] = 0
+            self._touch(idx)
+
+    def material(self, name, kg, waste=False, material=None, ts=None):
+        idx = self.add_station(name, ts)
+        self.add_materials([idx], [kg], [waste], [self.materials.material_code(material)],
+                           [time.time() if ts is None else ts])
+
+    def add_materials(self, indices, kg, waste, materials, ts):
+        """Add weigh-scale readings, booked on each station's current lot."""
+        with self._lock:
+            indices = np.asarray(indices, dtype=np.int64)
+            self.materials.add(indices, kg, waste, materials, self.lot_num[indices], ts)
+            self._touch(np.unique(indices))
+
+    def set_cycle_times(self, rows):
+        """Load ideal cycle times and re-rate the lots already running."""
+        with self._lock:
+            self.cycle_times.load(rows)
+            products = self.cycle_times.products
+            for idx in np.flatnonzero(self.product[:len(self.names)] != NO_PRODUCT):
+                self.cycle_time[idx] = self.cycle_times.lookup(products[self.product[idx]],
+                                                               self.names[idx])
+
+    def add_counts(self, indices, units, rejects):
+        """Add coalesced unit/reject deltas for many stations at once."""
+        with self._lock:
+            np.add.at(self.units, indices, units)
+            np.add.at(self.ideal_time, indices, units * self.cycle_time[indices])
+            np.add.at(self.rejects, indices, rejects)
+            self._touch(np.unique(indices))
+
+    def apply(self, event):
+        """Dispatch an event dict such as ``{'type': 'units', 'station': ...}``."""
+        kind = event['type']
+        name = event['station']
+        ts = event.get('ts')
+        if kind == 'state':
+            self.state_change(name, event['status'] == RUNNING, ts, event.get('reason'))
+        elif kind == 'units':
+            self.unit_count(name, event.get('count', 1), ts)
+        elif kind == 'rejects':
+            self.reject_count(name, event.get('count', 1), ts)
+        elif kind == 'lot_start':
+            self.lot_start(name, event['lot_num'], event['expected_run_time'], ts,
+                           event.get('product'))
+        elif kind == 'lot_end':
+            self.lot_end(name, ts)
+        elif kind in ('material_used', 'material_waste'):
+            self.material(name, event['kg'], kind == 'material_waste', event.get('material'), ts)
+        else:
+            raise ValueError(f'Unknown event type: {kind}')
+
+    def tick(self, ts=None):
+        """Accrue elapsed time for every station up to ``ts``."""
+        with self._lock:
+            ts = time.time() if ts is None else ts
+            n = len(self.names)
+            elapsed = np.maximum(ts - self.since[:n], 0)
+            running = self.running[:n]
+            self.up_time[:n] += np.where(running, elapsed, 0)
+            self.down_time[:n] += np.where(running, 0, elapsed)
+            self.run_time[:n] += np.where(running, elapsed / 3600, 0)
+            self.rated_up[:n] += np.where(running & (self.cycle_time[:n] > 0), elapsed, 0)
+            self.since[:n] = ts
+            changed = np.flatnonzero(elapsed)
+            if len(changed):
+                self._touch(changed)
+
+    # Derived KPIs
+
+    def kpis(self):
+        """Rolling A/P/Q/OEE for all stations as arrays, cached per version."""
+        # Read once: a write landing while the arrays are read must leave the
+        # result stamped with the older version, so the next call recomputes
+        version = self.version
+        if self._kpis_version == version:
+            return self._kpis
+        n = len(self.names)
+        up = self.up_time[:n]
+        total = up + self.down_time[:n]
+        cur = self.run_time[:n]
+        exp = self.expected_run_time[:n]
+        units = self.units[:n]
+        rejects = self.rejects[:n]
+        rated = self.rated_up[:n]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            availability = np.where(total > 0, up * 100 / total, 100)
+            # Ideal cycle time x units / run time once lots carry a product,
+            # lot run time against the expected run time before that
+            performance = np.where(rated > 0, self.ideal_time[:n] * 100 / rated,
+                                   np.where(exp > 0, cur * 100 / exp, 0))
+            failure_rate = np.where(units > 0, rejects * 100 / units, 0)
+        quality = 100 - failure_rate
+        oee = performance * quality * availability / 10000
+        self._kpis = {
+            'version': version,
+            'names': list(self.names),
+            'running': self.running[:n].copy(),
+            'lot_num': self.lot_num[:n].copy(),
+            'availability': np.round(availability, 1),
+            'performance': np.round(performance, 1),
+            'quality': np.round(quality, 1),
+            'oee': np.round(oee, 1),
+            'failure_rate': np.round(failure_rate, 1),
+            'units': units.copy(),
+            'cur': np.round(cur, 1),
+            'exp': exp.copy(),
+            'line': self.line[:n].copy(),
+            'up_time': up.copy(),
+            'down_time': self.down_time[:n].copy(),
+            'rejects': rejects.copy(),
+        }
+        self._kpis_version = version
+        return self._kpis
+
+    def station(self, name):
+        """KPIs of one station in the ``process_data`` entry shape."""
+        idx = self.index[name]
+        kpi = self.kpis()
+        lot = int(kpi['lot_num'][idx])
+        return {
+            'status': RUNNING if kpi['running'][idx] else STOPPED,
+            'lot_num': 'Nil' if lot == NO_LOT else lot,
+            'availability': kpi['availability'][idx],
+            'performance': kpi['performance'][idx],
+            'quality': kpi['quality'][idx],
+            'oee': kpi['oee'][idx],
+            'unitsproduced': int(kpi['units'][idx]),
+            'fpr': kpi['failure_rate'][idx],
+            'cur': kpi['cur'][idx],
+            'exp': kpi['exp'][idx],
+        }
+
+
+# Which of the seeded fields are counters that events advance
+_SEED_COUNTERS = (False, False, False, False, True, True, True, True)
+
+
+def _seed_values(status=STOPPED, lot_num=NO_LOT, cur=0, exp=0, pdt=0, units=0, fr=0, rejects=None):
+    return (
+        status == RUNNING,
+        _lot_code(lot_num),
+        cur,
+        exp,
+        SHIFT_SECONDS * (100 - pdt) / 100,
+        SHIFT_SECONDS * pdt / 100,
+        units,
+        units * fr / 100 if rejects is None else rejects,
+    )
+
+
+def _lot_code(lot_num):
+    return NO_LOT if lot_num in (None, 'Nil') else int(lot_num)
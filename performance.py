@@ -0,0 +1,43 @@
+"""Ideal cycle times per product and station.
+
+Performance is ideal cycle time x units / run time. The engine looks the
+cycle time up once per lot start and then adds ``count * cycle_time`` of
+ideal production time with every unit count, so a shift that spans several
+lots and products is split at the lot changes without recomputing anything.
+"""
+
+
+class CycleTimeTable:
+    """Ideal seconds per unit, by (product, station) with a per-product
+    default for stations without their own entry."""
+
+    def __init__(self, rows=()):
+        self.products = []
+        self._codes = {}
+        self._times = {}
+        self.load(rows)
+
+    def __len__(self):
+        return len(self._times)
+
+    def product_code(self, product):
+        if product not in self._codes:
+            self._codes[product] = len(self.products)
+            self.products.append(product)
+        return self._codes[product]
+
+    def set(self, product, seconds, station=None):
+        self._times[self.product_code(product), station] = float(seconds)
+
+    def load(self, rows):
+        """``rows`` are dicts with product, station (None for the product
+        default) and seconds."""
+        for row in rows:
+            self.set(row['product'], row['seconds'], row.get('station'))
+
+    def lookup(self, product, station):
+        """Ideal seconds per unit, or 0 when the product is unknown."""
+        code = self._codes.get(product)
+        if code is None:
+            return 0.0
+        return self._times.get((code, station), self._times.get((code, None), 0.0))
@@ -0,0 +1,201 @@
+"""Opt-in per-request profiling.
+
+``init_profiling`` hooks the Flask server so each request records its total
+time, the time in its view function (Dash's dispatch or layout view) and the
+phases the app marks with ``phase(name)``: component tree building, figure
+construction and so on. Each phase gets its seconds and the net number of
+memory blocks it left allocated. What the view spent outside the marked
+phases is Dash's own dispatch and JSON encoding; what the request spent
+outside the view is Flask, including the other request hooks such as
+compression.
+
+A ``sample_percent`` share of requests also runs under cProfile and
+tracemalloc, keeping the top functions and allocation sites. The slowest of
+the recent requests are served at ``/debug/slow`` and sampled profiles at
+``/debug/profile/<id>``.
+
+Until ``init_profiling`` is called, ``phase`` hands out one shared no-op
+context manager, so marked code pays a global lookup and a call.
+"""
+import contextlib
+import contextvars
+import cProfile
+import io
+import itertools
+import pstats
+import random
+import sys
+import threading
+import time
+import tracemalloc
+from collections import deque
+
+from flask import abort, jsonify, request
+
+_enabled = False
+_NOOP = contextlib.nullcontext()
+_current = contextvars.ContextVar('oee_profile', default=None)
+_ids = itertools.count(1)
+# Allocations of the profilers themselves are left out of the samples
+_PROFILER_FRAMES = [tracemalloc.Filter(False, pattern)
+                    for pattern in ('*/cProfile.py', '*/profile.py', '*/tracemalloc.py', __file__)]
+
+
+class _Phase:
+
+    __slots__ = ('record', 'name', 'start', 'blocks', 'top')
+
+    def __init__(self, record, name):
+        self.record = record
+        self.name = name
+
+    def __enter__(self):
+        self.top = self.record['depth'] == 0
+        self.record['depth'] += 1
+        self.blocks = sys.getallocatedblocks()
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        seconds = time.perf_counter() - self.start
+        record = self.record
+        record['depth'] -= 1
+        phases = record['phases']
+        entry = phases.get(self.name)
+        if entry is None:
+            entry = phases[self.name] = {'seconds': 0.0, 'blocks': 0, 'calls': 0}
+        entry['seconds'] += seconds
+        entry['blocks'] += sys.getallocatedblocks() - self.blocks
+        entry['calls'] += 1
+        if self.top:
+            record['marked'] += seconds
+
+
+def phase(name):
+    """Context manager timing ``name`` within the current request."""
+    if not _enabled:
+        return _NOOP
+    record = _current.get()
+    if record is None:
+        return _NOOP
+    return _Phase(record, name)
+
+
+def _label():
+    if request.path.endswith('_dash-update-component'):
+        body = request.get_json(silent=True) or {}
+        # First output of the callback, e.g. 'dropdown-content-example.children'
+        output = body.get('output', '').strip('.').split('...')[0].split('@')[0]
+        return f'{request.path} {output}'
+    return request.path
+
+
+def _wrap_view(view):
+    def timed_view(*args, **kwargs):
+        record = _current.get()
+        if record is None:
+            return view(*args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return view(*args, **kwargs)
+        finally:
+            record['view'] += time.perf_counter() - start
+
+    timed_view.__name__ = view.__name__
+    timed_view.__doc__ = view.__doc__
+    return timed_view
+
+
+def init_profiling(server, sample_percent=1.0, keep=500, top=25):
+    """Profile requests to ``server``; call after every route is registered."""
+    global _enabled
+    _enabled = True
+    recent = deque(maxlen=keep)
+    profiles = deque(maxlen=20)
+    lock = threading.Lock()
+    # tracemalloc is process-wide: one sampled request at a time uses it
+    tracing = threading.Lock()
+
+    for endpoint, view in list(server.view_functions.items()):
+        if endpoint != 'static':
+            server.view_functions[endpoint] = _wrap_view(view)
+
+    @server.before_request
+    def start_profile():
+        if request.path.startswith('/debug/'):
+            return
+        record = {
+            'id': next(_ids),
+            'phases': {},
+            'depth': 0,
+            'marked': 0.0,
+            'view': 0.0,
+            'blocks': sys.getallocatedblocks(),
+            'profile': None,
+            'traced': False,
+        }
+        if random.random() * 100 < sample_percent:
+            record['profile'] = cProfile.Profile()
+            if tracing.acquire(blocking=False):
+                record['traced'] = True
+                tracemalloc.start()
+            record['profile'].enable()
+        record['start'] = time.perf_counter()
+        _current.set(record)
+
+    @server.teardown_request
+    def finish_profile(exc):
+        record = _current.get()
+        if record is None:
+            return
+        total = time.perf_counter() - record['start']
+        _current.set(None)
+        entry = {
+            'id': record['id'],
+            'request': _label(),
+            'method': request.method,
+            'at': time.time(),
+            'total_ms': total * 1000,
+            'view_ms': record['view'] * 1000,
+            'dash_ms': max(record['view'] - record['marked'], 0) * 1000,
+            'flask_ms': max(total - record['view'], 0) * 1000,
+            'blocks': sys.getallocatedblocks() - record['blocks'],
+            'phases': {
+                name: {'ms': phase['seconds'] * 1000, 'blocks': phase['blocks'], 'calls': phase['calls']}
+                for name, phase in record['phases'].items()
+            },
+            'sampled': record['profile'] is not None,
+        }
+        if record['profile'] is not None:
+            record['profile'].disable()
+            sample = {'id': record['id'], 'request': entry['request']}
+            if record['traced']:
+                snapshot = tracemalloc.take_snapshot().filter_traces(_PROFILER_FRAMES)
+                tracemalloc.stop()
+                tracing.release()
+                sample['allocations'] = [
+                    {'where': str(stat.traceback), 'kib': stat.size / 1024, 'blocks': stat.count}
+                    for stat in snapshot.statistics('lineno')[:top]
+                ]
+            stream = io.StringIO()
+            pstats.Stats(record['profile'], stream=stream).sort_stats('cumulative').print_stats(top)
+            sample['profile'] = stream.getvalue()
+            with lock:
+                profiles.append(sample)
+        with lock:
+            recent.append(entry)
+
+    @server.route('/debug/slow')
+    def slow_requests():
+        """The slowest of the last ``keep`` requests, slowest first."""
+        limit = request.args.get('limit', 20, type=int)
+        with lock:
+            entries = sorted(recent, key=lambda entry: -entry['total_ms'])[:limit]
+        return jsonify({'requests': entries, 'sample_percent': sample_percent})
+
+    @server.route('/debug/profile/<int:profile_id>')
+    def sampled_profile(profile_id):
+        with lock:
+            for sample in profiles:
+                if sample['id'] == profile_id:
+                    return jsonify(sample)
+        abort(404)
@@ -0,0 +1,49 @@
+"""Per-station cache of rendered Specific Step View trees."""
+import threading
+
+from cachetools import LRUCache, TTLCache
+
+
+class RenderCache:
+    """Keeps one rendered tree per station, tagged with the station version.
+
+    A lookup with a newer version rebuilds and replaces the entry, so a
+    station is only re-rendered when its own metrics changed. ``ttl``
+    (seconds) additionally bounds how long an entry may be served.
+    """
+
+    def __init__(self, maxsize=256, ttl=0):
+        self._cache = TTLCache(maxsize, ttl) if ttl else LRUCache(maxsize)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, station, version, build):
+        with self._lock:
+            entry = self._cache.get(station)
+            if entry is not None and entry[0] == version:
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+        value = build()
+        with self._lock:
+            self._cache[station] = (version, value)
+        return value
+
+    def invalidate(self, station=None):
+        with self._lock:
+            if station is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(station, None)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / total if total else 0.0,
+                'size': len(self._cache),
+                'maxsize': self._cache.maxsize,
+            }
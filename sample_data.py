@@ -0,0 +1,40 @@
+"""Sample plant used by the in-memory data source."""
+
+# Station rows in line order, in the shape returned by DataSource.fetch()
+SAMPLE_STATIONS = [
+    {'name': 'Paste Grinding', 'status': 'Running', 'lot_num': 20005,
+     'cur': 1.3, 'exp': 1.5, 'pdt': 8, 'units': 1043, 'rejects': 52,
+     'x': [1, 2, 3, 4, 5], 'y': [10, 11, 10, 11, 10]},
+    {'name': 'Machine 1', 'status': 'Running', 'lot_num': 20002,
+     'cur': 20, 'exp': 30, 'pdt': 12, 'units': 205, 'rejects': 0,
+     'mat_used': 32.4, 'mat_waste': 4.2,
+     'x': [1, 2, 3, 4, 5], 'y': [10, 15, 13, 17, 14]},
+    {'name': 'Machine 2', 'status': 'Running', 'lot_num': 20004,
+     'cur': 74, 'exp': 108, 'pdt': 40, 'units': 102, 'rejects': 0,
+     'mat_used': 42.5, 'mat_waste': 5.3,
+     'x': [1, 2, 3, 4, 5], 'y': [5, 9, 7, 14, 10]},
+    {'name': 'Machine 3', 'status': 'Stopped', 'lot_num': 'Nil',
+     'cur': 0, 'exp': 0, 'pdt': 3, 'units': 733, 'rejects': 0,
+     'x': [1, 2, 3, 4, 5], 'y': [2, 3, 4, 2, 5]},
+    {'name': 'Furnace', 'status': 'Running', 'lot_num': 19999,
+     'cur': 8, 'exp': 10, 'pdt': 4, 'units': 1037, 'rejects': 0,
+     'x': [1, 2, 3, 4, 5], 'y': [8, 9, 7, 9, 8]},
+    {'name': 'Wirecut', 'status': 'Running', 'lot_num': 20000,
+     'cur': 3, 'exp': 4, 'pdt': 15, 'units': 1036, 'rejects': 0,
+     'x': [1, 2, 3, 4, 5], 'y': [7, 7, 8, 8, 7]},
+    {'name': 'Machining', 'status': 'Stopped', 'lot_num': 'Nil',
+     'cur': 0, 'exp': 0, 'pdt': 20, 'units': 1035, 'rejects': 41,
+     'x': [1, 2, 3, 4, 5], 'y': [14, 13, 15, 14, 16]},
+    {'name': 'Dimension', 'status': 'Running', 'lot_num': 19998,
+     'cur': 1, 'exp': 3, 'pdt': 30, 'units': 1034, 'rejects': 41,
+     'x': [1, 2, 3, 4, 5], 'y': [3, 4, 3, 4, 3]},
+    {'name': 'Tensile', 'status': 'Running', 'lot_num': 19998,
+     'cur': 0.5, 'exp': 1, 'pdt': 14, 'units': 1034, 'rejects': 103,
+     'x': [1, 2, 3, 4, 5], 'y': [6, 6, 7, 6, 5]},
+    {'name': 'Packing', 'status': 'Running', 'lot_num': 19997,
+     'cur': 1, 'exp': 1, 'pdt': 70, 'units': 1033, 'rejects': 0,
+     'x': [1, 2, 3, 4, 5], 'y': [1, 2, 1, 2, 1]},
+    {'name': 'Shipping', 'status': 'Running', 'lot_num': 19996,
+     'cur': 1, 'exp': 2, 'pdt': 70, 'units': 1032, 'rejects': 0,
+     'x': [1, 2, 3, 4, 5], 'y': [4, 3, 4, 3, 4]},
+]
@@ -0,0 +1,180 @@
+"""Shared KPI state for multi-worker (gunicorn) deployments.
+
+One updater process (``updater.py``) owns the live ``OEEEngine`` and
+publishes its raw station arrays into a memory-mapped file, ideally on
+``/dev/shm``. Every gunicorn worker opens the file through ``SharedEngine``,
+an engine whose arrays are read-only views of that mapping, so all workers
+see the same numbers without copying or recomputing them.
+
+Writes are guarded by a sequence lock: the writer makes the sequence odd,
+copies the arrays, then makes it even again, and readers retry a read that
+overlapped a write. Station names, the plant/line hierarchy and the data
+source rows change rarely and are kept in a JSON sidecar whose generation is
+recorded in the header.
+"""
+import json
+import numbers
+import os
+import threading
+import time
+
+import numpy as np
+
+from oee_engine import OEEEngine, _fields
+
+MAGIC = 0x4F45454B5049  # 'OEEKPI'
+HEADER = np.dtype([('magic', '<u8'), ('seq', '<u8'), ('version', '<i8'), ('n', '<i8'),
+                   ('capacity', '<i8'), ('meta', '<i8'), ('published', '<f8'), ('pad', '<u8')])
+
+
+def _layout(capacity):
+    offsets = {}
+    offset = HEADER.itemsize
+    for field, dtype in _fields.items():
+        offsets[field] = offset
+        offset += -(-np.dtype(dtype).itemsize * capacity // 8) * 8
+    return offsets, offset
+
+
+def _views(mm, capacity):
+    offsets, _ = _layout(capacity)
+    return {field: np.ndarray(capacity, dtype=dtype, buffer=mm, offset=offsets[field])
+            for field, dtype in _fields.items()}
+
+
+def _jsonable(value):
+    # Database drivers hand back Decimal and datetime values
+    return float(value) if isinstance(value, numbers.Number) else str(value)
+
+
+def _meta_path(path):
+    return path + '.meta.json'
+
+
+class SharedKPITable:
+    """Writer side of the shared table; only the updater process uses it."""
+
+    def __init__(self, path, capacity=16384):
+        self.path = path
+        self.capacity = capacity
+        _, size = _layout(capacity)
+        self._mm = np.memmap(path, dtype=np.uint8, mode='w+', shape=size)
+        self.header = np.ndarray(1, dtype=HEADER, buffer=self._mm)[0]
+        self.header['magic'] = MAGIC
+        self.header['capacity'] = capacity
+        self.arrays = _views(self._mm, capacity)
+        self._meta_key = None
+
+    def publish(self, engine, source=None):
+        # Read before the copy: an event landing mid-copy must leave the table
+        # stamped with the older version, so the next publish carries it
+        version = engine.version
+        n = len(engine)
+        if n > self.capacity:
+            raise ValueError(f'{n} stations do not fit a shared table of {self.capacity}')
+        meta_key = (n, len(engine.lines), getattr(source, 'generation', None))
+        self.header['seq'] += 1
+        try:
+            for field, shared in self.arrays.items():
+                shared[:n] = getattr(engine, field)[:n]
+            if meta_key != self._meta_key:
+                self._write_meta(engine, source)
+                self._meta_key = meta_key
+                self.header['meta'] += 1
+            self.header['n'] = n
+            self.header['version'] = version
+            self.header['published'] = time.time()
+        finally:
+            self.header['seq'] += 1
+
+    def _write_meta(self, engine, source):
+        meta = {
+            'names': engine.names,
+            'plants': engine.plants,
+            'lines': engine.lines,
+            'extras': source.stations if source is not None else {},
+        }
+        tmp = _meta_path(self.path) + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(meta, f, default=_jsonable)
+        os.replace(tmp, _meta_path(self.path))
+
+
+class SharedEngine(OEEEngine):
+    """Read-only engine over a ``SharedKPITable`` file.
+
+    Event methods raise; ``tick`` is a no-op because the updater accrues time
+    before it publishes.
+    """
+
+    def __init__(self, path, timeout=10):
+        deadline = time.time() + timeout
+        while not os.path.exists(_meta_path(path)):
+            if time.time() > deadline:
+                raise FileNotFoundError(f'no shared KPI table at {path}; is updater.py running?')
+            time.sleep(0.1)
+        self.path = path
+        self._mm = np.memmap(path, dtype=np.uint8, mode='r')
+        self.header = np.ndarray(1, dtype=HEADER, buffer=self._mm)[0]
+        if self.header['magic'] != MAGIC:
+            raise ValueError(f'{path} is not a shared KPI table')
+        self._capacity = int(self.header['capacity'])
+        for field, view in _views(self._mm, self._capacity).items():
+            setattr(self, field, view)
+        self.index = {}
+        self.names = []
+        self.plants = []
+        self.lines = []
+        self._line_codes = {}
+        # Data source rows per station, updated in place on every meta change
+        self.extras = {}
+        # Transition logs and material ledgers stay in the updater process
+        self.downtime = None
+        self.materials = None
+        self._meta = -1
+        self._kpis = None
+        self._kpis_version = -1
+        self._lock = threading.RLock()
+        self._sync_meta()
+
+    @property
+    def version(self):
+        return int(self.header['version'])
+
+    def _sync_meta(self):
+        meta = int(self.header['meta'])
+        if meta == self._meta:
+            return
+        with open(_meta_path(self.path)) as f:
+            data = json.load(f)
+        self.names = data['names']
+        self.index = {name: idx for idx, name in enumerate(self.names)}
+        self.plants = data['plants']
+        self.lines = [tuple(line) for line in data['lines']]
+        self._line_codes = {(self.plants[p], line): code for code, (p, line) in enumerate(self.lines)}
+        self.extras.clear()
+        self.extras.update(data['extras'])
+        self._meta = meta
+
+    def kpis(self):
+        while True:
+            seq = int(self.header['seq'])
+            if seq % 2:
+                time.sleep(0)
+                continue
+            self._sync_meta()
+            kpi = super().kpis()
+            if int(self.header['seq']) == seq:
+                return kpi
+            # A publish overlapped the read: force a recompute
+            self._kpis_version = -1
+
+    def __contains__(self, name):
+        self._sync_meta()
+        return name in self.index
+
+    def tick(self, ts=None):
+        pass
+
+    def _touch(self, idx, status=False):
+        raise TypeError('SharedEngine is read-only; send events to the updater process')
@@ -0,0 +1,324 @@
+"""Replay and load simulation.
+
+Loads a synthetic plant into the app the way ``benchmarks.py`` does, replays
+a machine-event log into its engine at 1x-1000x speed, and meanwhile drives
+simulated dashboard clients through Dash's callback endpoint (overview
+refreshes and Specific Step View renders), without PLCs, a database or a
+browser:
+
+    python simulator.py --stations 2000 --minutes 60 --speed 100 --clients 20
+
+Event logs are JSON lines of ``OEEEngine.apply`` events with a ``ts``.
+``--record events.jsonl`` writes the synthetic log so later runs can
+``--replay events.jsonl`` the same traffic. The report gives callback
+latency percentiles, throughput, replay lag and memory growth as JSON.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import sys
+import threading
+import time
+
+import numpy as np
+
+import app
+from benchmarks import git_commit, install, synthetic_rows
+from downtime import REASONS
+from oee_engine import RUNNING, STOPPED
+
+
+def synthetic_events(names, seconds, start=0.0, step=10, seed=0):
+    """Time-ordered events of ``names`` over ``seconds``: unit counts at a
+    per-station cycle time, rejects, stops with reasons, restarts, lot
+    changes and weigh-scale readings."""
+    rng = np.random.default_rng(seed)
+    n = len(names)
+    cycle = rng.uniform(20, 120, n)
+    running = rng.random(n) < 0.8
+    lots = rng.integers(10000, 30000, n)
+    for t in np.arange(start, start + seconds, step):
+        for i in np.flatnonzero(rng.random(n) < step / 3600):
+            running[i] = not running[i]
+            event = {'type': 'state', 'station': names[i], 'ts': float(t),
+                     'status': RUNNING if running[i] else STOPPED}
+            if not running[i]:
+                event['reason'] = REASONS[int(rng.integers(1, len(REASONS)))]
+            yield event
+        units = np.where(running, rng.poisson(step / cycle), 0)
+        for i in np.flatnonzero(units):
+            ts = float(t + rng.uniform(0, step))
+            yield {'type': 'units', 'station': names[i], 'ts': ts, 'count': int(units[i])}
+            if rng.random() < 0.05:
+                yield {'type': 'rejects', 'station': names[i], 'ts': ts, 'count': 1}
+            if rng.random() < 0.02:
+                yield {'type': 'material_used', 'station': names[i], 'ts': ts,
+                       'kg': round(float(rng.uniform(0.5, 5)), 2)}
+        for i in np.flatnonzero(rng.random(n) < step / (4 * 3600)):
+            lots[i] += 1
+            yield {'type': 'lot_end', 'station': names[i], 'ts': float(t)}
+            yield {'type': 'lot_start', 'station': names[i], 'ts': float(t), 'lot_num': int(lots[i]),
+                   'expected_run_time': float(rng.integers(1, 8))}
+
+
+def write_log(events, path):
+    count = 0
+    with open(path, 'w') as f:
+        for event in events:
+            f.write(json.dumps(event) + '\n')
+            count += 1
+    return count
+
+
+def read_log(path):
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+class Replayer:
+    """Applies ``events`` to ``engine`` in a thread, ``speed`` times faster
+    than recorded (0 as fast as possible). Timestamps are shifted so the log
+    starts now."""
+
+    def __init__(self, engine, events, speed=1.0):
+        self.engine = engine
+        self.events = events
+        self.speed = speed
+        self.applied = 0
+        self.errors = 0
+        self.max_lag = 0.0
+        self.seconds = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def run(self):
+        started = time.perf_counter()
+        now = time.time()
+        first = None
+        for event in self.events:
+            if self._stop.is_set():
+                break
+            if first is None:
+                first = event['ts']
+            offset = event['ts'] - first
+            if self.speed:
+                due = offset / self.speed - (time.perf_counter() - started)
+                if due > 0.001:
+                    self._stop.wait(due)
+                else:
+                    self.max_lag = max(self.max_lag, -due)
+            try:
+                self.engine.apply(dict(event, ts=now + offset))
+            except (KeyError, ValueError):
+                self.errors += 1
+            self.applied += 1
+        self.seconds = time.perf_counter() - started
+
+    def start(self):
+        self._thread = threading.Thread(target=self.run, name='oee-replay', daemon=True)
+        self._thread.start()
+
+    def join(self, timeout=None):
+        self._thread.join(timeout)
+        return not self._thread.is_alive()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def report(self):
+        return {
+            'events': self.applied,
+            'errors': self.errors,
+            'seconds': self.seconds,
+            'events_per_s': self.applied / self.seconds if self.seconds else None,
+            'max_lag_s': self.max_lag,
+        }
+
+
+def _callback_key(output):
+    for key in app.app.callback_map:
+        if output in key:
+            return key
+    return None
+
+
+def _outputs(key):
+    specs = [spec.rsplit('.', 1) for spec in key.strip('.').split('...')]
+    outputs = [{'id': spec_id, 'property': prop} for spec_id, prop in specs]
+    return outputs if key.startswith('..') else outputs[0]
+
+
+class Client:
+    """A dashboard user: switches plant, line and page and opens stations
+    through ``/_dash-update-component``, timing every callback."""
+
+    def __init__(self, seed, think=0.0):
+        self.rng = np.random.default_rng(seed)
+        self.think = think
+        self.http = app.server.test_client()
+        self.latencies = {'overview': [], 'step_view': []}
+        self.errors = {'overview': 0, 'step_view': 0}
+        self.overview_key = _callback_key('status-grid.children')
+        self.step_key = _callback_key('dropdown-content-example.children')
+        self.url = app.app.config.requests_pathname_prefix + '_dash-update-component'
+
+    def _post(self, name, key, inputs, changed):
+        body = {'output': key, 'outputs': _outputs(key), 'inputs': inputs, 'changedPropIds': changed}
+        start = time.perf_counter()
+        response = self.http.post(self.url, json=body, headers={'Accept-Encoding': 'gzip'})
+        self.latencies[name].append(time.perf_counter() - start)
+        if response.status_code not in (200, 204):
+            self.errors[name] += 1
+
+    def overview(self):
+        engine = app.engine
+        plant = str(self.rng.choice(engine.plants)) if engine.plants else None
+        lines = app.lines_of(engine, plant)
+        line = str(self.rng.choice(lines)) if lines and self.rng.random() < 0.7 else None
+        changed = 'line-filter.value' if line else 'plant-filter.value'
+        self._post('overview', self.overview_key, [
+            {'id': 'plant-filter', 'property': 'value', 'value': plant},
+            {'id': 'line-filter', 'property': 'value', 'value': line},
+            {'id': 'page', 'property': 'value', 'value': int(self.rng.integers(1, 4))},
+        ], [changed])
+
+    def step_view(self):
+        station = str(self.rng.choice(app.engine.names))
+        self._post('step_view', self.step_key, [
+            {'id': 'dropdown-example', 'property': 'value', 'value': station},
+        ], ['dropdown-example.value'])
+
+    def run(self, stop):
+        while not stop.is_set():
+            if self.step_key and self.rng.random() < 0.5:
+                self.step_view()
+            else:
+                self.overview()
+            if self.think:
+                stop.wait(self.rng.exponential(self.think))
+
+
+def rss_mb():
+    """Resident set size of this process in MB."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except OSError:
+        # Peak instead of current where /proc is missing (KB on Linux, bytes on macOS)
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 2 ** 10
+
+
+def percentiles(values, seconds):
+    if not values:
+        return {'calls': 0}
+    ms = np.array(values) * 1000
+    p50, p90, p99 = np.percentile(ms, [50, 90, 99])
+    return {
+        'calls': len(values),
+        'calls_per_s': len(values) / seconds,
+        'p50_ms': p50,
+        'p90_ms': p90,
+        'p99_ms': p99,
+        'max_ms': ms.max(),
+    }
+
+
+def simulate(events, speed, clients, duration, think=0.0, seed=0):
+    """Replay ``events`` while ``clients`` run for ``duration`` seconds (or
+    until the replay ends when ``duration`` is 0)."""
+    # One untimed round first: plotly and dash_daq import modules on first
+    # use, which concurrent first calls would race on
+    warmup = Client(seed)
+    warmup.overview()
+    if warmup.step_key:
+        warmup.step_view()
+
+    replayer = Replayer(app.engine, events, speed)
+    stop = threading.Event()
+    users = [Client(seed + i, think) for i in range(clients)]
+    threads = [threading.Thread(target=user.run, args=(stop,), daemon=True) for user in users]
+    memory = [rss_mb()]
+    started = time.perf_counter()
+    replayer.start()
+    for thread in threads:
+        thread.start()
+    while True:
+        done = replayer.join(0.5)
+        memory.append(rss_mb())
+        elapsed = time.perf_counter() - started
+        if (duration and elapsed >= duration) or (not duration and done):
+            break
+    stop.set()
+    for thread in threads:
+        thread.join()
+    replayer.stop()
+    elapsed = time.perf_counter() - started
+
+    callbacks = {}
+    for name in ('overview', 'step_view'):
+        latencies = [value for user in users for value in user.latencies[name]]
+        callbacks[name] = dict(percentiles(latencies, elapsed),
+                               errors=sum(user.errors[name] for user in users))
+    return {
+        'seconds': elapsed,
+        'replay': replayer.report(),
+        'callbacks': callbacks,
+        'memory': {
+            'rss_start_mb': memory[0],
+            'rss_end_mb': memory[-1],
+            'rss_peak_mb': max(memory),
+            'growth_mb': memory[-1] - memory[0],
+            'samples_mb': [round(value, 1) for value in memory],
+        },
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--stations', type=int, default=1000)
+    parser.add_argument('--minutes', type=float, default=60, help='length of the synthetic log')
+    parser.add_argument('--speed', type=float, default=100, help='1-1000, or 0 for as fast as possible')
+    parser.add_argument('--clients', type=int, default=10)
+    parser.add_argument('--think', type=float, default=0.0, help='mean seconds between client actions')
+    parser.add_argument('--duration', type=float, default=0, help='seconds to run (0: until the log ends)')
+    parser.add_argument('--replay', help='replay this event log instead of a synthetic one')
+    parser.add_argument('--record', help='write the synthetic event log here and exit')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='write JSON here instead of stdout')
+    args = parser.parse_args(argv)
+    if args.speed and not 1 <= args.speed <= 1000:
+        parser.error('--speed must be between 1 and 1000, or 0')
+
+    rows = synthetic_rows(args.stations, args.seed)
+    names = [row['name'] for row in rows]
+    if args.record:
+        count = write_log(synthetic_events(names, args.minutes * 60, seed=args.seed), args.record)
+        sys.stdout.write(f'{count} events written to {args.record}\n')
+        return
+    install(rows)
+    events = (read_log(args.replay) if args.replay
+              else synthetic_events(names, args.minutes * 60, seed=args.seed))
+    report = {
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'stations': args.stations,
+        'speed': args.speed,
+        'clients': args.clients,
+        'results': simulate(events, args.speed, args.clients, args.duration, args.think, args.seed),
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+    else:
+        sys.stdout.write(text + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""Startup timing.
+
+``app.py`` marks the end of each startup phase and imports its heavy,
+rarely needed modules through ``lazy_import``, which records what the first
+use cost. Both are served at ``/startup``. For a per-module breakdown of
+import time, run::
+
+    python startup.py [--top 15]
+
+which imports the app in a fresh interpreter under ``-X importtime`` and
+prints the phases together with the slowest top-level imports.
+"""
+import argparse
+import importlib
+import json
+import subprocess
+import sys
+import time
+
+_started = time.perf_counter()
+_last = _started
+phases = []
+lazy_imports = {}
+
+
+def mark(phase):
+    """End ``phase``: it took the time since the previous mark."""
+    global _last
+    now = time.perf_counter()
+    phases.append({'phase': phase, 'seconds': now - _last})
+    _last = now
+
+
+def lazy_import(name):
+    # Always through import_module: while one thread is still importing,
+    # sys.modules already holds the half-initialized module, and only the
+    # import machinery makes other threads wait for it
+    first = name not in sys.modules
+    start = time.perf_counter()
+    module = importlib.import_module(name)
+    if first:
+        lazy_imports.setdefault(name, time.perf_counter() - start)
+    return module
+
+
+def report():
+    return {
+        'phases': phases,
+        'total_seconds': _last - _started,
+        'lazy_imports': lazy_imports,
+    }
+
+
+def import_times(output, depth=1):
+    """Cumulative seconds of the imports ``depth`` levels deep in ``-X
+    importtime`` output; depth 1 holds the modules ``app`` imports itself."""
+    times = {}
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # Nested imports are indented two spaces per level
+        if (len(name) - len(name.lstrip()) - 1) // 2 == depth:
+            times[name.strip()] = int(cumulative) / 1e6
+    return times
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--top', type=int, default=15)
+    args = parser.parse_args(argv)
+
+    code = 'import json, app, startup; print(json.dumps(startup.report()))'
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                            capture_output=True, text=True, check=True)
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+    imports = sorted(import_times(result.stderr).items(), key=lambda item: -item[1])
+    report['imports'] = [{'module': name, 'seconds': seconds} for name, seconds in imports[:args.top]]
+    sys.stdout.write(json.dumps(report, indent=2) + '\n')
+
+
+if __name__ == '__main__':
+    main()
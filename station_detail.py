@@ -0,0 +1,119 @@
+"""Lazily loaded per-station detail.
+
+Startup and refreshes only load the summary columns every overview needs.
+Material totals and other per-station detail are fetched the first time a
+station is opened, kept in a bounded cache, and the stations next to it in
+``processes`` order are fetched in the background, since operators usually
+step through neighbouring stations. Bulk reads of every station go through
+``get_many``, which loads what is not cached in one batched fetch.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from cachetools import LRUCache, TTLCache
+
+
+class DetailLoader:
+
+    def __init__(self, fetch, order, maxsize=512, ttl=0, prefetch=2, workers=2, fetch_many=None):
+        # ``fetch(name)`` loads one station's detail dict; ``order()`` returns
+        # the station names whose neighbours get prefetched; ``fetch_many(names)``
+        # loads several stations' detail by name
+        self.fetch = fetch
+        self.fetch_many = fetch_many or (lambda names: {name: fetch(name) for name in names})
+        self.order = order
+        self.prefetch = prefetch
+        self._cache = TTLCache(maxsize, ttl) if ttl else LRUCache(maxsize)
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._executor = ThreadPoolExecutor(workers, thread_name_prefix='oee-detail')
+        self.hits = 0
+        self.misses = 0
+        self.prefetched = 0
+
+    def _load(self, name):
+        """Future for ``name``'s detail, shared by concurrent requests."""
+        with self._lock:
+            future = self._pending.get(name)
+            if future is None:
+                future = self._executor.submit(self._fetch, name)
+                self._pending[name] = future
+            return future
+
+    def _fetch(self, name):
+        try:
+            detail = self.fetch(name)
+            with self._lock:
+                self._cache[name] = detail
+            return detail
+        finally:
+            with self._lock:
+                self._pending.pop(name, None)
+
+    def get(self, name):
+        with self._lock:
+            detail = self._cache.get(name)
+            if detail is not None:
+                self.hits += 1
+        if detail is None:
+            with self._lock:
+                self.misses += 1
+            detail = self._load(name).result()
+        self.prefetch_around(name)
+        return detail
+
+    def get_many(self, names):
+        """Detail of ``names`` by name: cached entries as they are, the rest
+        from one ``fetch_many`` call. Bulk results are not cached, so a read
+        of the whole plant does not evict the stations operators opened."""
+        found = {}
+        with self._lock:
+            for name in names:
+                detail = self._cache.get(name)
+                if detail is not None:
+                    found[name] = detail
+        missing = [name for name in names if name not in found]
+        if missing:
+            found.update(self.fetch_many(missing))
+        return found
+
+    def peek(self, name):
+        """Cached detail without loading it, or None."""
+        with self._lock:
+            return self._cache.get(name)
+
+    def prefetch_around(self, name):
+        if not self.prefetch:
+            return
+        names = self.order()
+        try:
+            i = names.index(name)
+        except ValueError:
+            return
+        for neighbour in names[max(i - self.prefetch, 0):i + self.prefetch + 1]:
+            with self._lock:
+                known = neighbour in self._cache or neighbour in self._pending
+                if not known:
+                    self.prefetched += 1
+            if not known:
+                self._load(neighbour)
+
+    def invalidate(self, name=None):
+        with self._lock:
+            if name is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(name, None)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / total if total else 0.0,
+                'prefetched': self.prefetched,
+                'pending': len(self._pending),
+                'size': len(self._cache),
+                'maxsize': self._cache.maxsize,
+            }
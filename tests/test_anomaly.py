@@ -0,0 +1,35 @@
+import sys
+import threading
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from anomaly import AnomalyMonitor  # noqa: E402
+from history import HistoryStore  # noqa: E402
+from oee_engine import OEEEngine  # noqa: E402
+
+
+def test_flags_availability_drop_without_threads():
+    engine = OEEEngine()
+    engine.add_station('Station 1', ts=0)
+    engine.state_change('Station 1', True, ts=0)
+    history = HistoryStore(offset=0)
+    history.capture(engine, ts=0)
+    for minute in range(1, 31):
+        if minute == 30:
+            engine.state_change('Station 1', False, ts=minute * 60 - 50)
+        history.capture(engine, ts=minute * 60)
+
+    threads = threading.active_count()
+    monitor = AnomalyMonitor(engine, history, workers=2, method='ewma')
+    try:
+        # Forking the model processes started no threads in this process
+        assert threading.active_count() == threads
+        # A capture at t lands in the bucket starting at t
+        for minute in range(2, 31):
+            monitor.run_once(now=minute * 60)
+            assert monitor.flags == {}
+        monitor.run_once(now=31 * 60)
+        assert monitor.flags == {0: ['availability']}
+    finally:
+        monitor.stop()
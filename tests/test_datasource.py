@@ -0,0 +1,93 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from datasource import DataSource, MemoryBackend  # noqa: E402
+from oee_engine import OEEEngine  # noqa: E402
+
+
+def rows():
+    return [
+        {'name': 'Station 1', 'status': 'Running', 'lot_num': 7, 'cur': 1, 'exp': 2, 'pdt': 10,
+         'units': 205, 'rejects': 5},
+        {'name': 'Station 2', 'status': 'Stopped', 'lot_num': None, 'cur': 0, 'exp': 0, 'pdt': 0,
+         'units': 0, 'rejects': 0},
+    ]
+
+
+def test_refresh_keeps_live_state():
+    backend = MemoryBackend(rows())
+    source = DataSource(backend)
+    engine = OEEEngine()
+    source.refresh(engine)
+    engine.unit_count('Station 1', 50)
+    engine.tick()
+    up = engine.up_time[0]
+    version = engine.version
+    source.refresh(engine)
+    assert engine.units[0] == 255
+    assert engine.up_time[0] == up
+    assert engine.version == version
+
+    backend.rows[0]['units'] = 210
+    backend.rows[1]['status'] = 'Running'
+    source.refresh(engine)
+    assert engine.units[0] == 260
+    assert engine.running[1]
+    assert list(engine.changed_since(version)) == [0, 1]
+
+
+def test_refresh_drops_removed_rows_and_counts_generations():
+    backend = MemoryBackend(rows())
+    source = DataSource(backend)
+    engine = OEEEngine()
+    source.refresh(engine)
+    generation = source.generation
+    source.refresh(engine)
+    assert source.generation == generation
+    backend.rows.pop()
+    source.refresh(engine)
+    assert list(source.stations) == ['Station 1']
+    assert source.generation == generation + 1
+
+
+def test_mysql_checkouts_wait_for_a_free_connection(monkeypatch):
+    import threading
+    import time
+    import types
+
+    from datasource import MySQLBackend
+
+    class Pool:
+        def __init__(self, pool_size, **_):
+            self.free = pool_size
+
+        def get_connection(self):
+            if not self.free:
+                raise RuntimeError('pool exhausted')
+            self.free -= 1
+            return types.SimpleNamespace(close=self.release)
+
+        def release(self):
+            self.free += 1
+
+    pooling = types.SimpleNamespace(MySQLConnectionPool=Pool)
+    monkeypatch.setitem(sys.modules, 'mysql', types.SimpleNamespace(connector=types.SimpleNamespace(pooling=pooling)))
+    monkeypatch.setitem(sys.modules, 'mysql.connector', types.SimpleNamespace(pooling=pooling))
+    backend = MySQLBackend('host', 'user', 'password', 'db', pool_size=2)
+    errors = []
+
+    def use():
+        try:
+            with backend.connection():
+                time.sleep(0.01)
+        except RuntimeError as exc:
+            errors.append(exc)
+
+    threads = [threading.Thread(target=use) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
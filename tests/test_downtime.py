@@ -0,0 +1,25 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from downtime import Track  # noqa: E402
+
+
+def test_late_stop_is_compared_with_the_state_before_it():
+    track = Track()
+    track.record(0, False)
+    track.record(10, True)
+    track.record(20, False)
+    track.record(15, False)
+    assert track.up_at(30) == 5
+
+
+def test_duplicate_states_are_dropped():
+    track = Track()
+    track.record(0, False)
+    track.record(10, True)
+    track.record(12, True)
+    track.record(5, False)
+    assert track.n == 2
+    assert track.up_at(20) == 10
@@ -0,0 +1,110 @@
+import csv
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy as np  # noqa: E402
+
+from export import ExportJobs, history_chunks, kpi_chunks, write_csv  # noqa: E402
+from history import HistoryStore  # noqa: E402
+from oee_engine import OEEEngine  # noqa: E402
+
+
+def station_engine(n=5):
+    engine = OEEEngine()
+    for i in range(n):
+        engine.state_change(f'S{i}', True, ts=0)
+        engine.unit_count(f'S{i}', 10 * (i + 1), ts=0)
+    return engine
+
+
+def test_kpi_chunks_read_detail_one_chunk_at_a_time():
+    engine = station_engine()
+    asked = []
+
+    def details(names):
+        asked.append(names)
+        return {'S1': {'mat_used': 4.0, 'mat_waste': 1.0}}
+
+    chunks = list(kpi_chunks(engine, range(5), details, chunk=2))
+    assert [len(chunk['station']) for chunk in chunks] == [2, 2, 1]
+    assert asked == [['S0', 'S1'], ['S2', 'S3'], ['S4']]
+    np.testing.assert_array_equal(chunks[0]['mat_used'], [np.nan, 4.0])
+    assert list(chunks[2]['units']) == [50]
+    assert list(chunks[0]['plant']) == ['Plant 1', 'Plant 1']
+
+
+def test_write_csv_streams_chunks_under_one_header(tmp_path):
+    chunks = [{'station': np.array(['S0', 'S1'], dtype=object), 'oee': np.array([12.3456, np.nan])},
+              {'station': np.array(['S2'], dtype=object), 'oee': np.array([7.0])}]
+    path = tmp_path / 'kpis.csv'
+    assert write_csv(iter(chunks), path) == 3
+    with open(path, newline='') as f:
+        assert list(csv.reader(f)) == [['station', 'oee'], ['S0', '12.346'], ['S1', ''], ['S2', '7.0']]
+
+
+def test_history_chunks_split_the_window_and_skip_empty_buckets():
+    engine = station_engine(3)
+    history = HistoryStore()
+    start = history.offset
+    history.capture(engine, ts=start)
+    # Data in hours 0, 1 and 3; hour 2 is left empty
+    for hour in (1, 2, 4):
+        history.capture(engine, ts=start + hour * 3600 - 1)
+    chunks = list(history_chunks(engine, history, range(3), 'hour', start, start + 5 * 3600,
+                                 chunk_rows=6))
+    # Two hours of three stations per chunk
+    assert len(chunks) == 2
+    starts = np.concatenate([chunk['start'] for chunk in chunks])
+    assert len(starts) == 9
+    assert sorted(set(starts)) == [str(np.datetime64(int(start + hour * 3600), 's')) for hour in (0, 1, 3)]
+    assert list(chunks[0]['station'][:3]) == ['S0', 'S1', 'S2']
+
+
+def wait(jobs, job_id, timeout=5):
+    deadline = time.time() + timeout
+    while jobs.status(job_id)['state'] in ('queued', 'running'):
+        assert time.time() < deadline
+        time.sleep(0.01)
+    return jobs.status(job_id)
+
+
+def test_export_job_writes_the_file_and_records_progress(tmp_path):
+    jobs = ExportJobs(str(tmp_path))
+    engine = station_engine()
+    job = jobs.submit('kpis', 'csv', lambda: kpi_chunks(engine, range(5), lambda names: {}, chunk=2))
+    status = wait(jobs, job['id'])
+    assert status['state'] == 'done'
+    assert status['rows'] == 5
+    with open(jobs.file(job['id'])) as f:
+        assert len(f.readlines()) == 6
+
+
+def test_failed_jobs_leave_no_file(tmp_path):
+    jobs = ExportJobs(str(tmp_path))
+
+    def chunks():
+        yield {'station': np.array(['S0'], dtype=object)}
+        raise RuntimeError('database went away')
+
+    job = jobs.submit('kpis', 'csv', chunks)
+    status = wait(jobs, job['id'])
+    assert status['state'] == 'failed'
+    assert status['error'] == 'database went away'
+    assert jobs.file(job['id']) is None
+    assert sorted(path.name for path in tmp_path.iterdir()) == [job['id'] + '.json']
+
+
+def test_unknown_and_pruned_jobs(tmp_path):
+    jobs = ExportJobs(str(tmp_path), keep=2)
+    assert jobs.status('../etc/passwd') is None
+    ids = []
+    for _ in range(3):
+        ids.append(jobs.submit('kpis', 'csv', lambda: iter(()))['id'])
+        wait(jobs, ids[-1])
+        time.sleep(0.01)
+    jobs.submit('kpis', 'csv', lambda: iter(()))
+    assert jobs.status(ids[0]) is None
+    assert jobs.status(ids[2]) is not None
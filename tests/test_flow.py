@@ -0,0 +1,70 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy as np  # noqa: E402
+
+from flow import FlowModel, infer_stages  # noqa: E402
+from oee_engine import OEEEngine  # noqa: E402
+
+
+def line_engine(units, rejects=None):
+    engine = OEEEngine()
+    for name, count in units.items():
+        engine.state_change(name, True, ts=0)
+        engine.unit_count(name, count, ts=0)
+        engine.reject_count(name, (rejects or {}).get(name, 0), ts=0)
+    engine.tick(3600)
+    return engine
+
+
+def test_infer_stages_groups_consecutive_numbered_stations():
+    names = ['Cut', 'Machine 1', 'Machine 2', 'Oven', 'Machine 3', 'Pack 1']
+    assert infer_stages(names) == [['Cut'], ['Machine 1', 'Machine 2'], ['Oven'], ['Machine 3'], ['Pack 1']]
+
+
+def test_bottleneck_is_the_stage_with_the_lowest_capacity():
+    engine = line_engine({'Cut': 100, 'Machine 1': 20, 'Machine 2': 20, 'Pack': 35}, {'Cut': 10})
+    line = FlowModel(engine).line(0)
+    stages = {stage['name']: stage for stage in line['stages']}
+    assert list(stages) == ['Cut', 'Machine 1/2', 'Pack']
+    assert stages['Machine 1/2']['members'] == 2
+    assert stages['Machine 1/2']['units'] == 40
+    # Two machines at 20 units an hour each
+    assert stages['Machine 1/2']['capacity'] == 40
+    assert line['bottleneck'] == 'Pack'
+    assert stages['Pack']['bottleneck']
+    assert line['oee'] == stages['Pack']['oee']
+
+
+def test_wip_is_upstream_good_units_not_yet_taken():
+    engine = line_engine({'Cut': 100, 'Machine 1': 20, 'Machine 2': 20, 'Pack': 35}, {'Cut': 10})
+    line = FlowModel(engine).line(0)
+    assert [stage['wip'] for stage in line['stages']] == [0, 50, 5]
+    assert line['wip'] == 55
+    assert line['output'] == 35
+
+
+def test_updates_fold_in_changed_stations():
+    engine = line_engine({'Cut': 100, 'Machine 1': 20, 'Machine 2': 20, 'Pack': 35})
+    model = FlowModel(engine)
+    model.flow()
+    engine.unit_count('Machine 2', 30, ts=3600)
+    engine.unit_count('Pack', 40, ts=3600)
+    flow = model.flow()
+    fresh = FlowModel(engine).flow()
+    for key in ('units', 'wip', 'capacity', 'bottleneck', 'line_wip'):
+        np.testing.assert_array_equal(flow[key], fresh[key])
+    assert model.line(0)['bottleneck'] == 'Machine 1/2'
+
+
+def test_topology_stages_and_buffer_fill():
+    engine = line_engine({'Cut': 100, 'Press A': 30, 'Press B': 30, 'Pack': 50})
+    topology = {'Plant 1/Line 1': [{'stations': ['Press A', 'Press B'], 'buffer': 80}]}
+    line = FlowModel(engine, topology).line(0)
+    stages = {stage['name']: stage for stage in line['stages']}
+    # Stations the topology leaves out get a stage of their own
+    assert set(stages) == {'Press A + Press B', 'Cut', 'Pack'}
+    assert stages['Press A + Press B']['buffer'] == 80
+    assert stages['Cut']['buffer'] is None
@@ -0,0 +1,74 @@
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy as np  # noqa: E402
+
+from history import HistoryStore  # noqa: E402
+from oee_engine import OEEEngine  # noqa: E402
+
+
+def test_follow_reloads_saved_history(tmp_path):
+    path = str(tmp_path / 'history.h5')
+    engine = OEEEngine()
+    engine.add_station('Station 1', ts=0)
+    engine.state_change('Station 1', True, ts=0)
+    writer = HistoryStore()
+    writer.capture(engine, ts=60)
+    engine.unit_count('Station 1', 10, ts=90)
+    writer.capture(engine, ts=120)
+    writer.save(path)
+
+    reader = HistoryStore()
+    reader.follow(path, interval=0.01)
+    deadline = time.time() + 5
+    while not reader.names and time.time() < deadline:
+        time.sleep(0.01)
+    assert reader.names == ['Station 1']
+    assert reader.trend('minute', 0, 180)['units'].sum() == 10
+
+
+def rated_engine():
+    engine = OEEEngine()
+    engine.set_cycle_times([{'product': 'A', 'seconds': 1}])
+    engine.add_station('Station 1', ts=0)
+    engine.state_change('Station 1', True, ts=0)
+    engine.lot_start('Station 1', 1, 2, ts=0, product='A')
+    return engine
+
+
+def test_bucket_performance_is_not_a_running_average():
+    engine = rated_engine()
+    history = HistoryStore(offset=0)
+    history.capture(engine, ts=0)
+    engine.unit_count('Station 1', 3600, ts=1800)
+    history.capture(engine, ts=3600)
+    engine.unit_count('Station 1', 1800, ts=5400)
+    history.capture(engine, ts=7200)
+    trend = history.trend('hour', 3600, 10800)
+    assert trend['performance'][:, 0].tolist() == [100, 50]
+
+
+def test_rollups_and_availability():
+    engine = rated_engine()
+    history = HistoryStore(offset=0)
+    history.capture(engine, ts=0)
+    for minute in range(1, 61):
+        if minute == 31:
+            engine.state_change('Station 1', False, ts=1800)
+        engine.unit_count('Station 1', 30 if minute <= 30 else 0, ts=minute * 60 - 1)
+        if minute <= 30 and minute % 10 == 0:
+            engine.reject_count('Station 1', 9, ts=minute * 60 - 1)
+        history.capture(engine, ts=minute * 60)
+    # A capture at t lands in the bucket starting at t, so the last minute
+    # falls in the second hour
+    hour = history.trend('hour', 0, 7200, group=2)
+    minutes = history.trend('minute', 0, 7200)
+    assert np.nansum(minutes['units']) == hour['units'][0, 0] == 900
+    assert hour['availability'][0, 0] == 50
+    assert hour['quality'][0, 0] == 97
+    # Weekly points fold seven days into one
+    week = history.trend('day', 0, 7 * 86400, group=7)
+    assert week['units'].shape == (1, 1) and week['units'][0, 0] == 900
@@ -0,0 +1,115 @@
+import json
+import socket
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from ingest import ACCEPTED, IngestGateway, encode_binary, encode_json  # noqa: E402
+from oee_engine import OEEEngine, RUNNING  # noqa: E402
+
+
+@pytest.fixture
+def gateway():
+    engine = OEEEngine()
+    engine.add_station('Station 1', ts=0)
+    return IngestGateway(engine, host='127.0.0.1', port=0)
+
+
+@pytest.mark.parametrize('event', [
+    {'type': 'lot_start', 'station': 'Station 1', 'lot_num': 'L-42', 'expected_run_time': 2},
+    {'type': 'lot_start', 'station': 'Station 1', 'lot_num': [1], 'expected_run_time': 2},
+    {'type': 'state', 'station': 'Station 1', 'status': RUNNING, 'ts': 'now'},
+    {'type': 'units', 'station': 'Station 1', 'count': 1, 'ts': float('nan')},
+    {'type': 'units', 'station': 'Station 1', 'count': True},
+])
+def test_rejects_events_the_engine_cannot_apply(gateway, event):
+    assert not gateway.valid_event(event)
+
+
+@pytest.mark.parametrize('lot_num', [42, '42', 'Nil', None])
+def test_accepts_lot_numbers(gateway, lot_num):
+    assert gateway.valid_event({'type': 'lot_start', 'station': 'Station 1', 'lot_num': lot_num,
+                                'expected_run_time': 2, 'ts': 10})
+
+
+def test_apply_batches_skips_failing_events(gateway):
+    batch = gateway.parse_json(json.dumps([
+        {'type': 'lot_start', 'station': 'Station 1', 'lot_num': 1, 'expected_run_time': 2},
+        {'type': 'units', 'station': 'Station 1', 'count': 3},
+    ]))
+    batch.events[0]['lot_num'] = 'L-42'
+    gateway.apply_batches([batch])
+    assert gateway.rejected == 1
+    assert gateway.applied == 1
+    assert gateway.engine.kpis()['units'][0] == 3
+
+
+def _send(sock, events):
+    sock.sendall(encode_json(events))
+    return sock.recv(1)
+
+
+def test_consumer_survives_bad_frames(gateway):
+    gateway.start_in_thread()
+    with socket.create_connection(('127.0.0.1', gateway.port)) as sock:
+        _send(sock, [{'type': 'lot_start', 'station': 'Station 1', 'lot_num': 'L-42',
+                      'expected_run_time': 2}])
+        _send(sock, [{'type': 'state', 'station': 'Station 1', 'status': RUNNING, 'ts': 'now'}])
+        assert _send(sock, [{'type': 'units', 'station': 'Station 1', 'count': 5}]) == ACCEPTED
+    deadline = time.time() + 5
+    while gateway.engine.kpis()['units'][0] != 5 and time.time() < deadline:
+        time.sleep(0.01)
+    assert gateway.engine.kpis()['units'][0] == 5
+    assert gateway.rejected == 2
+
+
+def test_counts_are_rated_on_the_lot_they_arrived_in(gateway):
+    engine = gateway.engine
+    engine.set_cycle_times([{'product': 'A', 'seconds': 10}, {'product': 'B', 'seconds': 100}])
+    gateway.apply_batches([gateway.parse_json(json.dumps([
+        {'type': 'lot_start', 'station': 'Station 1', 'lot_num': 1, 'expected_run_time': 1, 'product': 'A'},
+        {'type': 'units', 'station': 'Station 1', 'count': 10},
+        {'type': 'material_used', 'station': 'Station 1', 'kg': 3},
+        {'type': 'lot_start', 'station': 'Station 1', 'lot_num': 2, 'expected_run_time': 1, 'product': 'B'},
+        {'type': 'units', 'station': 'Station 1', 'count': 1},
+        {'type': 'material_used', 'station': 'Station 1', 'kg': 2},
+    ]))])
+    assert engine.ideal_time[0] == 200
+    assert engine.units[0] == 11
+    assert engine.materials.lot(0, 1)['used'] == 3
+    assert engine.materials.lot(0, 2)['used'] == 2
+
+
+def test_binary_counts_split_at_lot_changes_across_frames(gateway):
+    engine = gateway.engine
+    engine.add_station('Station 2', ts=0)
+    first = gateway.parse_binary(encode_binary([
+        (0, 'lot_start', 1, 7, 1), (0, 'units', 2, 4, 0), (1, 'units', 2, 5, 0),
+        (0, 'material_used', 2, 1.5, 0),
+    ])[5:])
+    second = gateway.parse_binary(encode_binary([
+        (0, 'units', 3, 2, 0), (0, 'lot_start', 4, 8, 1), (0, 'material_used', 5, 2.5, 0),
+    ])[5:])
+    gateway.apply_batches([first, second])
+    assert engine.units[0] == 6 and engine.units[1] == 5
+    assert engine.materials.lot(0, 7)['used'] == 1.5
+    assert engine.materials.lot(0, 8)['used'] == 2.5
+    assert engine.lot_num[0] == 8
+
+
+@pytest.mark.parametrize('record', [
+    (0, 'units', float('nan'), 1, 0),
+    (0, 'units', 1, float('inf'), 0),
+    (0, 'state', 1, 1, float('nan')),
+])
+def test_binary_records_must_be_finite(gateway, record):
+    batch = gateway.parse_binary(encode_binary([record, (0, 'units', 2, 3, 0)])[5:])
+    gateway.apply_batches([batch])
+    assert gateway.rejected == 1
+    assert gateway.engine.units[0] == 3
+    assert np.isfinite(gateway.engine.since[0])
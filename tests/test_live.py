@@ -0,0 +1,38 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from dash import no_update  # noqa: E402
+
+from live import data_patch  # noqa: E402
+
+
+def figure(names, values):
+    return {
+        'data': [
+            {'type': 'bar', 'y': names, 'x': [100] * len(names)},
+            {'type': 'bar', 'y': names, 'x': values, 'text': values},
+        ],
+        'layout': {'title': {'text': 'Quality'}},
+    }
+
+
+def operations(patch):
+    return [(op['location'], op['params']['value']) for op in patch.to_plotly_json()['operations']]
+
+
+def test_data_patch_sends_only_the_arrays_that_changed():
+    shown = figure(['A', 'B'], [90, 80])
+    patch = data_patch(figure(['A', 'B'], [90, 85]), shown)
+    assert operations(patch) == [(['data', 1, 'x'], [90, 85]), (['data', 1, 'text'], [90, 85])]
+
+
+def test_data_patch_without_a_previous_figure_sends_every_array():
+    patch = data_patch(figure(['A'], [90]))
+    assert [location for location, _ in operations(patch)] == [
+        ['data', 0, 'x'], ['data', 0, 'y'], ['data', 1, 'x'], ['data', 1, 'y'], ['data', 1, 'text']]
+
+
+def test_data_patch_of_an_unchanged_figure_is_no_update():
+    assert data_patch(figure(['A'], [90]), figure(['A'], [90])) is no_update
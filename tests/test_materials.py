@@ -0,0 +1,35 @@
+import sys
+import threading
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from materials import MaterialLedger  # noqa: E402
+from oee_engine import OEEEngine  # noqa: E402
+
+
+def test_ledger_grows_with_the_engine():
+    engine = OEEEngine()
+    for i in range(20):
+        engine.add_station(f'Station {i}', ts=0)
+    engine.material('Station 0', 2.0, ts=0)
+    assert engine.materials.by_type(range(20)) == {'Unspecified': {'used': 2.0, 'waste': 0.0, 'waste_ratio': 0.0}}
+    assert engine.materials.shifts(0, 1, list(range(20)))[0]['used'] == 2.0
+
+
+def test_new_material_names_are_readable_at_once():
+    ledger = MaterialLedger()
+    for i in range(10):
+        ledger.material_code(f'material {i}')
+    assert ledger.by_material.shape[1] >= len(ledger.materials)
+    assert ledger.by_type() == {}
+
+
+def test_totals_split_by_material_and_lot():
+    ledger = MaterialLedger()
+    steel = ledger.material_code('steel')
+    ledger.add([0, 0, 1], [5.0, 1.0, 2.0], [False, True, False], [steel, steel, 0], [7, 7, 8],
+               [0.0, 0.0, 0.0])
+    assert ledger.station(0)['materials'] == {'steel': {'used': 5.0, 'waste': 1.0, 'waste_ratio': 20.0}}
+    assert ledger.lot(0, 7)['waste'] == 1.0
+    assert ledger.by_type()['Unspecified']['used'] == 2.0
@@ -0,0 +1,69 @@
+import sys
+import threading
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from oee_engine import OEEEngine  # noqa: E402
+
+
+def test_kpis_stamped_with_version_read_before_compute():
+    engine = OEEEngine()
+    engine.add_station('Station 1', ts=0)
+    units = engine.units
+
+    class Writer(type(units)):
+        # A unit count landing while kpis() reads the arrays
+        def __getitem__(self, item):
+            engine.units = units
+            engine.unit_count('Station 1', 5, ts=1)
+            return units[item]
+
+    engine.units = units.view(Writer)
+    stale = engine.kpis()
+    assert stale['version'] < engine.version
+    assert engine.kpis()['units'][0] == 5
+
+
+def test_concurrent_add_station():
+    engine = OEEEngine(capacity=2)
+
+    def add(first):
+        for i in range(first, first + 200):
+            engine.add_station(f'Station {i}', ts=0)
+
+    threads = [threading.Thread(target=add, args=(k * 200,)) for k in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(engine) == 800
+    assert all(engine.names[idx] == name for name, idx in engine.index.items())
+
+
+@pytest.mark.parametrize('write', [
+    lambda engine: engine.unit_count('Station 1', 5, ts=1),
+    lambda engine: engine.reject_count('Station 1', 1, ts=1),
+    lambda engine: engine.state_change('Station 1', True, ts=1),
+    lambda engine: engine.lot_start('Station 1', 7, 2.0, ts=1),
+    lambda engine: engine.lot_end('Station 1', ts=1),
+    lambda engine: engine.add_counts(np.array([0]), np.array([5.0]), np.array([1.0])),
+    lambda engine: engine.add_materials([0], [2.0], [False], [0], [1]),
+    lambda engine: engine.seed('Station 1', status='Running', units=10),
+    lambda engine: engine.tick(ts=1),
+])
+def test_writes_wait_for_the_engine_lock(write):
+    engine = OEEEngine()
+    engine.add_station('Station 1', ts=0)
+    version = engine.version
+    with engine._lock:
+        thread = threading.Thread(target=write, args=(engine,))
+        thread.start()
+        thread.join(0.1)
+        assert thread.is_alive()
+        assert engine.version == version
+    thread.join()
+    assert engine.version > version
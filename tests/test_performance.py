@@ -0,0 +1,69 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from oee_engine import OEEEngine  # noqa: E402
+from performance import CycleTimeTable  # noqa: E402
+
+CYCLE_TIMES = [
+    {'product': 'Bolt', 'station': None, 'seconds': 10},
+    {'product': 'Bolt', 'station': 'Press', 'seconds': 4},
+    {'product': 'Nut', 'station': None, 'seconds': 20},
+]
+
+
+def test_lookup_prefers_the_station_entry_over_the_product_default():
+    table = CycleTimeTable(CYCLE_TIMES)
+    assert table.lookup('Bolt', 'Press') == 4
+    assert table.lookup('Bolt', 'Lathe') == 10
+    assert table.lookup('Washer', 'Press') == 0
+    assert len(table) == 3
+
+
+def running_engine():
+    engine = OEEEngine()
+    engine.set_cycle_times(CYCLE_TIMES)
+    engine.state_change('Lathe', True, ts=0)
+    return engine
+
+
+def test_performance_is_ideal_time_over_rated_run_time():
+    engine = running_engine()
+    engine.lot_start('Lathe', 1, 1.0, ts=0, product='Bolt')
+    engine.unit_count('Lathe', 5, ts=100)
+    engine.tick(100)
+    assert engine.kpis()['performance'][0] == 50
+
+
+def test_lot_changes_split_the_rating():
+    engine = running_engine()
+    engine.lot_start('Lathe', 1, 1.0, ts=0, product='Bolt')
+    engine.unit_count('Lathe', 5, ts=100)
+    engine.lot_start('Lathe', 2, 1.0, ts=100, product='Nut')
+    engine.unit_count('Lathe', 5, ts=200)
+    engine.tick(200)
+    # 5 x 10 s + 5 x 20 s of ideal time over 200 s
+    assert engine.ideal_time[0] == 150
+    assert engine.kpis()['performance'][0] == 75
+
+
+def test_unrated_lots_fall_back_to_expected_run_time():
+    engine = running_engine()
+    engine.lot_start('Lathe', 1, 2.0, ts=0, product='Washer')
+    engine.unit_count('Lathe', 5, ts=3600)
+    engine.tick(3600)
+    assert engine.rated_up[0] == 0
+    assert engine.kpis()['performance'][0] == 50
+
+
+def test_loading_cycle_times_rates_running_lots():
+    engine = OEEEngine()
+    engine.state_change('Lathe', True, ts=0)
+    engine.lot_start('Lathe', 1, 1.0, ts=0, product='Bolt')
+    assert engine.cycle_time[0] == 0
+    engine.set_cycle_times(CYCLE_TIMES)
+    assert engine.cycle_time[0] == 10
+    engine.unit_count('Lathe', 10, ts=200)
+    engine.tick(200)
+    assert engine.kpis()['performance'][0] == 50
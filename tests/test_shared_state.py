@@ -0,0 +1,77 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from oee_engine import OEEEngine  # noqa: E402
+from shared_state import SharedEngine, SharedKPITable  # noqa: E402
+
+
+def make_engine(n=3):
+    engine = OEEEngine()
+    for i in range(n):
+        engine.add_station(f'Station {i}', ts=0, plant='Plant 1', line=f'Line {i % 2 + 1}')
+    return engine
+
+
+def test_workers_read_published_arrays(tmp_path):
+    path = str(tmp_path / 'kpis')
+    engine = make_engine()
+    engine.unit_count('Station 1', 7, ts=1)
+    table = SharedKPITable(path, capacity=8)
+    table.publish(engine)
+    worker = SharedEngine(path)
+    kpi = worker.kpis()
+    assert kpi['names'] == engine.names
+    assert kpi['version'] == engine.version
+    assert list(kpi['units']) == [0, 7, 0]
+    assert worker.lines == engine.lines
+
+    engine.add_station('Station 3', ts=2)
+    table.publish(engine)
+    assert worker.kpis()['names'][-1] == 'Station 3'
+    assert int(table.header['seq']) % 2 == 0
+
+
+def test_publish_stamps_the_version_read_before_copying(tmp_path):
+    engine = make_engine()
+    table = SharedKPITable(str(tmp_path / 'kpis'), capacity=8)
+    views = table.arrays
+    before = engine.version
+
+    class Copying(dict):
+        # An event landing while the arrays are copied
+        def items(self):
+            for i, item in enumerate(dict.items(self)):
+                if i == 1:
+                    engine.unit_count('Station 0', 1, ts=1)
+                yield item
+
+    table.arrays = Copying(views)
+    table.publish(engine)
+    assert int(table.header['version']) == before
+    table.arrays = views
+    table.publish(engine)
+    assert int(table.header['version']) == engine.version
+
+
+def test_reader_retries_while_a_publish_is_in_progress(tmp_path, monkeypatch):
+    path = str(tmp_path / 'kpis')
+    engine = make_engine()
+    table = SharedKPITable(path, capacity=8)
+    table.publish(engine)
+    worker = SharedEngine(path)
+    worker.kpis()
+    calls = []
+    kpis = OEEEngine.kpis
+
+    def overlapped(self):
+        calls.append(1)
+        if len(calls) == 1:
+            # A publish starts and finishes during this read
+            table.header['seq'] += 2
+        return kpis(self)
+
+    monkeypatch.setattr(OEEEngine, 'kpis', overlapped)
+    worker.kpis()
+    assert len(calls) == 2
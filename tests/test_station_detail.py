@@ -0,0 +1,44 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import datasource  # noqa: E402
+from datasource import SQLiteBackend  # noqa: E402
+from station_detail import DetailLoader  # noqa: E402
+
+
+def test_sqlite_fetch_details_batches(monkeypatch):
+    monkeypatch.setattr(datasource, 'DETAIL_BATCH', 2)
+    backend = SQLiteBackend()
+    backend.create_schema()
+    backend.insert_stations([
+        {'name': f'Station {i}', 'status': 'Running', 'mat_used': i if i % 2 else None,
+         'mat_waste': 0.5}
+        for i in range(5)
+    ])
+    queries = []
+    query = backend.query
+    monkeypatch.setattr(backend, 'query', lambda sql, params=(): queries.append(sql) or query(sql, params))
+    details = backend.fetch_details([f'Station {i}' for i in range(5)])
+    assert len(queries) == 3
+    assert details['Station 0'] == {}
+    assert details['Station 3'] == {'mat_used': 3, 'mat_waste': 0.5}
+
+
+def test_get_many_fetches_missing_in_one_call():
+    calls = []
+
+    def fetch_many(names):
+        calls.append(list(names))
+        return {name: {'mat_used': 1.0} for name in names}
+
+    names = ['a', 'b', 'c']
+    loader = DetailLoader(lambda name: {'mat_used': 2.0}, lambda: names, prefetch=0,
+                          fetch_many=fetch_many)
+    loader.get('b')
+    found = loader.get_many(names)
+    assert calls == [['a', 'c']]
+    assert found == {'a': {'mat_used': 1.0}, 'b': {'mat_used': 2.0}, 'c': {'mat_used': 1.0}}
+    # Bulk results leave the cache to the stations that were opened
+    assert loader.peek('a') is None
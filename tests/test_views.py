@@ -0,0 +1,69 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy as np  # noqa: E402
+
+from oee_engine import OEEEngine  # noqa: E402
+from views import LINE, PLANT, STATION, build_view, resolve  # noqa: E402
+
+
+def plant_engine():
+    engine = OEEEngine()
+    for name, plant, line in (('S1', 'A', 'L1'), ('S2', 'A', 'L1'), ('S3', 'A', 'L2'), ('S4', 'B', 'L1')):
+        engine.add_station(name, ts=0, plant=plant, line=line)
+    # S1 runs a 2 h lot for the whole hour; the others stay stopped
+    engine.state_change('S1', True, ts=0)
+    engine.lot_start('S1', 1, 2.0, ts=0)
+    engine.unit_count('S1', 10, ts=0)
+    engine.unit_count('S2', 30, ts=0)
+    engine.reject_count('S2', 4, ts=0)
+    engine.unit_count('S4', 5, ts=0)
+    engine.tick(3600)
+    return engine
+
+
+def test_plants_roll_up_their_stations():
+    engine = plant_engine()
+    view = build_view(engine.kpis(), engine)
+    assert view['level'] == PLANT
+    assert view['names'] == ['A', 'B']
+    np.testing.assert_array_equal(view['units'], [40, 5])
+    np.testing.assert_array_equal(view['members'], [3, 1])
+    np.testing.assert_array_equal(view['running'], [1, 0])
+    # One running hour out of three observed
+    assert view['availability'][0] == 33.3
+    assert view['quality'][0] == 90
+
+
+def test_performance_is_weighted_by_running_time():
+    engine = plant_engine()
+    view = build_view(engine.kpis(), engine, 'A')
+    assert view['level'] == LINE
+    assert view['names'] == ['L1', 'L2']
+    # Only S1 ran, so the stopped S2 does not dilute its 50 %
+    np.testing.assert_array_equal(view['performance'], [50, 0])
+    np.testing.assert_array_equal(view['availability'], [50, 0])
+    assert view['summary']['performance'] == 50
+
+
+def test_single_choice_levels_are_skipped():
+    engine = plant_engine()
+    assert resolve(engine, 'B') == ('B', 'L1')
+    assert resolve(engine, 'Nowhere', 'L2') == (None, None)
+    view = build_view(engine.kpis(), engine, 'B')
+    assert view['level'] == STATION
+    assert view['names'] == ['S4']
+
+
+def test_pages_and_row_of():
+    engine = plant_engine()
+    kpi = engine.kpis()
+    view = build_view(kpi, engine, 'A', 'L1', page=1, page_size=1)
+    assert (view['page'], view['pages']) == (1, 2)
+    assert view['names'] == ['S2']
+    np.testing.assert_array_equal(view['row_of'], [-1, 0, -1, -1])
+    np.testing.assert_array_equal(view['units'], [30])
+    # Out-of-range pages clamp to the last one
+    assert build_view(kpi, engine, 'A', 'L1', page=9, page_size=1)['page'] == 1
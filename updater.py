@@ -0,0 +1,55 @@
+"""Single writer for the shared KPI table.
+
+Run once per host next to the gunicorn workers when ``OEE_SHARED_STATE_PATH``
+is set::
+
+    OEE_SHARED_STATE_PATH=/dev/shm/oee-kpis python updater.py &
+    OEE_SHARED_STATE_PATH=/dev/shm/oee-kpis gunicorn app:server -w 4
+
+It owns the engine, reloads it from the data source, applies machine events
+from the ingest gateway and publishes the station arrays to the workers.
+"""
+import os
+import time
+
+from config import (DB_REFRESH_SECONDS, HISTORY_CAPTURE_SECONDS, INGEST_HOST, INGEST_PORT,
+                    INGEST_QUEUE_SIZE, SHARED_CAPACITY, SHARED_HISTORY_PATH, SHARED_PUBLISH_MS,
+                    SHARED_STATE_PATH, SHARED_TICK_SECONDS)
+from datasource import default_source
+from oee_engine import OEEEngine
+from shared_state import SharedKPITable
+
+
+def main():
+    if not SHARED_STATE_PATH:
+        raise SystemExit('OEE_SHARED_STATE_PATH is not set')
+    source = default_source()
+    engine = OEEEngine()
+    source.refresh(engine)
+    if DB_REFRESH_SECONDS:
+        source.start_refresh(engine, DB_REFRESH_SECONDS)
+    if INGEST_PORT:
+        from ingest import IngestGateway
+
+        IngestGateway(engine, INGEST_HOST, INGEST_PORT, INGEST_QUEUE_SIZE).start_in_thread()
+    if HISTORY_CAPTURE_SECONDS:
+        # Saved after every capture: the workers read the history from this file
+        from history import HistoryStore
+
+        history = (HistoryStore.load(SHARED_HISTORY_PATH) if os.path.exists(SHARED_HISTORY_PATH)
+                   else HistoryStore())
+        history.start_capture(engine, HISTORY_CAPTURE_SECONDS, SHARED_HISTORY_PATH, save_every=1)
+
+    table = SharedKPITable(SHARED_STATE_PATH, SHARED_CAPACITY)
+    ticked = 0.0
+    while True:
+        now = time.time()
+        if now - ticked >= SHARED_TICK_SECONDS:
+            engine.tick(now)
+            ticked = now
+        table.publish(engine, source)
+        time.sleep(SHARED_PUBLISH_MS / 1000)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+"""Plant -> line -> station views of the station KPI table.
+
+A view is the KPI dict of one page of rows at one level of the hierarchy:
+plants when no plant is selected, the plant's lines when no line is selected,
+and the line's stations otherwise. Plant and line rows are aggregated from
+their stations with weighted ``np.bincount`` sums. Levels with a single
+choice are skipped, so a one-line plant opens straight on its stations.
+"""
+import math
+
+import numpy as np
+
+PLANT = 'plant'
+LINE = 'line'
+STATION = 'station'
+
+# Columns carried over from the engine KPIs for station rows
+_STATION_KEYS = ('availability', 'performance', 'quality', 'oee', 'units', 'exp')
+
+
+def aggregate(kpi, groups, n_groups):
+    """Roll station KPIs up into ``n_groups`` rows; ``groups`` maps station -> row."""
+    def total(values):
+        return np.bincount(groups, weights=values, minlength=n_groups)
+
+    up = total(kpi['up_time'])
+    observed = up + total(kpi['down_time'])
+    units = total(kpi['units'])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        availability = np.where(observed > 0, up * 100 / observed, 100)
+        # Performance is weighted by how long each station ran
+        performance = np.where(up > 0, total(kpi['performance'] * kpi['up_time']) / up, 0)
+        quality = np.where(units > 0, 100 - total(kpi['rejects']) * 100 / units, 100)
+    return {
+        'availability': np.round(availability, 1),
+        'performance': np.round(performance, 1),
+        'quality': np.round(quality, 1),
+        'oee': np.round(availability * performance * quality / 10000, 1),
+        'units': units,
+        'exp': total(kpi['exp']),
+        'running': total(kpi['running'].astype(float)).astype(int),
+        'members': np.bincount(groups, minlength=n_groups),
+    }
+
+
+def resolve(engine, plant=None, line=None):
+    """Drop unknown selections and fill in plant and line where there is
+    only one to choose from."""
+    if plant not in engine.plants:
+        plant = None
+    if line not in lines_of(engine, plant):
+        line = None
+    if plant is None and len(engine.plants) == 1:
+        plant = engine.plants[0]
+    if plant is not None and line is None:
+        lines = lines_of(engine, plant)
+        if len(lines) == 1:
+            line = lines[0]
+    return plant, line
+
+
+def lines_of(engine, plant):
+    if plant not in engine.plants:
+        return []
+    p = engine.plants.index(plant)
+    return [name for plant_idx, name in engine.lines if plant_idx == p]
+
+
+def build_view(kpi, engine, plant=None, line=None, page=0, page_size=25):
+    plant, line = resolve(engine, plant, line)
+    n = len(kpi['names'])
+    line_plant = np.array([p for p, _ in engine.lines], dtype=np.int64)
+    station_plant = line_plant[kpi['line']] if n else np.zeros(0, dtype=np.int64)
+
+    if plant is None:
+        level = PLANT
+        groups = station_plant
+        names = list(engine.plants)
+        in_scope = np.ones(n, dtype=bool)
+    elif line is None:
+        level = LINE
+        p = engine.plants.index(plant)
+        codes = [code for code, (plant_idx, _) in enumerate(engine.lines) if plant_idx == p]
+        position = np.full(len(engine.lines), -1, dtype=np.int64)
+        position[codes] = np.arange(len(codes))
+        in_scope = station_plant == p
+        groups = position[kpi['line']]
+        names = [engine.lines[code][1] for code in codes]
+    else:
+        level = STATION
+        p = engine.plants.index(plant)
+        code = engine.lines.index((p, line))
+        in_scope = kpi['line'] == code
+        groups = np.full(n, -1, dtype=np.int64)
+        groups[in_scope] = np.arange(int(in_scope.sum()))
+        names = [kpi['names'][i] for i in np.flatnonzero(in_scope)]
+
+    pages = max(1, math.ceil(len(names) / page_size))
+    page = min(max(page, 0), pages - 1)
+    first = page * page_size
+    last = min(first + page_size, len(names))
+
+    # Row of each station on this page, -1 when it is not shown
+    row_of = np.where(in_scope, groups - first, -1)
+    row_of[(row_of < 0) | (row_of >= last - first)] = -1
+
+    if level == STATION:
+        stations = np.flatnonzero(in_scope)[first:last]
+        rows = {key: kpi[key][stations] for key in _STATION_KEYS}
+        rows['running'] = kpi['running'][stations]
+        rows['members'] = None
+    else:
+        scoped = in_scope & (groups >= 0)
+        rows = aggregate({key: kpi[key][scoped] for key in kpi if key not in ('names', 'version')},
+                         groups[scoped], len(names))
+        rows = {key: values[first:last] for key, values in rows.items()}
+
+    summary = aggregate({key: kpi[key][in_scope] for key in kpi if key not in ('names', 'version')},
+                        np.zeros(int(in_scope.sum()), dtype=np.int64), 1)
+    rows.update({
+        'version': kpi['version'],
+        'view': (plant, line, page),
+        'level': level,
+        'names': names[first:last],
+        'plant': plant,
+        'line': line,
+        'page': page,
+        'pages': pages,
+        'row_of': row_of,
+        'in_scope': in_scope,
+        'summary': {key: summary[key][0].item() for key in ('availability', 'performance', 'quality', 'oee')},
+    })
+    return rows